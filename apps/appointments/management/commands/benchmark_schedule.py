@@ -0,0 +1,83 @@
+# apps/appointments/management/commands/benchmark_schedule.py
+
+"""
+Comando para medir el número de consultas del motor de agenda.
+El número de consultas debe ser constante sin importar cuántos slots se generen.
+"""
+
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+
+from apps.appointments.scheduling import get_schedule
+from apps.professionals.models import ProfessionalProfile
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas y tiempo del horario semanal para distintas duraciones de sesión'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            required=True,
+            help='Schema del tenant (ej: mindcare, bienestar)'
+        )
+        parser.add_argument(
+            '--psychologist',
+            type=int,
+            default=None,
+            help='ID del usuario psicólogo (por defecto el primero con perfil)'
+        )
+        parser.add_argument(
+            '--durations',
+            type=str,
+            default='120,60,30,15',
+            help='Duraciones de sesión a probar en minutos, separadas por coma'
+        )
+
+    def handle(self, *args, **options):
+        durations = [int(d) for d in options['durations'].split(',') if d.strip()]
+        week_start = date.today() + timedelta(days=1)
+
+        with schema_context(options['tenant']):
+            profiles = ProfessionalProfile.objects.select_related('user')
+            if options['psychologist']:
+                profiles = profiles.filter(user_id=options['psychologist'])
+            profile = profiles.first()
+
+            if not profile:
+                self.stdout.write(self.style.ERROR('❌ No se encontró un psicólogo con perfil profesional'))
+                return
+
+            psychologist = profile.user
+            self.stdout.write(self.style.SUCCESS(
+                f'📊 Horario semanal de {psychologist.get_full_name()} desde {week_start}'
+            ))
+            self.stdout.write('=' * 60)
+
+            query_counts = set()
+            for duration in durations:
+                # Solo en memoria: no se guarda el perfil
+                profile.session_duration = duration
+
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    schedule = get_schedule(psychologist, week_start, days=7)
+                    elapsed = (time.perf_counter() - started) * 1000
+
+                slots = sum(len(day['time_slots']) for day in schedule)
+                query_counts.add(len(queries))
+                self.stdout.write(
+                    f'⏱️  {duration:>4} min → {slots:>4} slots, '
+                    f'{len(queries)} consultas, {elapsed:.1f} ms'
+                )
+
+        if len(query_counts) == 1:
+            self.stdout.write(self.style.SUCCESS('\n✅ Número de consultas constante'))
+        else:
+            self.stdout.write(self.style.ERROR('\n❌ El número de consultas varía con la cantidad de slots'))
@@ -0,0 +1,85 @@
+# apps/appointments/management/commands/check_appointment_queries.py
+
+"""
+Comando para verificar que los listados de citas no tienen consultas N+1.
+Serializa páginas de distinto tamaño con el queryset real de AppointmentViewSet
+y comprueba que el número de consultas no crece con el tamaño de la página.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django_tenants.utils import schema_context
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from apps.appointments.serializers import AppointmentSerializer
+from apps.appointments.views import AppointmentViewSet
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Verifica que el número de consultas de los listados de citas sea constante'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            required=True,
+            help='Schema del tenant con datos (ej: mindcare, bienestar)'
+        )
+        parser.add_argument(
+            '--sizes',
+            type=str,
+            default='1,10,30',
+            help='Tamaños de página a probar, separados por coma'
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',') if size.strip()]
+        failures = 0
+
+        with schema_context(options['tenant']):
+            for user_type in ['professional', 'patient']:
+                user = User.objects.filter(user_type=user_type).annotate(
+                    n=Count('psychologist_appointments' if user_type == 'professional' else 'patient_appointments')
+                ).order_by('-n').first()
+
+                if not user:
+                    self.stdout.write(self.style.WARNING(f'⚠️ No hay usuarios de tipo {user_type}'))
+                    continue
+
+                self.stdout.write(f'\n👤 {user.get_full_name()} ({user_type}, {user.n} citas)')
+                counts = {}
+                for size in sizes:
+                    queryset = self.get_viewset_queryset(user)[:size]
+                    with CaptureQueriesContext(connection) as queries:
+                        rows = len(AppointmentSerializer(queryset, many=True).data)
+                    counts[size] = len(queries)
+                    self.stdout.write(f'   {rows:>4} citas → {len(queries)} consultas')
+
+                if len(set(counts.values())) > 1:
+                    failures += 1
+                    self.stdout.write(self.style.ERROR('   ❌ Las consultas crecen con el tamaño de la página (N+1)'))
+                else:
+                    self.stdout.write(self.style.SUCCESS('   ✅ Número de consultas constante'))
+
+        # Código de salida distinto de 0 para usarlo como verificación en CI
+        if failures:
+            raise CommandError(f'❌ {failures} listados con N+1')
+        self.stdout.write(self.style.SUCCESS('\n✅ Sin N+1 en los listados de citas'))
+
+    @staticmethod
+    def get_viewset_queryset(user):
+        """Queryset de AppointmentViewSet.list para el usuario dado"""
+        http_request = APIRequestFactory().get('/api/appointments/appointments/')
+
+        view = AppointmentViewSet()
+        view.action = 'list'
+        view.format_kwarg = None
+        view.request = Request(http_request)
+        view.request.user = user
+        return view.get_queryset()
@@ -3,6 +3,7 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
 from apps.appointments.models import PsychologistAvailability
+from apps.appointments.slot_index import rebuild_psychologist_slots
 from datetime import time
 
 User = get_user_model()
@@ -89,6 +90,9 @@ class Command(BaseCommand):
                             is_active=True
                         )
                         created_count += 1
+            
+            # El borrado masivo no pasa por el modelo: regenerar el índice de slots
+            rebuild_psychologist_slots(psychologist.pk)
         
         self.stdout.write(
             self.style.SUCCESS(
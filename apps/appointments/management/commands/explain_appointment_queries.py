@@ -0,0 +1,124 @@
+# apps/appointments/management/commands/explain_appointment_queries.py
+
+"""
+Comando para revisar los planes de ejecución de las consultas más usadas de citas.
+Ejecuta EXPLAIN ANALYZE sobre un tenant con datos para detectar regresiones
+(por ejemplo, un Seq Scan donde debería usarse uno de los índices de Appointment).
+"""
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_tenants.utils import schema_context
+
+from apps.appointments.models import ACTIVE_STATUSES, Appointment
+from apps.appointments.pagination import AppointmentCursorPagination
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Muestra EXPLAIN ANALYZE de las consultas críticas de citas en un tenant'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            required=True,
+            help='Schema del tenant con datos (ej: mindcare, bienestar)'
+        )
+        parser.add_argument(
+            '--no-analyze',
+            action='store_true',
+            help='Solo EXPLAIN, sin ejecutar las consultas'
+        )
+
+    def handle(self, *args, **options):
+        analyze = not options['no_analyze']
+
+        with schema_context(options['tenant']):
+            total = Appointment.objects.count()
+            self.stdout.write(self.style.SUCCESS(
+                f'📊 Planes de consultas de citas en "{options["tenant"]}" ({total} citas)'
+            ))
+            if total < 1000:
+                self.stdout.write(self.style.WARNING(
+                    '⚠️ Con pocas filas PostgreSQL puede preferir Seq Scan aunque exista el índice'
+                ))
+
+            # Usar el psicólogo y el paciente con más citas
+            psychologist = User.objects.filter(user_type='professional').annotate(
+                n=Count('psychologist_appointments')
+            ).order_by('-n').first()
+            patient = User.objects.filter(user_type='patient').annotate(
+                n=Count('patient_appointments')
+            ).order_by('-n').first()
+
+            if not psychologist or not patient:
+                self.stdout.write(self.style.ERROR('❌ El tenant no tiene psicólogos o pacientes'))
+                return
+
+            for name, queryset in self.hot_queries(psychologist, patient):
+                self.stdout.write(f'\n🔍 {name}')
+                self.stdout.write('-' * 60)
+                self.stdout.write(queryset.explain(analyze=analyze))
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Revisión de planes completada'))
+
+    def hot_queries(self, psychologist, patient):
+        """Las mismas consultas que hacen las vistas de citas"""
+        today = timezone.localdate()
+        ordering = AppointmentCursorPagination.ordering
+
+        yield 'Listado del psicólogo (AppointmentViewSet.list)', (
+            Appointment.objects.filter(psychologist=psychologist).order_by(*ordering)[:30]
+        )
+        yield 'Listado del paciente (AppointmentViewSet.list)', (
+            Appointment.objects.filter(patient=patient).order_by(*ordering)[:30]
+        )
+        yield 'Filtro por estado y rango de fechas', (
+            Appointment.objects.filter(
+                psychologist=psychologist,
+                status='confirmed',
+                appointment_date__gte=today - timedelta(days=30),
+                appointment_date__lte=today
+            ).order_by(*ordering)
+        )
+        yield 'Próximas citas del psicólogo (upcoming)', (
+            Appointment.objects.filter(
+                psychologist=psychologist,
+                appointment_date__gte=today,
+                status__in=ACTIVE_STATUSES
+            ).order_by(*ordering)[:10]
+        )
+        yield 'Próximas citas del paciente (upcoming)', (
+            Appointment.objects.filter(
+                patient=patient,
+                appointment_date__gte=today,
+                status__in=ACTIVE_STATUSES
+            ).order_by(*ordering)[:10]
+        )
+        yield 'Historial del psicólogo (history)', (
+            Appointment.objects.filter(psychologist=psychologist).filter(
+                Q(appointment_date__lt=today) | Q(status='completed')
+            ).order_by(*ordering)[:30]
+        )
+        yield 'Slots ocupados de la semana (scheduling.load_busy_intervals)', (
+            Appointment.objects.filter(
+                psychologist_id__in=[psychologist.id],
+                appointment_date__gte=today,
+                appointment_date__lte=today + timedelta(days=6),
+                status__in=ACTIVE_STATUSES
+            ).order_by('appointment_date', 'start_time').values_list(
+                'psychologist_id', 'appointment_date', 'start_time', 'end_time'
+            )
+        )
+        yield 'Pacientes atendidos (MyPastPatientsListView)', (
+            User.objects.filter(
+                id__in=Appointment.objects.filter(psychologist=psychologist)
+                .values_list('patient_id', flat=True).distinct()
+            )
+        )
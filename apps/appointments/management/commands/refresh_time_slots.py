@@ -0,0 +1,67 @@
+# apps/appointments/management/commands/refresh_time_slots.py
+
+"""
+Comando para regenerar el índice materializado de slots (TimeSlot).
+Pensado para ejecutarse una vez al día: elimina los slots pasados y
+extiende el horizonte con el nuevo día.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from apps.appointments.scheduling import get_session_duration
+from apps.appointments.slot_index import (
+    SLOT_INDEX_HORIZON_DAYS,
+    prune_past_slots,
+    rebuild_psychologist_slots,
+)
+from apps.tenants.models import Clinic
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = f'Regenera el índice de slots de los próximos {SLOT_INDEX_HORIZON_DAYS} días'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Schema del tenant específico (ej: mindcare, bienestar)',
+            default=None
+        )
+
+    def handle(self, *args, **options):
+        specific_tenant = options.get('tenant')
+
+        if specific_tenant:
+            tenants = Clinic.objects.filter(schema_name=specific_tenant)
+            if not tenants.exists():
+                self.stdout.write(self.style.ERROR(f'❌ Tenant "{specific_tenant}" no encontrado'))
+                return
+        else:
+            tenants = Clinic.objects.exclude(schema_name='public')
+
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                pruned = prune_past_slots()
+
+                psychologists = User.objects.filter(
+                    user_type='professional',
+                    availabilities__is_active=True
+                ).select_related('professional_profile').distinct()
+
+                total_slots = 0
+                for psychologist in psychologists:
+                    total_slots += rebuild_psychologist_slots(
+                        psychologist.pk, get_session_duration(psychologist)
+                    )
+
+                self.stdout.write(
+                    f'🏥 {tenant.name} ({tenant.schema_name}): '
+                    f'{total_slots} slots para {psychologists.count()} psicólogos, '
+                    f'{pruned} slots pasados eliminados'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✅ Índice de slots actualizado'))
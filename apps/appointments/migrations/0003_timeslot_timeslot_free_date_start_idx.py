@@ -0,0 +1,105 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:38
+
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+# Valores del índice de slots al crear esta migración (apps.appointments.slot_index)
+HORIZON_DAYS = 60
+DEFAULT_SESSION_DURATION = 60
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+
+def _blocked_days(values):
+    days = set()
+    for value in values or []:
+        try:
+            days.add(date.fromisoformat(str(value)))
+        except ValueError:
+            continue
+    return days
+
+
+def backfill_time_slots(apps, schema_editor):
+    """
+    Llena el índice con el horizonte completo: sin filas, la búsqueda por hora
+    no encontraría a nadie hasta el primer `refresh_time_slots`.
+    """
+    PsychologistAvailability = apps.get_model('appointments', 'PsychologistAvailability')
+    Appointment = apps.get_model('appointments', 'Appointment')
+    TimeSlot = apps.get_model('appointments', 'TimeSlot')
+    ProfessionalProfile = apps.get_model('professionals', 'ProfessionalProfile')
+
+    today = timezone.localdate()
+    dates = [today + timedelta(days=i) for i in range(HORIZON_DAYS)]
+
+    availabilities = {}
+    blocked = {}
+    for availability in PsychologistAvailability.objects.filter(is_active=True).order_by('start_time'):
+        availabilities.setdefault(availability.psychologist_id, {}).setdefault(
+            availability.weekday, []
+        ).append(availability)
+        blocked.setdefault(availability.psychologist_id, set()).update(_blocked_days(availability.blocked_dates))
+    if not availabilities:
+        return
+
+    durations = dict(ProfessionalProfile.objects.filter(
+        user_id__in=availabilities
+    ).values_list('user_id', 'session_duration'))
+
+    busy = {}
+    for psychologist_id, appointment_date, start_time, end_time in Appointment.objects.filter(
+        psychologist_id__in=availabilities,
+        appointment_date__gte=dates[0],
+        appointment_date__lte=dates[-1],
+        status__in=ACTIVE_STATUSES
+    ).values_list('psychologist_id', 'appointment_date', 'start_time', 'end_time'):
+        busy.setdefault((psychologist_id, appointment_date), []).append((start_time, end_time))
+
+    time_slots = []
+    for psychologist_id, by_weekday in availabilities.items():
+        step = timedelta(minutes=durations.get(psychologist_id) or DEFAULT_SESSION_DURATION)
+        for day in dates:
+            if day in blocked[psychologist_id]:
+                continue
+            intervals = busy.get((psychologist_id, day), [])
+            seen_starts = set()
+            for availability in by_weekday.get(day.weekday(), []):
+                current = datetime.combine(day, availability.start_time)
+                limit = datetime.combine(day, availability.end_time)
+                while current + step <= limit:
+                    slot_start, slot_end = current.time(), (current + step).time()
+                    current += step
+                    if slot_start in seen_starts:
+                        continue
+                    seen_starts.add(slot_start)
+                    is_booked = any(start < slot_end and end > slot_start for start, end in intervals)
+                    time_slots.append(TimeSlot(
+                        psychologist_id=psychologist_id,
+                        date=day,
+                        start_time=slot_start,
+                        end_time=slot_end,
+                        is_available=not is_booked
+                    ))
+
+    TimeSlot.objects.filter(date__in=dates).delete()
+    TimeSlot.objects.bulk_create(time_slots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_alter_appointment_psychologist_and_more'),
+        ('professionals', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['date', 'start_time'], name='timeslot_free_date_start_idx'),
+        ),
+        migrations.RunPython(backfill_time_slots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:39
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_timeslot_timeslot_free_date_start_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BlockedDate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('psychologist', models.ForeignKey(limit_choices_to={'user_type': 'professional'}, on_delete=django.db.models.deletion.CASCADE, related_name='blocked_periods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Fecha bloqueada',
+                'verbose_name_plural': 'Fechas bloqueadas',
+                'ordering': ['start_date'],
+                'indexes': [models.Index(fields=['psychologist', 'start_date', 'end_date'], name='blocked_psych_range_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_date__gte', models.F('start_date'))), name='blocked_date_valid_range')],
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Migración de datos: PsychologistAvailability.blocked_dates (JSON) -> BlockedDate
+
+from datetime import date, timedelta
+
+from django.db import migrations
+
+
+def _parse_dates(values):
+    dates = set()
+    for value in values or []:
+        try:
+            dates.add(date.fromisoformat(str(value)))
+        except ValueError:
+            continue
+    return dates
+
+
+def _merge_ranges(dates):
+    """Agrupa fechas consecutivas en rangos (inicio, fin)"""
+    ranges = []
+    for day in sorted(dates):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return ranges
+
+
+def forwards(apps, schema_editor):
+    PsychologistAvailability = apps.get_model('appointments', 'PsychologistAvailability')
+    BlockedDate = apps.get_model('appointments', 'BlockedDate')
+
+    dates_by_psychologist = {}
+    for availability in PsychologistAvailability.objects.exclude(blocked_dates=[]):
+        dates_by_psychologist.setdefault(availability.psychologist_id, set()).update(
+            _parse_dates(availability.blocked_dates)
+        )
+
+    BlockedDate.objects.bulk_create([
+        BlockedDate(psychologist_id=psychologist_id, start_date=start_date, end_date=end_date)
+        for psychologist_id, dates in dates_by_psychologist.items()
+        for start_date, end_date in _merge_ranges(dates)
+    ])
+
+
+def backwards(apps, schema_editor):
+    PsychologistAvailability = apps.get_model('appointments', 'PsychologistAvailability')
+    BlockedDate = apps.get_model('appointments', 'BlockedDate')
+
+    for period in BlockedDate.objects.all():
+        day = period.start_date
+        while day <= period.end_date:
+            for availability in PsychologistAvailability.objects.filter(
+                psychologist_id=period.psychologist_id,
+                weekday=day.weekday()
+            ):
+                if str(day) not in availability.blocked_dates:
+                    availability.blocked_dates.append(str(day))
+                    availability.save(update_fields=['blocked_dates'])
+            day += timedelta(days=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_blockeddate'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:39
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_migrate_blocked_dates'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='psychologistavailability',
+            name='blocked_dates',
+        ),
+    ]
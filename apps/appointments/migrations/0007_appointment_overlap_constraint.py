@@ -0,0 +1,82 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:41
+
+import logging
+
+import apps.appointments.models
+import django.contrib.postgres.constraints
+from django.conf import settings
+from django.db import migrations, models
+
+logger = logging.getLogger('apps')
+
+# ACTIVE_STATUSES al crear esta migración
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+
+def cancel_overlapping_appointments(apps, schema_editor):
+    """
+    El unique_together anterior solo impedía dos citas con la misma hora de
+    inicio; una clínica puede tener citas activas que se superponen, y la
+    restricción no se podría crear. Por psicólogo y día se conservan primero
+    las confirmadas y luego las más antiguas; las que se cruzan con una
+    conservada se cancelan, con una nota, y se informan en el log.
+    """
+    Appointment = apps.get_model('appointments', 'Appointment')
+
+    by_day = {}
+    for appointment in Appointment.objects.filter(status__in=ACTIVE_STATUSES).only(
+        'id', 'psychologist_id', 'appointment_date', 'start_time', 'end_time', 'status', 'notes'
+    ):
+        by_day.setdefault((appointment.psychologist_id, appointment.appointment_date), []).append(appointment)
+
+    for appointments in by_day.values():
+        if len(appointments) < 2:
+            continue
+        kept = []
+        for appointment in sorted(appointments, key=lambda a: (a.status != 'confirmed', a.id)):
+            conflict = next((
+                other for other in kept
+                if other.start_time < appointment.end_time and other.end_time > appointment.start_time
+            ), None)
+            if conflict is None:
+                kept.append(appointment)
+                continue
+            note = f'Cancelada al migrar: se superponía con la cita {conflict.id}.'
+            appointment.status = 'cancelled'
+            appointment.notes = f'{appointment.notes}\n{note}'.strip()
+            appointment.save(update_fields=['status', 'notes'])
+            logger.warning(
+                f"Cita {appointment.id} cancelada en '{schema_editor.connection.schema_name}': "
+                f"se superponía con la cita {conflict.id} ({appointment.appointment_date})."
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_remove_psychologistavailability_blocked_dates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # btree_gist permite usar '=' sobre psychologist_id en un índice GiST.
+        # Se instala en 'public' para que todos los esquemas de tenants la vean.
+        migrations.RunSQL(
+            'CREATE EXTENSION IF NOT EXISTS btree_gist WITH SCHEMA public;',
+            reverse_sql=migrations.RunSQL.noop
+        ),
+        migrations.AlterUniqueTogether(
+            name='appointment',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='time_range',
+            field=models.GeneratedField(db_persist=True, expression=apps.appointments.models.TimestampRange('appointment_date', 'start_time', 'end_time'), output_field=apps.appointments.models.TimestampRangeField()),
+        ),
+        migrations.RunPython(cancel_overlapping_appointments, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['pending', 'confirmed'])), expressions=[('psychologist', '='), ('time_range', '&&')], name='appointment_no_overlap', violation_error_message='Ya existe una cita en este horario'),
+        ),
+    ]
@@ -2,10 +2,57 @@
 
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import datetime, timedelta
 
+# Estados de cita que ocupan un horario
+ACTIVE_STATUSES = ['pending', 'confirmed']
+
+# Nombre de la restricción de solapamiento (para reconocer el IntegrityError)
+OVERLAP_CONSTRAINT_NAME = 'appointment_no_overlap'
+
+# SQLSTATE de PostgreSQL para exclusion_violation
+EXCLUSION_VIOLATION = '23P01'
+
+
+class TimestampRangeField(DateTimeRangeField):
+    """Rango de timestamps sin zona horaria (tsrange de PostgreSQL)"""
+    def db_type(self, connection):
+        return 'tsrange'
+
+
+class TimestampRange(models.Func):
+    """tsrange(fecha + hora_inicio, fecha + hora_fin, '[)')"""
+    function = 'TSRANGE'
+    
+    def __init__(self, date, start_time, end_time, **extra):
+        super().__init__(
+            models.ExpressionWrapper(models.F(date) + models.F(start_time), output_field=models.DateTimeField()),
+            models.ExpressionWrapper(models.F(date) + models.F(end_time), output_field=models.DateTimeField()),
+            models.Value('[)'),
+            output_field=TimestampRangeField(),
+            **extra
+        )
+
+
+class PsychologistAvailabilityQuerySet(models.QuerySet):
+    def available_on(self, day):
+        """
+        Bloques activos del día de la semana de `day` cuyo psicólogo
+        no tiene esa fecha bloqueada (filtrado en SQL)
+        """
+        blocked = BlockedDate.objects.filter(
+            psychologist=models.OuterRef('psychologist')
+        ).covering(day)
+        return self.filter(
+            weekday=day.weekday(),
+            is_active=True
+        ).exclude(models.Exists(blocked))
+
+
 class PsychologistAvailability(models.Model):
     """
     Define los horarios disponibles de cada psicólogo
@@ -31,8 +78,9 @@ class PsychologistAvailability(models.Model):
     end_time = models.TimeField()
     is_active = models.BooleanField(default=True)
     
-    # Para bloqueos específicos (vacaciones, etc)
-    blocked_dates = models.JSONField(default=list, blank=True)  # Lista de fechas bloqueadas
+    # Los bloqueos específicos (vacaciones, etc) están en BlockedDate
+    
+    objects = PsychologistAvailabilityQuerySet.as_manager()
     
     class Meta:
         unique_together = ['psychologist', 'weekday', 'start_time']
@@ -40,14 +88,151 @@ class PsychologistAvailability(models.Model):
         verbose_name = 'Disponibilidad'
         verbose_name_plural = 'Disponibilidades'
     
+    # Día guardado, para regenerar también el índice de slots si cambia
+    _original_weekday = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_weekday = dict(zip(field_names, values)).get('weekday')
+        return instance
+    
     def clean(self):
         if self.start_time >= self.end_time:
             raise ValidationError('La hora de inicio debe ser menor que la hora de fin')
     
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        
+        # Mantener el índice de slots
+        from .slot_index import rebuild_weekday_slots
+        for weekday in {self._original_weekday, self.weekday} - {None}:
+            rebuild_weekday_slots(self.psychologist_id, weekday)
+        self._original_weekday = self.weekday
+    
+    def delete(self, *args, **kwargs):
+        psychologist_id, weekday = self.psychologist_id, self.weekday
+        result = super().delete(*args, **kwargs)
+        
+        from .slot_index import rebuild_weekday_slots
+        rebuild_weekday_slots(psychologist_id, weekday)
+        return result
+    
     def __str__(self):
         return f"{self.psychologist.get_full_name()} - {self.get_weekday_display()} {self.start_time}-{self.end_time}"
 
 
+class BlockedDateQuerySet(models.QuerySet):
+    def covering(self, day):
+        """Bloqueos que incluyen la fecha `day`"""
+        return self.filter(start_date__lte=day, end_date__gte=day)
+    
+    def overlapping(self, date_from, date_to):
+        """Bloqueos que se cruzan con el rango [date_from, date_to]"""
+        return self.filter(start_date__lte=date_to, end_date__gte=date_from)
+
+
+class BlockedDate(models.Model):
+    """
+    Fechas bloqueadas de un psicólogo (un día suelto o un rango, ej: vacaciones).
+    Ambos extremos del rango son inclusivos.
+    """
+    psychologist = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='blocked_periods',
+        limit_choices_to={'user_type': 'professional'}
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    objects = BlockedDateQuerySet.as_manager()
+    
+    class Meta:
+        ordering = ['start_date']
+        verbose_name = 'Fecha bloqueada'
+        verbose_name_plural = 'Fechas bloqueadas'
+        indexes = [
+            models.Index(
+                fields=['psychologist', 'start_date', 'end_date'],
+                name='blocked_psych_range_idx'
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_date__gte=models.F('start_date')),
+                name='blocked_date_valid_range'
+            ),
+        ]
+    
+    def clean(self):
+        if self.start_date and self.end_date and self.end_date < self.start_date:
+            raise ValidationError('La fecha de fin debe ser igual o posterior a la fecha de inicio')
+    
+    def days(self):
+        """Fechas incluidas en el bloqueo"""
+        return [
+            self.start_date + timedelta(days=i)
+            for i in range((self.end_date - self.start_date).days + 1)
+        ]
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        
+        from .slot_index import rebuild_slots
+        rebuild_slots(self.psychologist_id, self.days())
+    
+    def delete(self, *args, **kwargs):
+        psychologist_id, days = self.psychologist_id, self.days()
+        result = super().delete(*args, **kwargs)
+        
+        from .slot_index import rebuild_slots
+        rebuild_slots(psychologist_id, days)
+        return result
+    
+    @classmethod
+    def block(cls, psychologist, start_date, end_date=None, reason=''):
+        """Bloquea una fecha o un rango si no estaba ya cubierto"""
+        end_date = end_date or start_date
+        existing = cls.objects.filter(
+            psychologist=psychologist,
+            start_date__lte=start_date,
+            end_date__gte=end_date
+        ).first()
+        if existing:
+            return existing
+        return cls.objects.create(
+            psychologist=psychologist,
+            start_date=start_date,
+            end_date=end_date,
+            reason=reason
+        )
+    
+    @classmethod
+    def unblock(cls, psychologist, day):
+        """Desbloquea una fecha, partiendo los rangos que la contienen"""
+        for period in cls.objects.filter(psychologist=psychologist).covering(day):
+            before = (period.start_date, day - timedelta(days=1))
+            after = (day + timedelta(days=1), period.end_date)
+            period.delete()
+            
+            for start_date, end_date in (before, after):
+                if start_date <= end_date:
+                    cls.objects.create(
+                        psychologist=psychologist,
+                        start_date=start_date,
+                        end_date=end_date,
+                        reason=period.reason
+                    )
+    
+    def __str__(self):
+        if self.start_date == self.end_date:
+            return f"{self.psychologist.get_full_name()} - {self.start_date}"
+        return f"{self.psychologist.get_full_name()} - {self.start_date} a {self.end_date}"
+
+
 class Appointment(models.Model):
     """
     Modelo para las citas entre pacientes y psicólogos
@@ -120,11 +305,71 @@ class Appointment(models.Model):
     # Para videollamadas
     meeting_link = models.URLField(blank=True, null=True)
     
+    # Rango [inicio, fin) calculado por PostgreSQL, usado por la restricción de solapamiento
+    time_range = models.GeneratedField(
+        expression=TimestampRange('appointment_date', 'start_time', 'end_time'),
+        output_field=TimestampRangeField(),
+        db_persist=True
+    )
+    
     class Meta:
         ordering = ['-appointment_date', '-start_time']
-        unique_together = ['psychologist', 'appointment_date', 'start_time']
         verbose_name = 'Cita'
         verbose_name_plural = 'Citas'
+        indexes = [
+            # Listados e historial por usuario, en el orden del cursor de la API
+            models.Index(
+                fields=['psychologist', '-appointment_date', '-start_time', '-id'],
+                name='appt_psych_date_id_idx'
+            ),
+            models.Index(
+                fields=['patient', '-appointment_date', '-start_time', '-id'],
+                name='appt_patient_date_id_idx'
+            ),
+            # Citas activas: próximas citas, agenda y cálculo de slots ocupados
+            models.Index(
+                fields=['psychologist', 'appointment_date', 'start_time'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='appt_psych_active_idx'
+            ),
+            models.Index(
+                fields=['patient', 'appointment_date'],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                name='appt_patient_active_idx'
+            ),
+            # Pacientes atendidos por un psicólogo (index-only scan)
+            models.Index(fields=['psychologist', 'patient'], name='appt_psych_patient_idx'),
+        ]
+        constraints = [
+            # Un psicólogo no puede tener dos citas activas que se solapen.
+            # Lo garantiza la base de datos, también con reservas concurrentes.
+            ExclusionConstraint(
+                name=OVERLAP_CONSTRAINT_NAME,
+                expressions=[
+                    ('psychologist', RangeOperators.EQUAL),
+                    ('time_range', RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=ACTIVE_STATUSES),
+                violation_error_message='Ya existe una cita en este horario'
+            ),
+        ]
+    
+    # Campos que afectan al índice de slots
+    SLOT_FIELDS = ('psychologist_id', 'appointment_date', 'start_time', 'end_time', 'status')
+    
+    # Valores guardados de SLOT_FIELDS (None si la cita es nueva o se cargó sin ellos)
+    _original_slot_key = None
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in cls.SLOT_FIELDS):
+            instance._original_slot_key = tuple(loaded[field] for field in cls.SLOT_FIELDS)
+        return instance
+    
+    def _slot_key(self):
+        return tuple(getattr(self, field) for field in self.SLOT_FIELDS)
     
     def clean(self):
         # Validar que no sea en el pasado
@@ -135,43 +380,31 @@ class Appointment(models.Model):
         if not self.is_within_availability():
             raise ValidationError('El psicólogo no está disponible en este horario')
         
-        # Validar que no haya conflictos con otras citas
-        if self.has_conflict():
-            raise ValidationError('Ya existe una cita en este horario')
+        # Los conflictos con otras citas los valida la restricción OVERLAP_CONSTRAINT_NAME
     
     def is_within_availability(self):
         """Verifica si la cita está dentro del horario disponible del psicólogo"""
-        weekday = self.appointment_date.weekday()
-        
-        # Verificar si la fecha está bloqueada
-        availabilities = self.psychologist.availabilities.filter(
-            weekday=weekday,
-            is_active=True
-        )
-        
-        for availability in availabilities:
-            # Verificar si la fecha específica está bloqueada
-            if str(self.appointment_date) in availability.blocked_dates:
-                return False
-            
-            # Verificar si el horario está dentro del rango disponible
-            if (availability.start_time <= self.start_time and 
-                self.end_time <= availability.end_time):
-                return True
-        
-        return False
-    
-    def has_conflict(self):
-        """Verifica si hay conflicto con otras citas"""
-        return Appointment.objects.filter(
+        # Una sola consulta: bloque activo que contiene el horario y fecha no bloqueada
+        return PsychologistAvailability.objects.available_on(self.appointment_date).filter(
             psychologist=self.psychologist,
-            appointment_date=self.appointment_date,
-            status__in=['pending', 'confirmed']
-        ).exclude(pk=self.pk).filter(
-            models.Q(start_time__lt=self.end_time) & 
-            models.Q(end_time__gt=self.start_time)
+            start_time__lte=self.start_time,
+            end_time__gte=self.end_time
         ).exists()
     
+    @staticmethod
+    def is_overlap_error(error):
+        """
+        Indica si un IntegrityError viene de la restricción de solapamiento:
+        exclusion_violation (23P01) sobre OVERLAP_CONSTRAINT_NAME, según el
+        diagnóstico de psycopg2 y no el texto del mensaje
+        """
+        cause = error.__cause__
+        diag = getattr(cause, 'diag', None)
+        return (
+            getattr(cause, 'pgcode', None) == EXCLUSION_VIOLATION
+            and getattr(diag, 'constraint_name', None) == OVERLAP_CONSTRAINT_NAME
+        )
+    
     def save(self, *args, **kwargs):
         # Auto-calcular hora de fin basado en la duración de sesión del psicólogo
         if not self.end_time and hasattr(self.psychologist, 'professional_profile'):
@@ -185,6 +418,36 @@ class Appointment(models.Model):
             self.consultation_fee = self.psychologist.professional_profile.consultation_fee
         
         super().save(*args, **kwargs)
+        self._refresh_slot_index()
+    
+    def delete(self, *args, **kwargs):
+        slot_key = self._original_slot_key or self._slot_key()
+        result = super().delete(*args, **kwargs)
+        
+        # Solo una cita activa ocupaba slots
+        if slot_key[4] in ACTIVE_STATUSES:
+            from .slot_index import rebuild_slots
+            rebuild_slots(slot_key[0], [slot_key[1]])
+        return result
+    
+    def _refresh_slot_index(self):
+        """
+        Regenera los slots de los días afectados por esta cita, solo si cambió
+        alguno de SLOT_FIELDS y la cita estaba o queda activa
+        """
+        original, current = self._original_slot_key, self._slot_key()
+        self._original_slot_key = current
+        if original == current:
+            return
+        if not any(key and key[4] in ACTIVE_STATUSES for key in (original, current)):
+            return
+        
+        from .slot_index import rebuild_slots
+        days = {(current[0], current[1])}
+        if original is not None:
+            days.add((original[0], original[1]))
+        for psychologist_id, day in days:
+            rebuild_slots(psychologist_id, [day])
     
     def __str__(self):
         return f"{self.patient.get_full_name()} con {self.psychologist.get_full_name()} - {self.appointment_date} {self.start_time}"
@@ -192,7 +455,8 @@ class Appointment(models.Model):
 
 class TimeSlot(models.Model):
     """
-    Modelo auxiliar para generar slots de tiempo disponibles
+    Índice materializado de slots de tiempo por psicólogo.
+    Se mantiene desde apps.appointments.slot_index
     """
     psychologist = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -207,6 +471,14 @@ class TimeSlot(models.Model):
     class Meta:
         unique_together = ['psychologist', 'date', 'start_time']
         ordering = ['date', 'start_time']
+        indexes = [
+            # "¿Quién está libre el día X a la hora Y?"
+            models.Index(
+                fields=['date', 'start_time'],
+                condition=models.Q(is_available=True),
+                name='timeslot_free_date_start_idx'
+            ),
+        ]
     
     def __str__(self):
         return f"{self.psychologist.get_full_name()} - {self.date} {self.start_time}-{self.end_time}"
\ No newline at end of file
@@ -0,0 +1,139 @@
+# apps/appointments/pagination.py
+
+"""
+Paginación por cursor (keyset) para listados de citas.
+
+El cursor guarda la clave (appointment_date, start_time, id) de la última cita
+de la página, y la página siguiente se obtiene filtrando por esa clave en lugar
+de usar OFFSET. Así una página profunda cuesta lo mismo que la primera, usando
+los índices (psychologist|patient, -appointment_date, -start_time, -id).
+
+El cursor es opcional (AppointmentPagination): sin `?cursor` el listado
+responde como antes con PageNumberPagination (count/next/previous/results),
+y los clientes que quieran keyset piden la primera página con `?cursor=`.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, time
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class AppointmentCursorPagination(BasePagination):
+    """Citas de la más reciente a la más antigua, paginadas por cursor"""
+    ordering = ('-appointment_date', '-start_time', '-id')
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE or 30
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        cursor = self.decode_cursor(request)
+        if cursor:
+            queryset = queryset.filter(self.after(*cursor))
+
+        # Se pide una fila extra para saber si hay página siguiente
+        results = list(queryset[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def after(self, appointment_date, start_time, pk):
+        """Citas posteriores a la clave dada en el orden descendente"""
+        return (
+            Q(appointment_date__lt=appointment_date) |
+            Q(appointment_date=appointment_date, start_time__lt=start_time) |
+            Q(appointment_date=appointment_date, start_time=start_time, id__lt=pk)
+        )
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, appointment):
+        key = f'{appointment.appointment_date.isoformat()},{appointment.start_time.isoformat()},{appointment.pk}'
+        return urlsafe_b64encode(key.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_date, raw_time, raw_pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split(',')
+            return date.fromisoformat(raw_date), time.fromisoformat(raw_time), int(raw_pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_first_link(self):
+        return remove_query_param(self.base_url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'first': self.get_first_link(),
+            'results': data
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class AppointmentPagination(BasePagination):
+    """
+    PageNumberPagination por defecto (compatible con los clientes existentes);
+    AppointmentCursorPagination si la petición trae `cursor` (vacío = primera
+    página).
+    """
+    cursor_query_param = AppointmentCursorPagination.cursor_query_param
+
+    def __init__(self):
+        self.page_number = PageNumberPagination()
+        self.cursor = AppointmentCursorPagination()
+        self.active = self.page_number
+
+    @classmethod
+    def wants_cursor(cls, request):
+        return cls.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.cursor if self.wants_cursor(request) else self.page_number
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.active.to_html()
+
+    def get_results(self, data):
+        return data['results']
@@ -0,0 +1,262 @@
+# apps/appointments/scheduling.py
+
+"""
+Motor de agenda de los psicólogos.
+
+Carga la disponibilidad semanal y las citas activas de un rango de fechas
+con una consulta cada una, y calcula en memoria qué slots están libres u
+ocupados con un barrido de intervalos (sin un EXISTS por slot).
+"""
+
+import heapq
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from .models import ACTIVE_STATUSES, Appointment, BlockedDate, PsychologistAvailability
+
+# Duración por defecto si el psicólogo no tiene perfil profesional
+DEFAULT_SESSION_DURATION = 60
+
+DAY_NAMES = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
+
+
+def get_session_duration(psychologist):
+    """Duración de sesión del psicólogo en minutos"""
+    if hasattr(psychologist, 'professional_profile'):
+        return psychologist.professional_profile.session_duration
+    return DEFAULT_SESSION_DURATION
+
+
+def load_session_duration(psychologist_id):
+    """Duración de sesión de un psicólogo a partir de su id, con una consulta"""
+    from apps.professionals.models import ProfessionalProfile
+    duration = ProfessionalProfile.objects.filter(user_id=psychologist_id).values_list(
+        'session_duration', flat=True
+    ).first()
+    return DEFAULT_SESSION_DURATION if duration is None else duration
+
+
+def load_availabilities(psychologist_ids, weekdays=None):
+    """
+    Disponibilidades activas de varios psicólogos en UNA consulta.
+    Devuelve {psychologist_id: {weekday: [availability, ...]}}
+    """
+    queryset = PsychologistAvailability.objects.filter(
+        psychologist_id__in=psychologist_ids,
+        is_active=True
+    )
+    if weekdays is not None:
+        queryset = queryset.filter(weekday__in=set(weekdays))
+
+    availabilities = defaultdict(lambda: defaultdict(list))
+    for availability in queryset.order_by('weekday', 'start_time'):
+        availabilities[availability.psychologist_id][availability.weekday].append(availability)
+    return availabilities
+
+
+def load_busy_intervals(psychologist_ids, date_from, date_to):
+    """
+    Intervalos ocupados por citas activas en UNA consulta.
+    Devuelve {(psychologist_id, fecha): [(start_time, end_time), ...]} ordenado por inicio.
+    """
+    appointments = Appointment.objects.filter(
+        psychologist_id__in=psychologist_ids,
+        appointment_date__gte=date_from,
+        appointment_date__lte=date_to,
+        status__in=ACTIVE_STATUSES
+    ).order_by('appointment_date', 'start_time').values_list(
+        'psychologist_id', 'appointment_date', 'start_time', 'end_time'
+    )
+
+    busy = defaultdict(list)
+    for psychologist_id, appointment_date, start_time, end_time in appointments:
+        busy[(psychologist_id, appointment_date)].append((start_time, end_time))
+    return busy
+
+
+def load_blocked_days(psychologist_ids, date_from, date_to):
+    """
+    Fechas bloqueadas en el rango, en UNA consulta.
+    Devuelve un set de (psychologist_id, fecha).
+    """
+    periods = BlockedDate.objects.filter(
+        psychologist_id__in=psychologist_ids
+    ).overlapping(date_from, date_to).values_list('psychologist_id', 'start_date', 'end_date')
+
+    blocked = set()
+    for psychologist_id, start_date, end_date in periods:
+        day = max(start_date, date_from)
+        while day <= min(end_date, date_to):
+            blocked.add((psychologist_id, day))
+            day += timedelta(days=1)
+    return blocked
+
+
+def generate_slots(day, start_time, end_time, duration):
+    """Genera los pares (inicio, fin) de un bloque de disponibilidad"""
+    current = datetime.combine(day, start_time)
+    limit = datetime.combine(day, end_time)
+    step = timedelta(minutes=duration)
+
+    slots = []
+    while current + step <= limit:
+        slots.append((current.time(), (current + step).time()))
+        current += step
+    return slots
+
+
+def mark_booked(slots, busy_intervals):
+    """
+    Barrido de intervalos: devuelve una lista de booleanos (ocupado o no)
+    alineada con `slots`. Un slot está ocupado si alguna cita cumple
+    inicio_cita < fin_slot y fin_cita > inicio_slot.
+    """
+    booked = [False] * len(slots)
+    if not slots or not busy_intervals:
+        return booked
+
+    intervals = sorted(busy_intervals)
+    order = sorted(range(len(slots)), key=lambda i: slots[i])
+    open_ends = []  # heap con los fines de las citas que ya empezaron
+    next_interval = 0
+
+    for i in order:
+        slot_start, slot_end = slots[i]
+
+        # Abrir las citas que empiezan antes del fin del slot
+        while next_interval < len(intervals) and intervals[next_interval][0] < slot_end:
+            heapq.heappush(open_ends, intervals[next_interval][1])
+            next_interval += 1
+
+        # Cerrar las citas que terminan antes del inicio del slot
+        while open_ends and open_ends[0] <= slot_start:
+            heapq.heappop(open_ends)
+
+        booked[i] = bool(open_ends)
+
+    return booked
+
+
+def compute_day_slots(day, availabilities, busy_intervals, duration, is_blocked=False):
+    """
+    Calcula los slots de un día a partir de datos ya cargados.
+    No hace consultas a la base de datos.
+    Devuelve (is_available, blocked, [(inicio, fin, ocupado), ...])
+    """
+    if is_blocked:
+        return False, bool(availabilities), []
+
+    is_available = bool(availabilities)
+    slots = []
+    for availability in availabilities:
+        slots.extend(generate_slots(day, availability.start_time, availability.end_time, duration))
+
+    booked = mark_booked(slots, busy_intervals)
+    return is_available, False, [
+        (slot_start, slot_end, is_booked)
+        for (slot_start, slot_end), is_booked in zip(slots, booked)
+    ]
+
+
+def build_day_schedule(day, availabilities, busy_intervals, duration, is_blocked=False):
+    """Horario de un día en el formato de la API"""
+    is_available, blocked, slots = compute_day_slots(
+        day, availabilities, busy_intervals, duration, is_blocked
+    )
+
+    return {
+        'date': day.strftime('%Y-%m-%d'),
+        'weekday': day.weekday(),
+        'day_name': DAY_NAMES[day.weekday()],
+        'is_available': is_available,
+        'blocked': blocked,
+        'time_slots': [
+            {
+                'start_time': slot_start.strftime('%H:%M'),
+                'end_time': slot_end.strftime('%H:%M'),
+                'is_available': not is_booked,
+                'is_booked': is_booked
+            }
+            for slot_start, slot_end, is_booked in slots
+        ]
+    }
+
+
+def get_schedule(psychologist, start_date, days=7):
+    """
+    Horario de un psicólogo para `days` días desde `start_date`.
+    Usa tres consultas (disponibilidades, bloqueos y citas) sin importar cuántos slots haya.
+    """
+    dates = [start_date + timedelta(days=i) for i in range(days)]
+    duration = get_session_duration(psychologist)
+
+    availabilities = load_availabilities([psychologist.id], [d.weekday() for d in dates])
+    busy = load_busy_intervals([psychologist.id], dates[0], dates[-1])
+    blocked = load_blocked_days([psychologist.id], dates[0], dates[-1])
+    psychologist_availabilities = availabilities[psychologist.id]
+
+    return [
+        build_day_schedule(
+            day,
+            psychologist_availabilities[day.weekday()],
+            busy[(psychologist.id, day)],
+            duration,
+            (psychologist.id, day) in blocked
+        )
+        for day in dates
+    ]
+
+
+def free_slots(day_schedule):
+    """Slots libres de un horario diario (formato del buscador)"""
+    return [
+        {
+            'start_time': slot['start_time'],
+            'end_time': slot['end_time'],
+            'is_available': True
+        }
+        for slot in day_schedule['time_slots']
+        if slot['is_available']
+    ]
+
+
+def has_free_slot_at(day_schedule, at_time):
+    """Indica si el horario diario tiene un slot libre que cubre `at_time`"""
+    at = at_time.strftime('%H:%M')
+    return any(
+        slot['is_available'] and slot['start_time'] <= at < slot['end_time']
+        for slot in day_schedule['time_slots']
+    )
+
+
+def get_available_slots(psychologist, day):
+    """Slots libres de un psicólogo en una fecha"""
+    return free_slots(get_schedule(psychologist, day, days=1)[0])
+
+
+def load_day_schedules(psychologists, day):
+    """
+    Horario de un día para varios psicólogos a la vez.
+    Tres consultas en total (disponibilidades, bloqueos y citas), no por psicólogo.
+    Los psicólogos deben traer `professional_profile` con select_related
+    para no consultar la duración de sesión uno por uno.
+    Devuelve {psychologist_id: day_schedule}
+    """
+    psychologist_ids = [psychologist.id for psychologist in psychologists]
+    if not psychologist_ids:
+        return {}
+
+    availabilities = load_availabilities(psychologist_ids, [day.weekday()])
+    busy = load_busy_intervals(psychologist_ids, day, day)
+    blocked = load_blocked_days(psychologist_ids, day, day)
+
+    return {
+        psychologist.id: build_day_schedule(
+            day,
+            availabilities[psychologist.id][day.weekday()],
+            busy[(psychologist.id, day)],
+            get_session_duration(psychologist),
+            (psychologist.id, day) in blocked
+        )
+        for psychologist in psychologists
+    }
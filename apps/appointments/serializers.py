@@ -1,9 +1,12 @@
 # apps/appointments/serializers.py
 
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from django.contrib.auth import get_user_model
-from .models import Appointment, PsychologistAvailability, TimeSlot
+from django.db import IntegrityError, transaction
+from .models import Appointment, BlockedDate, PsychologistAvailability, TimeSlot
 from apps.professionals.serializers import ProfessionalProfileSerializer
+from .scheduling import free_slots, get_available_slots
 from datetime import datetime, timedelta
 
 User = get_user_model()
@@ -12,6 +15,7 @@ User = get_user_model()
 class PsychologistAvailabilitySerializer(serializers.ModelSerializer):
     psychologist_name = serializers.CharField(source='psychologist.get_full_name', read_only=True)
     weekday_display = serializers.CharField(source='get_weekday_display', read_only=True)
+    blocked_dates = serializers.SerializerMethodField()
     
     class Meta:
         model = PsychologistAvailability
@@ -22,6 +26,16 @@ class PsychologistAvailabilitySerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'psychologist_name', 'weekday_display']
     
+    def get_blocked_dates(self, obj):
+        """Fechas bloqueadas vigentes que caen en el día de este bloque"""
+        today = datetime.now().date()
+        dates = []
+        for period in obj.psychologist.blocked_periods.all():
+            for day in period.days():
+                if day >= today and day.weekday() == obj.weekday:
+                    dates.append(str(day))
+        return sorted(dates)
+    
     def validate(self, data):
         if data.get('start_time') and data.get('end_time'):
             if data['start_time'] >= data['end_time']:
@@ -41,9 +55,60 @@ class TimeSlotSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'psychologist_name']
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentOverlapMixin:
+    """
+    Guarda la cita dentro de un savepoint y traduce la violación de la
+    restricción de solapamiento al error de validación habitual.
+    Evita consultar conflictos antes de insertar (lento y con condiciones de carrera).
+    """
+    overlap_error_message = "Ya existe una cita en este horario"
+    
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as e:
+            self._raise_if_overlap(e)
+            raise
+    
+    def update(self, instance, validated_data):
+        try:
+            with transaction.atomic():
+                return super().update(instance, validated_data)
+        except IntegrityError as e:
+            self._raise_if_overlap(e)
+            raise
+    
+    def _raise_if_overlap(self, error):
+        if Appointment.is_overlap_error(error):
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [self.overlap_error_message]
+            })
+
+
+class EagerLoadingMixin:
+    """
+    Cada serializer declara las relaciones que lee, para que las vistas
+    las carguen junto con el queryset y no haya una consulta por fila.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+    
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
+class AppointmentSerializer(EagerLoadingMixin, AppointmentOverlapMixin, serializers.ModelSerializer):
     patient_name = serializers.CharField(source='patient.get_full_name', read_only=True)
     psychologist_name = serializers.CharField(source='psychologist.get_full_name', read_only=True)
+    
+    # patient_name y psychologist_name
+    select_related_fields = ['patient', 'psychologist']
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     appointment_type_display = serializers.CharField(source='get_appointment_type_display', read_only=True)
     
@@ -94,45 +159,30 @@ class AppointmentSerializer(serializers.ModelSerializer):
             
             # Verificar disponibilidad
             weekday = appointment_date.weekday()
-            availability = PsychologistAvailability.objects.filter(
+            has_availability = PsychologistAvailability.objects.filter(
                 psychologist=psychologist,
                 weekday=weekday,
                 is_active=True,
                 start_time__lte=start_time,
                 end_time__gte=calculated_end_time # <-- Usamos la variable calculada
-            ).first()
+            ).exists()
             
-            if not availability:
+            if not has_availability:
                 raise serializers.ValidationError(
                     "El psicólogo no está disponible en este horario"
                 )
             
             # Verificar si la fecha está bloqueada
-            if str(appointment_date) in availability.blocked_dates:
+            if BlockedDate.objects.filter(psychologist=psychologist).covering(appointment_date).exists():
                 raise serializers.ValidationError(
                     "El psicólogo no está disponible en esta fecha"
                 )
             
-            # Verificar conflictos con otras citas
-            conflicting_appointments = Appointment.objects.filter(
-                psychologist=psychologist,
-                appointment_date=appointment_date,
-                status__in=['pending', 'confirmed']
-            ).filter(
-                start_time__lt=calculated_end_time, # <-- Usamos la variable calculada
-                end_time__gt=start_time
-            )
-            
-            if self.instance:
-                conflicting_appointments = conflicting_appointments.exclude(pk=self.instance.pk)
-            
-            if conflicting_appointments.exists():
-                raise serializers.ValidationError(
-                    "Ya existe una cita en este horario"
-                )
+            # Los conflictos con otras citas los detecta la restricción de la base de datos
+            # al guardar (ver AppointmentOverlapMixin)
         
         return data
-class AppointmentCreateSerializer(serializers.ModelSerializer):
+class AppointmentCreateSerializer(AppointmentOverlapMixin, serializers.ModelSerializer):
     """Serializer específico para crear citas"""
     
     # --- ARREGLO 1: AÑADIR ESTA LÍNEA ---
@@ -179,38 +229,25 @@ class AppointmentCreateSerializer(serializers.ModelSerializer):
 
         # Validar disponibilidad
         weekday = appointment_date.weekday()
-        availability = PsychologistAvailability.objects.filter(
+        has_availability = PsychologistAvailability.objects.filter(
             psychologist=psychologist,
             weekday=weekday,
             is_active=True,
             start_time__lte=start_time,
             end_time__gte=calculated_end_time
-        ).first()
+        ).exists()
         
-        if not availability:
+        if not has_availability:
             raise serializers.ValidationError(
                 "El psicólogo no está disponible en este horario"
             )
         
-        if str(appointment_date) in availability.blocked_dates:
+        if BlockedDate.objects.filter(psychologist=psychologist).covering(appointment_date).exists():
             raise serializers.ValidationError(
                 "El psicólogo no está disponible en esta fecha"
             )
         
-        # Validar conflictos
-        conflicting_appointments = Appointment.objects.filter(
-            psychologist=psychologist,
-            appointment_date=appointment_date,
-            status__in=['pending', 'confirmed']
-        ).filter(
-            start_time__lt=calculated_end_time,
-            end_time__gt=start_time
-        )
-        
-        if conflicting_appointments.exists():
-            raise serializers.ValidationError(
-                "Ya existe una cita en este horario"
-            )
+        # Los conflictos se validan al guardar con la restricción de la base de datos
         
         return data
 
@@ -262,54 +299,16 @@ class AvailablePsychologistSerializer(serializers.ModelSerializer):
         except ValueError:
             return []
         
-        # Obtener disponibilidad del día
-        weekday = search_date.weekday()
-        availabilities = obj.availabilities.filter(
-            weekday=weekday,
-            is_active=True
-        )
-        
-        slots = []
-        for availability in availabilities:
-            # Verificar si la fecha está bloqueada
-            if str(search_date) in availability.blocked_dates:
-                continue
-            
-            # Generar slots de tiempo disponibles
-            current_time = datetime.combine(search_date, availability.start_time)
-            end_time = datetime.combine(search_date, availability.end_time)
-            
-            # Duración de sesión
-            duration = 60  # Default
-            if hasattr(obj, 'professional_profile'):
-                duration = obj.professional_profile.session_duration
-            
-            while current_time + timedelta(minutes=duration) <= end_time:
-                slot_start = current_time.time()
-                slot_end = (current_time + timedelta(minutes=duration)).time()
-                
-                # Verificar si el slot está ocupado
-                is_booked = Appointment.objects.filter(
-                    psychologist=obj,
-                    appointment_date=search_date,
-                    start_time__lt=slot_end,
-                    end_time__gt=slot_start,
-                    status__in=['pending', 'confirmed']
-                ).exists()
-                
-                if not is_booked:
-                    slots.append({
-                        'start_time': slot_start.strftime('%H:%M'),
-                        'end_time': slot_end.strftime('%H:%M'),
-                        'is_available': True
-                    })
-                
-                current_time += timedelta(minutes=duration)
+        # Horarios precalculados por la vista de búsqueda para todos los candidatos
+        day_schedules = self.context.get('day_schedules')
+        if day_schedules is not None and obj.id in day_schedules:
+            return free_slots(day_schedules[obj.id])
         
-        return slots
+        # Slots libres calculados en memoria (ver apps.appointments.scheduling)
+        return get_available_slots(obj, search_date)
 
 
-class AppointmentUpdateSerializer(serializers.ModelSerializer):
+class AppointmentUpdateSerializer(AppointmentOverlapMixin, serializers.ModelSerializer):
     """Serializer para actualizar citas (cambiar estado, agregar notas, reprogramar)"""
     
     class Meta:
@@ -0,0 +1,125 @@
+# apps/appointments/slot_index.py
+
+"""
+Índice materializado de slots (modelo TimeSlot).
+
+Guarda los slots de cada psicólogo para los próximos SLOT_INDEX_HORIZON_DAYS
+días, de modo que "¿quién está libre el día X a la hora Y?" se responde con
+una sola consulta indexada. Se regenera por día: los modelos llaman a estas
+funciones al guardar disponibilidades, citas o la duración de sesión, y el
+comando `refresh_time_slots` extiende el horizonte cada día.
+
+Las funciones reciben el id del psicólogo (los modelos ya lo tienen sin
+consultar al usuario) y, opcionalmente, su duración de sesión si ya se conoce.
+"""
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TimeSlot
+from .scheduling import (
+    compute_day_slots,
+    load_availabilities,
+    load_blocked_days,
+    load_busy_intervals,
+    load_session_duration,
+)
+
+# Días hacia adelante que cubre el índice
+SLOT_INDEX_HORIZON_DAYS = 60
+
+
+def horizon_dates(days=SLOT_INDEX_HORIZON_DAYS):
+    """Fechas cubiertas por el índice, desde hoy"""
+    today = timezone.localdate()
+    return [today + timedelta(days=i) for i in range(days)]
+
+
+def rebuild_slots(psychologist_id, dates, duration=None):
+    """
+    Regenera los TimeSlot de un psicólogo para las fechas dadas.
+    Las fechas fuera del horizonte se ignoran.
+    """
+    horizon = set(horizon_dates())
+    dates = sorted(set(dates) & horizon)
+    if not dates:
+        return 0
+
+    if duration is None:
+        duration = load_session_duration(psychologist_id)
+    availabilities = load_availabilities([psychologist_id], {d.weekday() for d in dates})[psychologist_id]
+    busy = load_busy_intervals([psychologist_id], dates[0], dates[-1])
+    blocked = load_blocked_days([psychologist_id], dates[0], dates[-1])
+
+    time_slots = []
+    for day in dates:
+        _, _, slots = compute_day_slots(
+            day,
+            availabilities[day.weekday()],
+            busy[(psychologist_id, day)],
+            duration,
+            (psychologist_id, day) in blocked
+        )
+
+        seen_starts = set()  # Bloques superpuestos pueden repetir un inicio
+        for slot_start, slot_end, is_booked in slots:
+            if slot_start in seen_starts:
+                continue
+            seen_starts.add(slot_start)
+            time_slots.append(TimeSlot(
+                psychologist_id=psychologist_id,
+                date=day,
+                start_time=slot_start,
+                end_time=slot_end,
+                is_available=not is_booked
+            ))
+
+    with transaction.atomic():
+        TimeSlot.objects.filter(psychologist_id=psychologist_id, date__in=dates).delete()
+        TimeSlot.objects.bulk_create(time_slots)
+
+    return len(time_slots)
+
+
+def rebuild_weekday_slots(psychologist_id, weekday):
+    """Regenera las fechas del horizonte que caen en un día de la semana"""
+    return rebuild_slots(psychologist_id, [d for d in horizon_dates() if d.weekday() == weekday])
+
+
+def rebuild_psychologist_slots(psychologist_id, duration=None):
+    """Regenera todo el horizonte de un psicólogo"""
+    return rebuild_slots(psychologist_id, horizon_dates(), duration)
+
+
+def prune_past_slots():
+    """Elimina los slots de fechas que ya pasaron"""
+    deleted, _ = TimeSlot.objects.filter(date__lt=timezone.localdate()).delete()
+    return deleted
+
+
+def free_psychologist_ids(day, at_time):
+    """
+    IDs de psicólogos con un slot libre que cubre `at_time` en `day`.
+    Devuelve un queryset (subconsulta) para usar en filtros `id__in`.
+    """
+    return TimeSlot.objects.filter(
+        date=day,
+        is_available=True,
+        start_time__lte=at_time,
+        end_time__gt=at_time
+    ).values('psychologist_id')
+
+
+def covers(day):
+    """
+    Indica si el índice tiene slots para la fecha: dentro del horizonte y ya
+    generados. El último día del horizonte no existe hasta que corre
+    `refresh_time_slots`, y una restauración JSON no pasa por los modelos;
+    en esos casos hay que calcular la disponibilidad en vivo.
+    """
+    today = timezone.localdate()
+    if not today <= day < today + timedelta(days=SLOT_INDEX_HORIZON_DAYS):
+        return False
+    return TimeSlot.objects.filter(date=day).exists()
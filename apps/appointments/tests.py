@@ -1,3 +1,256 @@
-from django.test import TestCase
+# apps/appointments/tests.py
 
-# Create your tests here.
+from datetime import date, time, timedelta
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import slot_index
+from .management.commands.check_appointment_queries import Command as CheckQueriesCommand
+from .models import Appointment, BlockedDate, TimeSlot
+from .pagination import AppointmentCursorPagination, AppointmentPagination
+from .scheduling import build_day_schedule, compute_day_slots, generate_slots, has_free_slot_at, mark_booked
+from .serializers import AppointmentSerializer
+
+User = get_user_model()
+
+DAY = date(2025, 3, 3)
+
+
+def availability(start, end):
+    return SimpleNamespace(start_time=start, end_time=end)
+
+
+def api_request(path, **params):
+    return Request(APIRequestFactory().get(path, params))
+
+
+class GenerateSlotsTests(SimpleTestCase):
+    def test_only_whole_slots_fit(self):
+        self.assertEqual(generate_slots(DAY, time(9), time(11, 30), 60), [
+            (time(9), time(10)),
+            (time(10), time(11)),
+        ])
+
+    def test_block_shorter_than_a_session_has_no_slots(self):
+        self.assertEqual(generate_slots(DAY, time(9), time(9, 45), 60), [])
+
+
+class MarkBookedTests(SimpleTestCase):
+    slots = [(time(9), time(10)), (time(10), time(11)), (time(11), time(12))]
+
+    def test_overlapping_appointments_book_every_slot_they_touch(self):
+        self.assertEqual(mark_booked(self.slots, [(time(9, 30), time(10, 30))]), [True, True, False])
+
+    def test_touching_boundaries_do_not_book(self):
+        self.assertEqual(mark_booked(self.slots, [(time(8), time(9)), (time(12), time(13))]), [False, False, False])
+        self.assertEqual(mark_booked(self.slots, [(time(10), time(11))]), [False, True, False])
+
+    def test_unsorted_slots_and_intervals(self):
+        slots = self.slots[::-1]
+        busy = [(time(11, 15), time(11, 45)), (time(9), time(9, 15))]
+        self.assertEqual(mark_booked(slots, busy), [True, False, True])
+
+    def test_long_appointment_books_later_slots(self):
+        self.assertEqual(mark_booked(self.slots, [(time(8), time(11, 30))]), [True, True, True])
+
+    def test_empty_inputs(self):
+        self.assertEqual(mark_booked([], [(time(9), time(10))]), [])
+        self.assertEqual(mark_booked(self.slots, []), [False, False, False])
+
+
+class ComputeDaySlotsTests(SimpleTestCase):
+    def test_blocked_day_has_no_slots(self):
+        self.assertEqual(
+            compute_day_slots(DAY, [availability(time(9), time(12))], [], 60, is_blocked=True),
+            (False, True, [])
+        )
+
+    def test_day_without_availability(self):
+        self.assertEqual(compute_day_slots(DAY, [], [(time(9), time(10))], 60), (False, False, []))
+
+    def test_several_blocks_are_combined(self):
+        availabilities = [availability(time(9), time(11)), availability(time(15), time(16))]
+        is_available, blocked, slots = compute_day_slots(DAY, availabilities, [(time(10), time(11))], 60)
+
+        self.assertTrue(is_available)
+        self.assertFalse(blocked)
+        self.assertEqual(slots, [
+            (time(9), time(10), False),
+            (time(10), time(11), True),
+            (time(15), time(16), False),
+        ])
+
+
+class HasFreeSlotAtTests(SimpleTestCase):
+    def test_free_slot_must_cover_the_time(self):
+        schedule = build_day_schedule(DAY, [availability(time(9), time(12))], [(time(10), time(11))], 60)
+
+        self.assertTrue(has_free_slot_at(schedule, time(9, 30)))
+        self.assertFalse(has_free_slot_at(schedule, time(10)))
+        self.assertTrue(has_free_slot_at(schedule, time(11)))
+        self.assertFalse(has_free_slot_at(schedule, time(12)))
+
+
+class AppointmentCursorPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.paginator = AppointmentCursorPagination()
+
+    def test_cursor_round_trip(self):
+        appointment = SimpleNamespace(appointment_date=DAY, start_time=time(9, 30), pk=42)
+        cursor = self.paginator.encode_cursor(appointment)
+
+        self.assertEqual(
+            self.paginator.decode_cursor(api_request('/', cursor=cursor)),
+            (DAY, time(9, 30), 42)
+        )
+
+    def test_empty_cursor_is_the_first_page(self):
+        self.assertIsNone(self.paginator.decode_cursor(api_request('/', cursor='')))
+        self.assertIsNone(self.paginator.decode_cursor(api_request('/')))
+
+    def test_invalid_cursor_is_not_found(self):
+        for cursor in ('!!!', 'bm8tY29tbWFz', 'YSxiLGM=', 'ñ'):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginator.decode_cursor(api_request('/', cursor=cursor))
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(self.paginator.get_page_size(api_request('/', page_size='1000')), self.paginator.max_page_size)
+        self.assertEqual(self.paginator.get_page_size(api_request('/', page_size='0')), 1)
+        self.assertEqual(self.paginator.get_page_size(api_request('/', page_size='x')), self.paginator.page_size)
+
+    def test_cursor_is_opt_in(self):
+        self.assertFalse(AppointmentPagination.wants_cursor(api_request('/')))
+        self.assertTrue(AppointmentPagination.wants_cursor(api_request('/', cursor='')))
+
+
+class ClinicTestCase(TenantTestCase):
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Clínica de pruebas'
+
+    def setUp(self):
+        self.psychologist = User.objects.create_user(
+            'psicologo@test.com', 'clave-segura-123', user_type='professional',
+            first_name='Ana', last_name='Pérez'
+        )
+        self.patient = User.objects.create_user(
+            'paciente@test.com', 'clave-segura-123', user_type='patient',
+            first_name='Luis', last_name='Rojas'
+        )
+
+
+class BlockedDateTests(ClinicTestCase):
+    def periods(self):
+        return list(BlockedDate.objects.filter(psychologist=self.psychologist).values_list('start_date', 'end_date'))
+
+    def test_block_creates_a_period(self):
+        period = BlockedDate.block(self.psychologist, DAY, DAY + timedelta(days=2), reason='Vacaciones')
+
+        self.assertEqual(period.reason, 'Vacaciones')
+        self.assertEqual(self.periods(), [(DAY, DAY + timedelta(days=2))])
+
+    def test_block_returns_the_covering_period(self):
+        period = BlockedDate.block(self.psychologist, DAY, DAY + timedelta(days=5))
+
+        self.assertEqual(BlockedDate.block(self.psychologist, DAY + timedelta(days=1)), period)
+        self.assertEqual(len(self.periods()), 1)
+
+    def test_unblock_splits_the_range(self):
+        BlockedDate.block(self.psychologist, DAY, DAY + timedelta(days=4), reason='Congreso')
+        BlockedDate.unblock(self.psychologist, DAY + timedelta(days=2))
+
+        self.assertEqual(self.periods(), [
+            (DAY, DAY + timedelta(days=1)),
+            (DAY + timedelta(days=3), DAY + timedelta(days=4)),
+        ])
+        self.assertEqual(set(BlockedDate.objects.values_list('reason', flat=True)), {'Congreso'})
+
+    def test_unblock_at_the_edges(self):
+        BlockedDate.block(self.psychologist, DAY, DAY + timedelta(days=2))
+        BlockedDate.unblock(self.psychologist, DAY)
+        BlockedDate.unblock(self.psychologist, DAY + timedelta(days=2))
+
+        self.assertEqual(self.periods(), [(DAY + timedelta(days=1), DAY + timedelta(days=1))])
+
+    def test_unblock_single_day_removes_it(self):
+        BlockedDate.block(self.psychologist, DAY)
+        BlockedDate.unblock(self.psychologist, DAY)
+        BlockedDate.unblock(self.psychologist, DAY + timedelta(days=10))
+
+        self.assertEqual(self.periods(), [])
+
+
+class AppointmentPaginationTests(ClinicTestCase):
+    def setUp(self):
+        super().setUp()
+        # Dos días con citas a la misma hora: el desempate es por id
+        for day in (DAY, DAY + timedelta(days=1)):
+            for hour in (9, 10, 11):
+                Appointment.objects.create(
+                    patient=self.patient, psychologist=self.psychologist,
+                    appointment_date=day, start_time=time(hour), end_time=time(hour + 1)
+                )
+
+    def test_cursor_pages_cover_every_appointment_once(self):
+        expected = list(Appointment.objects.order_by(*AppointmentCursorPagination.ordering).values_list('id', flat=True))
+        seen = []
+        params = {'cursor': '', 'page_size': 4}
+        while True:
+            paginator = AppointmentPagination()
+            page = paginator.paginate_queryset(Appointment.objects.all(), api_request('/api/appointments/', **params))
+            seen.extend(appointment.id for appointment in page)
+            next_link = paginator.get_paginated_response([]).data['next']
+            if next_link is None:
+                break
+            params['cursor'] = paginator.cursor.encode_cursor(page[-1])
+
+        self.assertEqual(seen, expected)
+
+    def test_without_cursor_responds_with_page_numbers(self):
+        paginator = AppointmentPagination()
+        paginator.paginate_queryset(Appointment.objects.order_by('id'), api_request('/api/appointments/'))
+
+        self.assertEqual(paginator.get_paginated_response([]).data['count'], 6)
+
+
+class SlotIndexCoversTests(ClinicTestCase):
+    def test_dates_without_generated_slots_are_not_covered(self):
+        today = timezone.localdate()
+        self.assertFalse(slot_index.covers(today))
+
+        TimeSlot.objects.create(psychologist=self.psychologist, date=today, start_time=time(9), end_time=time(10))
+        self.assertTrue(slot_index.covers(today))
+        self.assertFalse(slot_index.covers(today - timedelta(days=1)))
+        self.assertFalse(slot_index.covers(today + timedelta(days=slot_index.SLOT_INDEX_HORIZON_DAYS)))
+
+
+class AppointmentListQueryTests(ClinicTestCase):
+    def setUp(self):
+        super().setUp()
+        # Un paciente distinto por cita: un N+1 en las relaciones se notaría
+        for number in range(6):
+            patient = User.objects.create_user(
+                f'paciente{number}@test.com', 'clave-segura-123', user_type='patient',
+                first_name='Paciente', last_name=str(number)
+            )
+            Appointment.objects.create(
+                patient=patient, psychologist=self.psychologist,
+                appointment_date=DAY, start_time=time(8 + number), end_time=time(9 + number)
+            )
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        queryset = CheckQueriesCommand.get_viewset_queryset(self.psychologist)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(AppointmentSerializer(queryset[:1], many=True).data), 1)
+
+        with self.assertNumQueries(len(queries)):
+            self.assertEqual(len(AppointmentSerializer(queryset[:6], many=True).data), 6)
@@ -4,11 +4,13 @@ from rest_framework import status, viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Prefetch, Q
 from datetime import datetime, timedelta
-from .models import Appointment, PsychologistAvailability, TimeSlot
-from apps.professionals.models import ProfessionalProfile
+from .models import Appointment, BlockedDate, PsychologistAvailability, TimeSlot
 from apps.professionals.models import ProfessionalProfile
+from .pagination import AppointmentPagination
+from .scheduling import get_schedule, has_free_slot_at, load_day_schedules
+from . import slot_index
 from .serializers import (
     AppointmentSerializer,
     AppointmentCreateSerializer,
@@ -44,6 +46,7 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     """
     serializer_class = AppointmentSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrPsychologist]
+    pagination_class = AppointmentPagination
     
     def get_queryset(self):
         user = self.request.user
@@ -68,6 +71,9 @@ class AppointmentViewSet(viewsets.ModelViewSet):
         if date_to:
             queryset = queryset.filter(appointment_date__lte=date_to)
         
+        # Relaciones que necesita el serializer de respuesta (evita N+1)
+        queryset = AppointmentSerializer.setup_eager_loading(queryset)
+        
         return queryset.order_by('-appointment_date', '-start_time')
     
     def get_serializer_class(self):
@@ -218,8 +224,15 @@ class AppointmentViewSet(viewsets.ModelViewSet):
             Q(appointment_date__lt=today) | Q(status='completed')
         )
         
-        serializer = AppointmentSerializer(appointments, many=True)
-        return Response(serializer.data)
+        if not AppointmentPagination.wants_cursor(request):
+            # Respuesta original (lista completa) para los clientes existentes
+            serializer = AppointmentSerializer(appointments, many=True)
+            return Response(serializer.data)
+        
+        # Con ?cursor= se pagina por cursor sin cargar todo el historial en memoria
+        page = self.paginate_queryset(appointments)
+        serializer = AppointmentSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 # apps/appointments/views.py
@@ -237,7 +250,13 @@ class PsychologistAvailabilityViewSet(viewsets.ModelViewSet):
     pagination_class = None
     
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # Bloqueos vigentes del psicólogo para el campo 'blocked_dates'
+        queryset = super().get_queryset().select_related('psychologist').prefetch_related(
+            Prefetch(
+                'psychologist__blocked_periods',
+                queryset=BlockedDate.objects.filter(end_date__gte=datetime.now().date())
+            )
+        )
         
         # --- 2. ARREGLO DEL FILTRO DE USUARIO ---
         # Comparamos con 'professional' (como está en el modelo)
@@ -289,7 +308,7 @@ class PsychologistAvailabilityViewSet(viewsets.ModelViewSet):
     # ... (el resto de las funciones @action se quedan igual) ...
     @action(detail=True, methods=['post'])
     def block_date(self, request, pk=None):
-        """Bloquear una fecha específica"""
+        """Bloquear una fecha específica o un rango de fechas"""
         availability = self.get_object()
         
         if request.user != availability.psychologist:
@@ -305,12 +324,37 @@ class PsychologistAvailabilityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if date_to_block not in availability.blocked_dates:
-            availability.blocked_dates.append(date_to_block)
-            availability.save()
+        # Opcional: 'end_date' para bloquear un rango (vacaciones)
+        end_date = request.data.get('end_date') or date_to_block
+        try:
+            start = datetime.strptime(date_to_block, '%Y-%m-%d').date()
+            end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        if end < start:
+            return Response(
+                {'error': 'La fecha de fin debe ser igual o posterior a la fecha de inicio'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        BlockedDate.block(
+            availability.psychologist,
+            start,
+            end,
+            reason=request.data.get('reason', '')
+        )
+        
+        if start == end:
+            message = f'Fecha {date_to_block} bloqueada exitosamente'
+        else:
+            message = f'Fechas del {date_to_block} al {end_date} bloqueadas exitosamente'
         
         return Response(
-            {'message': f'Fecha {date_to_block} bloqueada exitosamente'},
+            {'message': message},
             status=status.HTTP_200_OK
         )
     
@@ -332,9 +376,15 @@ class PsychologistAvailabilityViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if date_to_unblock in availability.blocked_dates:
-            availability.blocked_dates.remove(date_to_unblock)
-            availability.save()
+        try:
+            day = datetime.strptime(date_to_unblock, '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Formato de fecha inválido. Use YYYY-MM-DD'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        BlockedDate.unblock(availability.psychologist, day)
         
         return Response(
             {'message': f'Fecha {date_to_unblock} desbloqueada exitosamente'},
@@ -383,12 +433,14 @@ def search_available_psychologists(request):
     # Obtener el día de la semana
     weekday = search_date.weekday()
     
-    # Filtrar psicólogos con disponibilidad en ese día
+    # Filtrar psicólogos con disponibilidad en ese día y sin la fecha bloqueada (en SQL)
     psychologists = User.objects.filter(
         user_type='professional',
         is_active=True,
         availabilities__weekday=weekday,
         availabilities__is_active=True
+    ).exclude(
+        Exists(BlockedDate.objects.filter(psychologist=OuterRef('pk')).covering(search_date))
     ).distinct()
     
     # Filtrar por especialización si se proporciona
@@ -404,6 +456,7 @@ def search_available_psychologists(request):
         )
     
     # Si se proporciona hora específica, filtrar más
+    live_time = None
     if time_str:
         try:
             search_time = datetime.strptime(time_str, '%H:%M').time()
@@ -418,26 +471,39 @@ def search_available_psychologists(request):
             availabilities__start_time__lte=search_time,
             availabilities__end_time__gt=search_time
         )
+        
+        # Con el índice de slots generado para la fecha, exigir un slot libre a esa hora;
+        # si no, se comprueba más abajo con el horario calculado en vivo
+        if slot_index.covers(search_date):
+            psychologists = psychologists.filter(
+                id__in=slot_index.free_psychologist_ids(search_date, search_time)
+            )
+        else:
+            live_time = search_time
     
-    # Filtrar psicólogos que no tengan fechas bloqueadas
-    available_psychologists = []
-    for psychologist in psychologists:
-        availabilities = psychologist.availabilities.filter(
-            weekday=weekday,
-            is_active=True
+    # Cargar perfiles y especialidades de todos los candidatos de una vez
+    psychologists = list(
+        psychologists.select_related('professional_profile').prefetch_related(
+            'professional_profile__specializations',
+            'professional_profile__working_hours'
         )
-        
-        # Verificar si alguna disponibilidad no está bloqueada para esa fecha
-        for availability in availabilities:
-            if str(search_date) not in availability.blocked_dates:
-                available_psychologists.append(psychologist)
-                break
+    )
+
+    # Horario del día de todos los candidatos en memoria (sin consultas por psicólogo)
+    day_schedules = load_day_schedules(psychologists, search_date)
+
+    # Descartar psicólogos sin slots generables ese día (o sin uno libre a la hora pedida)
+    available_psychologists = [
+        psychologist for psychologist in psychologists
+        if day_schedules[psychologist.id]['is_available']
+        and (live_time is None or has_free_slot_at(day_schedules[psychologist.id], live_time))
+    ]
     
     # Serializar y devolver
     serializer = AvailablePsychologistSerializer(
         available_psychologists,
         many=True,
-        context={'request': request}
+        context={'request': request, 'day_schedules': day_schedules}
     )
     
     return Response({
@@ -457,7 +523,7 @@ def get_psychologist_schedule(request, psychologist_id):
     """
     try: # <-- La indentación aquí está corregida
         # Buscamos el PERFIL PROFESIONAL por el ID del usuario, no por el ID del perfil
-        profile = ProfessionalProfile.objects.get(user_id=psychologist_id)
+        profile = ProfessionalProfile.objects.select_related('user').get(user_id=psychologist_id)
         psychologist = profile.user
     except ProfessionalProfile.DoesNotExist:
         return Response(
@@ -475,63 +541,8 @@ def get_psychologist_schedule(request, psychologist_id):
     else:
         week_start = datetime.now().date()
 
-    # Generar el horario de la semana
-    schedule = []
-    for i in range(7):
-        current_date = week_start + timedelta(days=i)
-        weekday = current_date.weekday()
-
-        availabilities = PsychologistAvailability.objects.filter(
-            psychologist=psychologist,
-            weekday=weekday,
-            is_active=True
-        )
-
-        day_schedule = {
-            'date': current_date.strftime('%Y-%m-%d'),
-            'weekday': weekday,
-            'day_name': ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo'][weekday],
-            'is_available': False,
-            'blocked': False,
-            'time_slots': []
-        }
-
-        for availability in availabilities:
-            if str(current_date) in availability.blocked_dates:
-                day_schedule['blocked'] = True
-                continue
-
-            day_schedule['is_available'] = True
-
-            current_time = datetime.combine(current_date, availability.start_time)
-            end_time = datetime.combine(current_date, availability.end_time)
-
-            duration = 60
-            if hasattr(psychologist, 'professional_profile'):
-                duration = psychologist.professional_profile.session_duration
-
-            while current_time + timedelta(minutes=duration) <= end_time:
-                slot_start = current_time.time()
-                slot_end = (current_time + timedelta(minutes=duration)).time()
-
-                is_booked = Appointment.objects.filter(
-                    psychologist=psychologist,
-                    appointment_date=current_date,
-                    start_time__lt=slot_end,
-                    end_time__gt=slot_start,
-                    status__in=['pending', 'confirmed']
-                ).exists()
-
-                day_schedule['time_slots'].append({
-                    'start_time': slot_start.strftime('%H:%M'),
-                    'end_time': slot_end.strftime('%H:%M'),
-                    'is_available': not is_booked,
-                    'is_booked': is_booked
-                })
-
-                current_time += timedelta(minutes=duration)
-
-        schedule.append(day_schedule)
+    # Generar el horario de la semana (3 consultas, ver apps.appointments.scheduling)
+    schedule = get_schedule(psychologist, week_start, days=7)
 
     return Response({
         'psychologist': {
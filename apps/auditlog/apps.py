@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AuditlogConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.auditlog'
+
+    def ready(self):
+        # Lookup ip_address__in_network para los filtros de la bitácora
+        from . import lookups  # noqa: F401
@@ -1,12 +1,23 @@
 # apps/auditlog/handlers.py
+import atexit
 import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.db import connection
+from django.utils import timezone
+
 
 class DatabaseLogHandler(logging.Handler):
     def emit(self, record):
         try:
             # Importación tardía para evitar problemas de dependencia circular
             from .models import LogEntry
-            
+
             # Obtener el usuario y la IP de la solicitud si están disponibles
             user = getattr(record, 'user', None)
             ip_address = getattr(record, 'ip_address', None)
@@ -20,4 +31,190 @@ class DatabaseLogHandler(logging.Handler):
             )
         except Exception:
             # Evitar bucles infinitos si hay un error al guardar en la BD
-            pass
\ No newline at end of file
+            pass
+
+
+class BufferedDatabaseLogHandler(logging.Handler):
+    """
+    Bitácora en la base de datos sin INSERTs en el hilo de la petición.
+
+    emit() solo copia los datos del registro (incluido el schema del tenant
+    actual) a una cola acotada; un hilo en segundo plano los guarda con un
+    bulk_create por schema cada `batch_size` registros, cada `flush_interval`
+    segundos o cuando termina una petición (request_flush()).
+
+    Si la base de datos no da abasto y la cola se llena, los registros nuevos
+    se descartan y se cuentan; el total descartado por schema se guarda como
+    una entrada WARNING en la siguiente escritura exitosa.
+    """
+
+    def __init__(self, capacity=10000, batch_size=200, flush_interval=1.0, level=logging.NOTSET):
+        super().__init__(level)
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.counters = Counter()
+        self._dropped = Counter()
+        self._counters_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        atexit.register(self.close)
+
+    # --- Hilo de la petición ---
+
+    def emit(self, record):
+        try:
+            from django_tenants.utils import get_public_schema_name
+
+            schema_name = connection.schema_name
+            if schema_name == get_public_schema_name():
+                # La bitácora es una app del tenant: no hay tabla en el schema público
+                return
+
+            user = getattr(record, 'user', None)
+            entry = {
+                'schema_name': schema_name,
+                'user_id': getattr(user, 'pk', None),
+                'ip_address': getattr(record, 'ip_address', None),
+                'level': record.levelname,
+                'action': self.format(record),
+                'timestamp': timezone.now(),
+            }
+        except Exception:
+            self.handleError(record)
+            return
+
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            with self._counters_lock:
+                self.counters['dropped'] += 1
+                self._dropped[schema_name] += 1
+            return
+
+        with self._counters_lock:
+            self.counters['queued'] += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def request_flush(self):
+        """Pide al hilo escritor que guarde lo pendiente ya, sin esperarlo"""
+        if self._queue is not None and not self._queue.empty():
+            self._wakeup.set()
+
+    def stats(self):
+        with self._counters_lock:
+            stats = dict(self.counters)
+        stats['pending'] = self._queue.qsize() if self._queue is not None else 0
+        return stats
+
+    # --- Hilo escritor ---
+
+    def _ensure_worker(self):
+        # Tras un fork (gunicorn, daphne con workers) el hilo no existe en el hijo
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            self._pid = os.getpid()
+            self._queue = queue.Queue(maxsize=self.capacity)
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='auditlog-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping.is_set():
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self._drain()
+            self._drain()
+        finally:
+            connection.close()
+
+    def _drain(self):
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+            if len(batch) < self.batch_size:
+                return
+
+    def _write(self, batch):
+        from django_tenants.utils import schema_context
+        from .models import LogEntry
+
+        with self._counters_lock:
+            dropped, self._dropped = self._dropped, Counter()
+
+        by_schema = {}
+        for entry in batch:
+            by_schema.setdefault(entry['schema_name'], []).append(entry)
+        for schema_name in dropped:
+            by_schema.setdefault(schema_name, [])
+
+        for schema_name, entries in by_schema.items():
+            objects = [
+                LogEntry(
+                    user_id=entry['user_id'],
+                    ip_address=entry['ip_address'],
+                    level=entry['level'],
+                    action=entry['action'],
+                    timestamp=entry['timestamp'],
+                )
+                for entry in entries
+            ]
+            if dropped[schema_name]:
+                objects.append(LogEntry(
+                    level='WARNING',
+                    action=f'Bitácora saturada: se descartaron {dropped[schema_name]} registros.',
+                    details={'dropped': dropped[schema_name]},
+                ))
+            try:
+                with schema_context(schema_name):
+                    LogEntry.objects.bulk_create(objects)
+            except Exception as e:
+                with self._counters_lock:
+                    self.counters['failed'] += len(entries)
+                sys.stderr.write(f'auditlog: no se pudieron guardar {len(entries)} registros en "{schema_name}": {e}\n')
+                # Una conexión rota no debe arrastrar los siguientes lotes
+                connection.close_if_unusable_or_obsolete()
+            else:
+                with self._counters_lock:
+                    self.counters['written'] += len(entries)
+
+    # --- Cierre ---
+
+    def flush(self, timeout=5.0):
+        """Espera (como mucho `timeout` segundos) a que la cola quede vacía"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while not self._queue.empty() and time.monotonic() < deadline:
+            self._wakeup.set()
+            time.sleep(0.05)
+
+    def close(self):
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._stopping.set()
+            self._wakeup.set()
+            self._thread.join(timeout=5.0)
+        super().close()
+
+
+def request_flush():
+    """Pide a los handlers con buffer que guarden lo pendiente (fin de petición)"""
+    for handler in logging.getLogger('apps').handlers:
+        if isinstance(handler, BufferedDatabaseLogHandler):
+            handler.request_flush()
@@ -1,6 +1,8 @@
 # apps/auditlog/local.py
 import threading
 
+from .handlers import request_flush
+
 _request_storage = threading.local()
 
 def get_current_request():
@@ -16,4 +18,6 @@ class RequestLocalStorageMiddleware:
         # Limpiar después de que la petición termine
         if hasattr(_request_storage, 'request'):
             del _request_storage.request
+        # Guardar en segundo plano los registros de bitácora de esta petición
+        request_flush()
         return response
\ No newline at end of file
@@ -0,0 +1,20 @@
+# apps/auditlog/lookups.py
+from django.db import models
+
+
+@models.GenericIPAddressField.register_lookup
+class InNetwork(models.Lookup):
+    """
+    ip_address__in_network='10.0.0.0/8': la IP pertenece a la red (operador
+    <<= de inet). Lo resuelve el índice GiST inet_ops de la bitácora.
+    """
+    lookup_name = 'in_network'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} <<= {rhs}::inet', [*lhs_params, *rhs_params]
+
+    def get_db_prep_lookup(self, value, connection):
+        # Una red CIDR no es una IP válida para get_prep_value del campo
+        return ('%s', [str(value)])
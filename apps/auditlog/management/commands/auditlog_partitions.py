@@ -0,0 +1,98 @@
+# apps/auditlog/management/commands/auditlog_partitions.py
+
+"""
+Mantenimiento de las particiones mensuales de la bitácora.
+Crea las particiones de los próximos meses y elimina (opcionalmente
+archivando antes en CSV comprimido) las que superan la retención.
+Pensado para ejecutarse una vez al día o a la semana.
+"""
+
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.auditlog.partitions import (
+    MONTHS_AHEAD, archive_partition, drop_partition, ensure_partitions, expired_partitions,
+)
+from apps.tenants.fanout import add_workers_argument, get_tenants, run_for_tenants
+
+
+class Command(BaseCommand):
+    help = 'Crea las particiones futuras de la bitácora y aplica la política de retención'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Schema del tenant específico (ej: mindcare, bienestar)',
+            default=None
+        )
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=settings.AUDITLOG_RETENTION_MONTHS,
+            help=f'Meses de bitácora a conservar, incluido el actual (default: {settings.AUDITLOG_RETENTION_MONTHS})'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=MONTHS_AHEAD,
+            help=f'Meses futuros con partición creada por anticipado (default: {MONTHS_AHEAD})'
+        )
+        parser.add_argument(
+            '--archive',
+            action='store_true',
+            help='Guardar cada partición en BACKUP_ROOT/<schema>/auditlog/ antes de eliminarla'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar qué particiones se eliminarían'
+        )
+        add_workers_argument(parser)
+
+    def handle(self, *args, **options):
+        if options['keep_months'] < 1:
+            self.stdout.write(self.style.ERROR('❌ --keep-months debe ser al menos 1'))
+            return
+
+        tenants = get_tenants(options['tenant'])
+        if options['tenant'] and not tenants:
+            self.stdout.write(self.style.ERROR(f'❌ Tenant "{options["tenant"]}" no encontrado'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('🗂️  Particiones de la bitácora'))
+        self.stdout.write('=' * 60)
+
+        def maintain(tenant):
+            created = [] if options['dry_run'] else ensure_partitions(options['ahead'])
+            expired = expired_partitions(options['keep_months'])
+            archived = []
+            if not options['dry_run']:
+                for partition in expired:
+                    if options['archive']:
+                        directory = Path(settings.BACKUP_ROOT) / tenant.schema_name / 'auditlog'
+                        archived.append(archive_partition(partition, directory))
+                    drop_partition(partition)
+            return created, expired, archived
+
+        for result in run_for_tenants(maintain, tenants, workers=options['workers']):
+            tenant = result.tenant
+            if not result.ok:
+                self.stdout.write(self.style.ERROR(f'❌ {tenant.schema_name}: {result.error}'))
+                continue
+
+            created, expired, archived = result.value
+            self.stdout.write(f'🏥 {tenant.name} ({tenant.schema_name})')
+            for name in created:
+                self.stdout.write(f'   ➕ Creada {name}')
+            verb = 'Se eliminaría' if options['dry_run'] else 'Eliminada'
+            for partition in expired:
+                self.stdout.write(f'   🗑️  {verb} {partition.name} (~{partition.rows} registros)')
+            for path in archived:
+                self.stdout.write(f'   📦 Archivada en {path}')
+            if not created and not expired:
+                self.stdout.write('   ✅ Sin cambios')
+
+        self.stdout.write(self.style.SUCCESS('\n🎉 Mantenimiento de la bitácora completado'))
@@ -0,0 +1,83 @@
+# Convierte audit_log_entries en una tabla particionada por mes (RANGE sobre
+# "timestamp"). Las particiones futuras y la retención las maneja el comando
+# auditlog_partitions (apps/auditlog/partitions.py).
+
+from django.conf import settings
+from django.db import migrations, models
+
+# PostgreSQL exige que la clave primaria incluya la columna de partición, y
+# las columnas identity no se admiten en tablas particionadas antes de la
+# versión 17, así que el id pasa a usar una secuencia propia.
+PARTITION_TABLE = """
+ALTER TABLE audit_log_entries RENAME TO audit_log_entries_legacy;
+
+CREATE TABLE audit_log_entries (LIKE audit_log_entries_legacy INCLUDING DEFAULTS)
+    PARTITION BY RANGE ("timestamp");
+
+-- Una partición por mes desde el registro más antiguo hasta 3 meses adelante,
+-- y una partición por defecto para lo que quede fuera de rango
+DO $$
+DECLARE
+    current_month date := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+    first_month date;
+    partition_month date;
+BEGIN
+    SELECT date_trunc('month', min("timestamp") AT TIME ZONE 'UTC')::date
+      INTO first_month FROM audit_log_entries_legacy;
+    partition_month := LEAST(COALESCE(first_month, current_month), current_month);
+    WHILE partition_month <= current_month + interval '3 months' LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF audit_log_entries FOR VALUES FROM (%L) TO (%L)',
+            'audit_log_entries_' || to_char(partition_month, 'YYYY_MM'),
+            to_char(partition_month, 'YYYY-MM-DD') || ' 00:00:00+00',
+            to_char(partition_month + interval '1 month', 'YYYY-MM-DD') || ' 00:00:00+00'
+        );
+        partition_month := partition_month + interval '1 month';
+    END LOOP;
+END $$;
+CREATE TABLE audit_log_entries_default PARTITION OF audit_log_entries DEFAULT;
+
+INSERT INTO audit_log_entries SELECT * FROM audit_log_entries_legacy;
+DROP TABLE audit_log_entries_legacy;
+ALTER TABLE audit_log_entries ADD PRIMARY KEY (id, "timestamp");
+
+CREATE SEQUENCE audit_log_entries_id_seq OWNED BY audit_log_entries.id;
+SELECT setval('audit_log_entries_id_seq', COALESCE((SELECT max(id) FROM audit_log_entries), 0) + 1, false);
+ALTER TABLE audit_log_entries ALTER COLUMN id SET DEFAULT nextval('audit_log_entries_id_seq');
+
+ALTER TABLE audit_log_entries
+    ADD CONSTRAINT audit_log_entries_user_id_fk FOREIGN KEY (user_id)
+    REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX audit_log_entries_user_id_idx ON audit_log_entries (user_id);
+"""
+
+UNPARTITION_TABLE = """
+CREATE TABLE audit_log_entries_plain (LIKE audit_log_entries INCLUDING DEFAULTS);
+INSERT INTO audit_log_entries_plain SELECT * FROM audit_log_entries;
+ALTER SEQUENCE audit_log_entries_id_seq OWNED BY audit_log_entries_plain.id;
+DROP TABLE audit_log_entries CASCADE;
+ALTER TABLE audit_log_entries_plain RENAME TO audit_log_entries;
+ALTER TABLE audit_log_entries ADD PRIMARY KEY (id);
+
+ALTER TABLE audit_log_entries
+    ADD CONSTRAINT audit_log_entries_user_id_fk FOREIGN KEY (user_id)
+    REFERENCES users (id) DEFERRABLE INITIALLY DEFERRED;
+CREATE INDEX audit_log_entries_user_id_idx ON audit_log_entries (user_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0002_logentry_timestamp_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(PARTITION_TABLE, reverse_sql=UNPARTITION_TABLE),
+        # Índice particionado: PostgreSQL crea uno por partición, también en las nuevas
+        migrations.AddIndex(
+            model_name='logentry',
+            index=models.Index(fields=['timestamp'], name='audit_log_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 11:04
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auditlog', '0003_partition_logentry_by_month'),
+        # Configuración de búsqueda spanish_unaccent
+        ('professionals', '0003_professional_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logentry',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('action', config='spanish_unaccent'), name='audit_log_action_search_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logentry',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['ip_address'], name='audit_log_ip_idx', opclasses=['inet_ops']),
+        ),
+    ]
@@ -1,6 +1,11 @@
 # apps/auditlog/models.py
 from django.db import models
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVector
+from django.utils import timezone
+
+from apps.professionals.search import SEARCH_CONFIG
 
 class LogEntry(models.Model):
     LEVEL_CHOICES = (
@@ -30,7 +35,8 @@ class LogEntry(models.Model):
         verbose_name="Nivel"
     )
     action = models.TextField(verbose_name="Acción o Mensaje")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Marca de Tiempo")
+    # default y no auto_now_add: el handler con buffer guarda la hora del evento, no la del INSERT
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Marca de Tiempo")
     details = models.JSONField(default=dict, blank=True, verbose_name="Detalles Adicionales")
 
     class Meta:
@@ -38,6 +44,14 @@ class LogEntry(models.Model):
         verbose_name_plural = "Registros de Bitácora"
         ordering = ['-timestamp']
         db_table = 'audit_log_entries'
+        # La tabla está particionada por mes sobre timestamp (ver partitions.py)
+        indexes = [
+            models.Index(fields=['timestamp'], name='audit_log_timestamp_idx'),
+            # Búsqueda de texto completo sobre la acción (AuditLogViewSet ?search=)
+            GinIndex(SearchVector('action', config=SEARCH_CONFIG), name='audit_log_action_search_idx'),
+            # inet_ops resuelve tanto la IP exacta como "IP dentro de la red" (<<=)
+            GistIndex(fields=['ip_address'], opclasses=['inet_ops'], name='audit_log_ip_idx'),
+        ]
 
     def __str__(self):
         return f'[{self.timestamp.strftime("%Y-%m-%d %H:%M")}] [{self.level}] {self.action}'
@@ -0,0 +1,39 @@
+# apps/auditlog/pagination.py
+
+"""
+Paginación por cursor de la bitácora, con la clave (timestamp, id) del último
+registro de la página: las páginas profundas usan el índice de timestamp (y la
+poda de particiones) en lugar de un OFFSET sobre millones de filas.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+
+from apps.appointments.pagination import AppointmentCursorPagination
+
+
+class LogEntryCursorPagination(AppointmentCursorPagination):
+    """Registros del más reciente al más antiguo, paginados por cursor"""
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    max_page_size = 200
+
+    def after(self, timestamp, pk):
+        return Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+
+    def encode_cursor(self, entry):
+        key = f'{entry.timestamp.isoformat()},{entry.pk}'
+        return urlsafe_b64encode(key.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_timestamp, raw_pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split(',')
+            return datetime.fromisoformat(raw_timestamp), int(raw_pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,145 @@
+# apps/auditlog/partitions.py
+
+"""
+Particiones mensuales de la bitácora (audit_log_entries).
+
+La tabla está particionada por RANGE sobre "timestamp" (migración 0003): una
+partición audit_log_entries_AAAA_MM por mes, en UTC, más una partición por
+defecto que recibe lo que no tenga partición todavía. Las consultas con rango
+de fechas solo leen las particiones de ese rango, y borrar meses viejos es un
+DROP TABLE en lugar de un DELETE masivo.
+
+Todas las funciones trabajan sobre el schema actual (usar con schema_context).
+"""
+
+import datetime
+import gzip
+from pathlib import Path
+
+from django.db import connection, transaction
+
+from .models import LogEntry
+
+TABLE = LogEntry._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# Meses hacia adelante que se crean por anticipado
+MONTHS_AHEAD = 3
+
+
+class Partition:
+    def __init__(self, name, start, end, rows):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.rows = rows
+
+    def __repr__(self):
+        return f'<Partition {self.name} {self.start:%Y-%m}>'
+
+
+def month_start(value):
+    return datetime.date(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_{month:%Y_%m}'
+
+
+def _bound(month):
+    return f'{month:%Y-%m-%d} 00:00:00+00'
+
+
+def list_partitions():
+    """Particiones mensuales del schema actual, de la más antigua a la más nueva"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname, child.reltuples::bigint
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+            WHERE parent.relname = %s AND ns.nspname = current_schema()
+            ORDER BY child.relname
+            """,
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, estimated_rows in rows:
+        if name == DEFAULT_PARTITION:
+            continue
+        start = datetime.datetime.strptime(name[len(TABLE) + 1:], '%Y_%m').date()
+        partitions.append(Partition(name, start, add_months(start, 1), max(estimated_rows, 0)))
+    return partitions
+
+
+def create_partition(month):
+    """
+    Crea la partición del mes. Las filas de ese mes que hayan caído en la
+    partición por defecto se mueven antes de adjuntarla (si no, PostgreSQL
+    rechaza el ATTACH).
+    """
+    name = partition_name(month)
+    start, end = _bound(month), _bound(add_months(month, 1))
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{TABLE}" INCLUDING DEFAULTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" '
+            f'WHERE "timestamp" >= %s AND "timestamp" < %s RETURNING *) '
+            f'INSERT INTO "{name}" SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(
+            f'ALTER TABLE "{TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+    return name
+
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD):
+    """Crea las particiones del mes actual y de los próximos meses que falten"""
+    existing = {partition.start for partition in list_partitions()}
+    current = month_start(datetime.datetime.now(datetime.timezone.utc))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def archive_partition(partition, directory):
+    """Copia la partición a un CSV comprimido (COPY ... TO STDOUT) y devuelve la ruta"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{partition.name}.csv.gz'
+    with connection.cursor() as cursor, gzip.open(path, 'wb') as output:
+        cursor.copy_expert(f'COPY "{partition.name}" TO STDOUT WITH (FORMAT csv, HEADER)', output)
+    return path
+
+
+def drop_partition(partition):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" DETACH PARTITION "{partition.name}"')
+        cursor.execute(f'DROP TABLE "{partition.name}"')
+
+
+def expired_partitions(keep_months, today=None):
+    """
+    Particiones que terminan antes del primer mes que se conserva. El mes
+    actual cuenta: keep_months=3 en octubre conserva agosto, septiembre y octubre.
+    """
+    if keep_months < 1:
+        # Con 0 el corte pasaría al mes siguiente y se borraría el actual
+        raise ValueError('keep_months debe ser al menos 1')
+    today = today or datetime.datetime.now(datetime.timezone.utc).date()
+    cutoff = add_months(month_start(today), -(keep_months - 1))
+    return [partition for partition in list_partitions() if partition.end <= cutoff]
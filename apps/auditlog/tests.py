@@ -1,3 +1,252 @@
-from django.test import TestCase
+# apps/auditlog/tests.py
 
-# Create your tests here.
+import datetime
+import logging
+import os
+import queue
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+from django_tenants.test.cases import TenantTestCase
+
+from .handlers import BufferedDatabaseLogHandler
+from .models import LogEntry
+from .partitions import (
+    DEFAULT_PARTITION, TABLE, Partition, add_months, create_partition, expired_partitions, month_start,
+    partition_name,
+)
+
+
+class FakeConnection:
+    def __init__(self, schema_name='clinica'):
+        self.schema_name = schema_name
+        self.close_if_unusable_or_obsolete = mock.Mock()
+        self.close = mock.Mock()
+
+
+def make_handler(**kwargs):
+    """Handler sin hilo escritor: la cola se vacía a mano con _drain()"""
+    handler = BufferedDatabaseLogHandler(**kwargs)
+    handler._pid = os.getpid()
+    handler._queue = queue.Queue(maxsize=handler.capacity)
+    handler._thread = SimpleNamespace(is_alive=lambda: False)
+    return handler
+
+
+def log_record(message, level=logging.INFO, **extra):
+    record = logging.LogRecord('apps', level, __file__, 1, message, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def entry(schema_name, action='acción'):
+    return {
+        'schema_name': schema_name, 'user_id': None, 'ip_address': None,
+        'level': 'INFO', 'action': action, 'timestamp': None,
+    }
+
+
+class EmitTests(SimpleTestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        patcher = mock.patch('apps.auditlog.handlers.connection', self.connection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record_is_copied_to_the_queue_with_its_schema(self):
+        handler = make_handler()
+        handler.emit(log_record('inicio de sesión', user=SimpleNamespace(pk=7), ip_address='10.0.0.1'))
+
+        queued = handler._queue.get_nowait()
+        self.assertEqual(queued['schema_name'], 'clinica')
+        self.assertEqual(queued['user_id'], 7)
+        self.assertEqual(queued['ip_address'], '10.0.0.1')
+        self.assertEqual((queued['level'], queued['action']), ('INFO', 'inicio de sesión'))
+        self.assertEqual(handler.stats(), {'queued': 1, 'pending': 0})
+
+    def test_public_schema_is_ignored(self):
+        self.connection.schema_name = 'public'
+        handler = make_handler()
+        handler.emit(log_record('webhook'))
+
+        self.assertTrue(handler._queue.empty())
+
+    def test_full_queue_drops_and_counts_per_schema(self):
+        handler = make_handler(capacity=2)
+        for number in range(3):
+            handler.emit(log_record(f'evento {number}'))
+        self.connection.schema_name = 'otra'
+        handler.emit(log_record('evento 3'))
+
+        self.assertEqual(handler._queue.qsize(), 2)
+        self.assertEqual(handler.counters['dropped'], 2)
+        self.assertEqual(handler._dropped, {'clinica': 1, 'otra': 1})
+
+    def test_full_batch_wakes_the_writer(self):
+        handler = make_handler(batch_size=2)
+        handler.emit(log_record('uno'))
+        self.assertFalse(handler._wakeup.is_set())
+        handler.emit(log_record('dos'))
+        self.assertTrue(handler._wakeup.is_set())
+
+
+class WriteTests(SimpleTestCase):
+    def setUp(self):
+        self.connection = FakeConnection()
+        self.writes = []
+        self.current_schema = None
+
+        @contextmanager
+        def fake_schema_context(schema_name):
+            self.current_schema = schema_name
+            yield
+
+        for patcher in (
+            mock.patch('apps.auditlog.handlers.connection', self.connection),
+            mock.patch('django_tenants.utils.schema_context', fake_schema_context),
+            mock.patch.object(LogEntry.objects, 'bulk_create', side_effect=self.bulk_create),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def bulk_create(self, objects):
+        self.writes.append((self.current_schema, [(entry.level, entry.action) for entry in objects]))
+        return objects
+
+    def test_one_bulk_create_per_schema(self):
+        handler = make_handler()
+        handler._write([entry('a', 'uno'), entry('b', 'dos'), entry('a', 'tres')])
+
+        self.assertEqual(self.writes, [
+            ('a', [('INFO', 'uno'), ('INFO', 'tres')]),
+            ('b', [('INFO', 'dos')]),
+        ])
+        self.assertEqual(handler.counters['written'], 3)
+
+    def test_dropped_records_are_reported_as_a_warning_entry(self):
+        handler = make_handler()
+        handler._dropped.update({'a': 3, 'c': 1})
+        handler._write([entry('a')])
+
+        self.assertEqual(self.writes, [
+            ('a', [('INFO', 'acción'), ('WARNING', 'Bitácora saturada: se descartaron 3 registros.')]),
+            ('c', [('WARNING', 'Bitácora saturada: se descartaron 1 registros.')]),
+        ])
+        self.assertEqual(handler._dropped, {})
+
+    def test_failed_schema_does_not_stop_the_others(self):
+        def bulk_create(objects):
+            if self.current_schema == 'a':
+                raise RuntimeError('sin conexión')
+            return self.bulk_create(objects)
+
+        handler = make_handler()
+        with mock.patch.object(LogEntry.objects, 'bulk_create', side_effect=bulk_create), \
+                mock.patch('sys.stderr'):
+            handler._write([entry('a'), entry('a'), entry('b')])
+
+        self.assertEqual([schema for schema, _ in self.writes], ['b'])
+        self.assertEqual(handler.counters['failed'], 2)
+        self.assertEqual(handler.counters['written'], 1)
+        self.connection.close_if_unusable_or_obsolete.assert_called_once()
+
+    def test_drain_writes_in_batches(self):
+        handler = make_handler(batch_size=2)
+        for number in range(5):
+            handler._queue.put_nowait(entry('a', f'evento {number}'))
+        handler._drain()
+
+        self.assertEqual([len(objects) for _, objects in self.writes], [2, 2, 1])
+        self.assertTrue(handler._queue.empty())
+
+
+def month(year, number):
+    return datetime.date(year, number, 1)
+
+
+class MonthMathTests(SimpleTestCase):
+    def test_add_months_crosses_years(self):
+        self.assertEqual(add_months(month(2025, 11), 1), month(2025, 12))
+        self.assertEqual(add_months(month(2025, 12), 1), month(2026, 1))
+        self.assertEqual(add_months(month(2026, 1), -1), month(2025, 12))
+        self.assertEqual(add_months(month(2026, 3), -15), month(2024, 12))
+        self.assertEqual(add_months(month(2026, 3), 0), month(2026, 3))
+
+    def test_month_start_and_partition_name(self):
+        self.assertEqual(month_start(datetime.date(2026, 2, 28)), month(2026, 2))
+        self.assertEqual(month_start(datetime.datetime(2026, 12, 31, 23, 59)), month(2026, 12))
+        self.assertEqual(partition_name(month(2026, 3)), f'{TABLE}_2026_03')
+
+
+class ExpiredPartitionsTests(SimpleTestCase):
+    def setUp(self):
+        # Particiones de octubre de 2025 a marzo de 2026
+        starts = [add_months(month(2025, 10), offset) for offset in range(6)]
+        partitions = [Partition(partition_name(start), start, add_months(start, 1), 0) for start in starts]
+        patcher = mock.patch('apps.auditlog.partitions.list_partitions', return_value=partitions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def expired(self, keep_months, today):
+        return [partition.start for partition in expired_partitions(keep_months, today=today)]
+
+    def test_current_month_counts_towards_retention(self):
+        self.assertEqual(self.expired(3, datetime.date(2026, 3, 15)), [month(2025, 10), month(2025, 11), month(2025, 12)])
+        self.assertEqual(self.expired(1, datetime.date(2026, 3, 15)), [
+            month(2025, 10), month(2025, 11), month(2025, 12), month(2026, 1), month(2026, 2)
+        ])
+
+    def test_month_boundaries(self):
+        # El primer y el último día del mes dan el mismo corte
+        self.assertEqual(self.expired(4, datetime.date(2026, 3, 1)), [month(2025, 10), month(2025, 11)])
+        self.assertEqual(self.expired(4, datetime.date(2026, 3, 31)), [month(2025, 10), month(2025, 11)])
+        self.assertEqual(self.expired(5, datetime.date(2026, 1, 1)), [])
+
+    def test_keep_months_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            expired_partitions(0, today=datetime.date(2026, 3, 15))
+
+
+class CreatePartitionSqlTests(SimpleTestCase):
+    def test_rows_leave_the_default_partition_before_attach(self):
+        cursor = mock.MagicMock()
+        fake_connection = mock.MagicMock()
+        fake_connection.cursor.return_value.__enter__.return_value = cursor
+        with mock.patch('apps.auditlog.partitions.connection', fake_connection), \
+                mock.patch('apps.auditlog.partitions.transaction.atomic'):
+            name = create_partition(month(2025, 12))
+
+        self.assertEqual(name, f'{TABLE}_2025_12')
+        statements = [call.args for call in cursor.execute.call_args_list]
+        self.assertTrue(statements[0][0].startswith(f'CREATE TABLE "{name}"'))
+        self.assertIn(f'DELETE FROM "{DEFAULT_PARTITION}"', statements[1][0])
+        self.assertIn('ATTACH PARTITION', statements[2][0])
+        bounds = ['2025-12-01 00:00:00+00', '2026-01-01 00:00:00+00']
+        self.assertEqual(statements[1][1], bounds)
+        self.assertEqual(statements[2][1], bounds)
+
+
+class CreatePartitionTests(TenantTestCase):
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Clínica de pruebas'
+
+    def count(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM ONLY "{table}"')
+            return cursor.fetchone()[0]
+
+    def test_rows_in_the_default_partition_are_moved(self):
+        # Un mes lejano: todavía no tiene partición, la fila cae en la de por defecto
+        timestamp = datetime.datetime(2099, 1, 15, tzinfo=datetime.timezone.utc)
+        entry = LogEntry.objects.create(action='evento futuro', timestamp=timestamp)
+        self.assertEqual(self.count(DEFAULT_PARTITION), 1)
+
+        name = create_partition(month(2099, 1))
+
+        self.assertEqual(self.count(DEFAULT_PARTITION), 0)
+        self.assertEqual(self.count(name), 1)
+        self.assertTrue(LogEntry.objects.filter(pk=entry.pk, timestamp=timestamp).exists())
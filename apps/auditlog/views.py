@@ -1,7 +1,16 @@
 # apps/auditlog/views.py
+import ipaddress
+from datetime import datetime, time, timedelta
+
+from django.contrib.postgres.search import SearchVector
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets, permissions
-from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+from apps.professionals.search import SEARCH_CONFIG, build_search_query
 from .models import LogEntry
+from .pagination import LogEntryCursorPagination
 from .serializers import LogEntrySerializer
 from apps.clinic_admin.permissions import IsClinicAdmin
 
@@ -9,25 +18,104 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para que los administradores de la clínica
     vean los registros de la bitácora.
+
+    Filtros (query params):
+    - level: nivel exacto (INFO, WARNING...)
+    - search: texto completo sobre la acción; si es una IP o red busca por IP,
+      y si es un email, por el usuario
+    - user: id del usuario
+    - ip: IP exacta o red CIDR (10.0.0.0/8)
+    - date_from / date_to: fecha (AAAA-MM-DD, date_to inclusive) o fecha y hora
     """
     serializer_class = LogEntrySerializer
     permission_classes = [permissions.IsAuthenticated, IsClinicAdmin]
+    pagination_class = LogEntryCursorPagination
 
     def get_queryset(self):
-        queryset = LogEntry.objects.all().order_by('-timestamp')
+        queryset = LogEntry.objects.select_related('user').order_by('-timestamp', '-id')
 
         # --- Lógica de filtrado en el servidor ---
-        level = self.request.query_params.get('level')
-        search = self.request.query_params.get('search')
+        params = self.request.query_params
+        level = params.get('level')
+        search = params.get('search', '').strip()
+        user_id = params.get('user')
+        ip = params.get('ip', '').strip()
 
         if level:
             queryset = queryset.filter(level__iexact=level)
 
+        if user_id:
+            if not user_id.isdigit():
+                raise ValidationError({'user': 'Debe ser el id de un usuario.'})
+            queryset = queryset.filter(user_id=user_id)
+
+        if ip:
+            queryset = filter_by_ip(queryset, ip, 'ip')
+
+        # Rango de fechas: con la tabla particionada por mes solo se leen esos meses
+        date_from = parse_date_param(params, 'date_from')
+        date_to = parse_date_param(params, 'date_to', end_of_day=True)
+        if date_from:
+            queryset = queryset.filter(timestamp__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(timestamp__lt=date_to)
+
         if search:
-            queryset = queryset.filter(
-                Q(action__icontains=search) |
-                Q(user__email__icontains=search) |
-                Q(ip_address__icontains=search)
-            )
+            queryset = search_entries(queryset, search)
 
         return queryset
+
+
+def filter_by_ip(queryset, value, param):
+    try:
+        network = ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        raise ValidationError({param: 'IP o red inválida.'})
+    if '/' in value:
+        return queryset.filter(ip_address__in_network=str(network))
+    return queryset.filter(ip_address=value)
+
+
+def search_entries(queryset, text):
+    """Búsqueda indexada: IP/red, email del usuario o texto completo sobre la acción"""
+    try:
+        ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        pass
+    else:
+        return filter_by_ip(queryset, text, 'search')
+
+    if '@' in text:
+        return queryset.filter(user__email__iexact=text)
+
+    query = build_search_query(text)
+    if query is None:
+        return queryset
+    # La misma expresión que el índice audit_log_action_search_idx (alias: no va al SELECT)
+    return queryset.alias(
+        action_vector=SearchVector('action', config=SEARCH_CONFIG)
+    ).filter(action_vector=query)
+
+
+def parse_date_param(params, name, end_of_day=False):
+    """
+    Fecha (AAAA-MM-DD) o fecha y hora ISO. Con end_of_day una fecha sola
+    devuelve el inicio del día siguiente (límite exclusivo).
+    """
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError
+            if end_of_day:
+                day += timedelta(days=1)
+            moment = datetime.combine(day, time.min)
+    except ValueError:
+        raise ValidationError({name: 'Fecha inválida. Use AAAA-MM-DD o fecha y hora ISO.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BackupsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.backups'
+
+    def ready(self):
+        # Registro de cambios para los backups incrementales
+        from . import signals  # noqa: F401
@@ -0,0 +1,228 @@
+# apps/backups/incremental.py
+
+"""
+Backups incrementales y diferenciales de una clínica.
+
+Un incremento es un archivo JSON (mismo formato que dumpdata) con solo las
+filas que cambiaron desde el backup base:
+
+- Modelos con un campo auto_now (`updated_at`): filas con updated_at >= desde.
+- Modelos con solo auto_now_add (`created_at`, `timestamp`): filas creadas
+  desde entonces, más las modificadas según el registro de cambios.
+- Resto de modelos: filas del registro de cambios (ChangeLogEntry).
+- Eliminaciones: siempre por el registro de cambios. Van al principio del
+  archivo como marcadores {"model": ..., "deleted": [pks]}.
+
+El snapshot_at de un backup no es la hora en que empieza, sino el inicio de
+la transacción abierta más antigua en ese momento (snapshot_time): una fila
+que el backup todavía no ve la escribe una transacción que ya estaba abierta
+o que empezó después, así que su updated_at/changed_at es posterior. Además
+las consultas usan un margen hacia atrás (SNAPSHOT_OVERLAP, configurable con
+BACKUP_SNAPSHOT_OVERLAP_SECONDS) para cubrir los timestamps que Django calcula
+justo antes de abrir la transacción y la diferencia de reloj entre la
+aplicación y PostgreSQL. Repetir una fila no es un problema porque la carga
+hace upsert.
+
+Los mensajes del chat se guardan con bulk_create (sin señales):
+apps.chat.persistence los anota en el registro de cambios en la misma
+transacción.
+
+Restaurar una cadena es restaurar el backup completo y cargar cada incremento
+en orden con load_increment().
+"""
+
+import datetime
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import Q
+from django_tenants.utils import get_public_schema_name
+
+from .models import ChangeLogEntry
+from .restore import load_json_stream
+from .streaming import DUMPDATA_APPS
+
+# Margen hacia atrás al leer cambios desde el snapshot del backup base
+SNAPSHOT_OVERLAP = datetime.timedelta(seconds=settings.BACKUP_SNAPSHOT_OVERLAP_SECONDS)
+
+# Filas por consulta al exportar y pks por marcador de eliminación
+EXPORT_CHUNK_SIZE = 1000
+
+# Índices derivados que no se copian: se regeneran tras restaurar la cadena
+DERIVED_MODELS = {'appointments.timeslot'}
+
+
+def tracked_models():
+    """Modelos incluidos en los backups incrementales"""
+    return [
+        model
+        for app_label in DUMPDATA_APPS
+        for model in apps.get_app_config(app_label).get_models()
+        if model._meta.label_lower not in DERIVED_MODELS
+    ]
+
+
+def timestamp_fields(model):
+    """(campo auto_now, campo auto_now_add) del modelo; None si no tiene"""
+    updated = created = None
+    for field in model._meta.concrete_fields:
+        if getattr(field, 'auto_now', False):
+            updated = updated or field.name
+        elif getattr(field, 'auto_now_add', False):
+            created = created or field.name
+    return updated, created
+
+
+def is_tracked(model):
+    return (
+        model._meta.app_label in DUMPDATA_APPS
+        and model._meta.label_lower not in DERIVED_MODELS
+        and connection.schema_name != get_public_schema_name()
+    )
+
+
+def snapshot_time():
+    """
+    Momento desde el que hay que leer los cambios posteriores a un backup que
+    empieza ahora: el inicio de la transacción más antigua que sigue abierta
+    en la base de datos, o ahora si no hay ninguna. pg_stat_activity solo
+    muestra xact_start de las sesiones del mismo usuario (o con
+    pg_read_all_stats); la aplicación usa un único usuario.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT LEAST(now(), min(xact_start)) FROM pg_stat_activity '
+            'WHERE datname = current_database() AND xact_start IS NOT NULL'
+        )
+        return cursor.fetchone()[0]
+
+
+def log_changes(model, pks, action):
+    """Registra (o actualiza) la última acción sobre esas filas, en un solo INSERT"""
+    label = model._meta.label_lower
+    entries = [ChangeLogEntry(model=label, object_pk=str(pk), action=action) for pk in pks]
+    if entries:
+        ChangeLogEntry.objects.bulk_create(
+            entries,
+            update_conflicts=True,
+            unique_fields=['model', 'object_pk'],
+            update_fields=['action', 'changed_at'],
+        )
+
+
+def _logged_pks(model, since, action):
+    return list(
+        ChangeLogEntry.objects.filter(
+            model=model._meta.label_lower, action=action, changed_at__gte=since
+        ).values_list('object_pk', flat=True)
+    )
+
+
+def changed_queryset(model, since):
+    """Filas del modelo que cambiaron desde `since`"""
+    updated, created = timestamp_fields(model)
+    # Los cambios M2M no tocan updated_at: también se leen del registro
+    condition = Q(pk__in=_logged_pks(model, since, 'save'))
+    if updated:
+        condition |= Q(**{f'{updated}__gte': since})
+    elif created:
+        condition |= Q(**{f'{created}__gte': since})
+    return model._base_manager.filter(condition).order_by('pk')
+
+
+def deleted_pks(model, since):
+    """Filas eliminadas desde `since` que no volvieron a crearse"""
+    logged = _logged_pks(model, since, 'delete')
+    if not logged:
+        return []
+    pk_field = model._meta.pk
+    logged = [pk_field.to_python(pk) for pk in logged]
+    existing = set(model._base_manager.filter(pk__in=logged).values_list('pk', flat=True))
+    return [pk for pk in logged if pk not in existing]
+
+
+def write_increment(path, since, progress=None):
+    """
+    Escribe en `path` los cambios del schema actual desde `since`.
+    Devuelve {modelo: filas} (los marcadores de eliminación cuentan como
+    'modelo (eliminados)').
+    """
+    since = since - SNAPSHOT_OVERLAP
+    models = tracked_models()
+    counts = {}
+    written = 0
+
+    with open(path, 'w', encoding='utf-8') as output:
+        output.write('[')
+
+        def write(obj):
+            nonlocal written
+            text = ('\n' if not written else ',\n') + json.dumps(obj, cls=DjangoJSONEncoder, ensure_ascii=False)
+            output.write(text)
+            written += 1
+            if progress:
+                progress(len(text))
+
+        # Primero las eliminaciones, para que la carga no choque con restricciones únicas
+        for model in models:
+            pks = deleted_pks(model, since)
+            for start in range(0, len(pks), EXPORT_CHUNK_SIZE):
+                write({'model': model._meta.label_lower, 'deleted': pks[start:start + EXPORT_CHUNK_SIZE]})
+            if pks:
+                counts[f'{model._meta.label} (eliminados)'] = len(pks)
+
+        for model in models:
+            queryset = changed_queryset(model, since)
+            if model._meta.many_to_many:
+                queryset = queryset.prefetch_related(*(f.name for f in model._meta.many_to_many))
+            total = 0
+            for rows in _chunked(queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE), EXPORT_CHUNK_SIZE):
+                # Se serializa por bloques: serialize() arma una lista con todo lo que recibe
+                for obj in serializers.serialize('python', rows):
+                    write(obj)
+                total += len(rows)
+            if total:
+                counts[model._meta.label] = total
+
+        output.write('\n]\n')
+
+    return counts
+
+
+def _chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_increment(chunks):
+    """Aplica un incremento sobre los datos actuales del schema"""
+    return load_json_stream(chunks, replace_m2m=True)
+
+
+def rebuild_derived_data():
+    """Regenera los índices derivados (DERIVED_MODELS) del schema actual"""
+    from django.contrib.auth import get_user_model
+    from apps.appointments.slot_index import prune_past_slots, rebuild_psychologist_slots
+
+    prune_past_slots()
+    psychologist_ids = get_user_model().objects.filter(
+        user_type='professional', availabilities__is_active=True
+    ).values_list('pk', flat=True).distinct()
+    for psychologist_id in psychologist_ids:
+        rebuild_psychologist_slots(psychologist_id)
+
+
+def prune_change_log(before):
+    """Elimina las entradas que ya cubre un backup completo"""
+    deleted, _ = ChangeLogEntry.objects.filter(changed_at__lt=before - SNAPSHOT_OVERLAP).delete()
+    return deleted
@@ -0,0 +1,425 @@
+# apps/backups/jobs.py
+
+"""
+Cola de trabajos de backup/restauración en segundo plano.
+
+Las vistas crean un BackupJob (schema público) y responden de inmediato; el
+comando `run_backup_worker` los toma de la base de datos con
+SELECT ... FOR UPDATE SKIP LOCKED y los ejecuta. No hace falta un broker
+externo: la propia tabla es la cola.
+
+Límites de concurrencia (globales, para todos los workers):
+- BACKUP_MAX_CONCURRENT_JOBS trabajos en ejecución a la vez.
+- BACKUP_MAX_CONCURRENT_RESTORES restauraciones a la vez, para que dos
+  clínicas restaurando no saturen la base de datos.
+- Un solo trabajo en ejecución por clínica: un backup no lee un schema que
+  se está restaurando, ni dos restauraciones se pisan.
+
+Los archivos generados y los subidos para restaurar se guardan en BACKUP_ROOT.
+
+Los backups pueden ser completos, incrementales (cambios desde el último
+backup) o diferenciales (cambios desde el último completo); una restauración
+de un backup guardado reproduce su cadena completa (ver incremental.py).
+"""
+
+import datetime
+import logging
+import os
+import socket
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from apps.tenants.models import BackupJob
+
+from .incremental import (
+    load_increment, prune_change_log, rebuild_derived_data, snapshot_time, write_increment,
+)
+from .restore import (
+    RESTORE_JOBS, gunzip_chunks, restore_custom_dump,
+    restore_json_stream, restore_sql_stream,
+)
+from .streaming import CHUNK_SIZE, DUMP_FORMATS, DUMPDATA_APPS, schema_size, write_pg_dump
+
+logger = logging.getLogger('apps')
+
+# Clave del advisory lock que serializa la toma de trabajos entre workers
+CLAIM_LOCK_ID = 4815162342
+
+# Cada cuánto se guardan el progreso y el latido en la base de datos
+PROGRESS_INTERVAL = 1.0
+
+# Un trabajo 'running' sin latido en este tiempo se considera abandonado
+STALE_AFTER = datetime.timedelta(minutes=10)
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def backup_dir(schema_name):
+    path = Path(settings.BACKUP_ROOT) / schema_name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def save_upload(job, uploaded_file):
+    """Guarda el archivo a restaurar en disco, en bloques, y lo asocia al trabajo"""
+    path = backup_dir(job.clinic.schema_name) / 'uploads' / f'{job.pk}-{os.path.basename(uploaded_file.name)}'
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'wb') as output:
+        for chunk in uploaded_file.chunks(CHUNK_SIZE):
+            output.write(chunk)
+
+    job.file_path = str(path)
+    job.file_name = uploaded_file.name
+    job.total_bytes = uploaded_file.size
+    job.save(update_fields=['file_path', 'file_name', 'total_bytes'])
+
+
+def enqueue(clinic, kind, requested_by='', options=None, uploaded_file=None, mode='full'):
+    """Crea un trabajo pendiente (y guarda el archivo si es una restauración)"""
+    with schema_context(get_public_schema_name()):
+        job = BackupJob.objects.create(
+            clinic=clinic, kind=kind, mode=mode, requested_by=requested_by, options=options or {}
+        )
+        if uploaded_file is not None:
+            save_upload(job, uploaded_file)
+    logger.info(f"Trabajo de {kind} #{job.pk} encolado para el schema '{clinic.schema_name}'.")
+    return job
+
+
+def claim_next_job(worker=None):
+    """
+    Toma el trabajo pendiente más antiguo que respete los límites de
+    concurrencia y lo marca como 'running'. Devuelve None si no hay ninguno.
+    """
+    with schema_context(get_public_schema_name()), transaction.atomic():
+        # Un solo worker a la vez cuenta y toma trabajos
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [CLAIM_LOCK_ID])
+
+        running = BackupJob.objects.filter(status='running')
+        if running.count() >= settings.BACKUP_MAX_CONCURRENT_JOBS:
+            return None
+
+        pending = BackupJob.objects.filter(status='pending').order_by('created_at', 'id')
+        # Los trabajos de una clínica se ejecutan de uno en uno
+        pending = pending.exclude(clinic_id__in=running.values('clinic_id'))
+        if running.filter(kind='restore').count() >= settings.BACKUP_MAX_CONCURRENT_RESTORES:
+            pending = pending.exclude(kind='restore')
+
+        job = pending.select_for_update(skip_locked=True).select_related('clinic').first()
+        if job is None:
+            return None
+
+        now = timezone.now()
+        job.status = 'running'
+        job.worker = worker or worker_name()
+        job.started_at = now
+        job.heartbeat_at = now
+        job.save(update_fields=['status', 'worker', 'started_at', 'heartbeat_at'])
+        return job
+
+
+def fail_stale_jobs():
+    """Marca como fallidos los trabajos cuyo worker dejó de reportar progreso"""
+    with schema_context(get_public_schema_name()):
+        return BackupJob.objects.filter(
+            status='running', heartbeat_at__lt=timezone.now() - STALE_AFTER
+        ).update(status='failed', error='El worker dejó de responder', finished_at=timezone.now())
+
+
+class ProgressReporter:
+    """
+    Acumula los bytes procesados; un hilo aparte los guarda cada
+    PROGRESS_INTERVAL junto con el latido del trabajo.
+
+    El hilo usa su propia conexión: el progreso se ve aunque la restauración
+    esté dentro de una transacción (carga JSON), no bloquea la fila del
+    trabajo, y el latido sigue mientras pg_restore o psql trabajan sin leer
+    más del archivo (si no, fail_stale_jobs los daría por abandonados).
+    """
+
+    def __init__(self, job, interval=PROGRESS_INTERVAL):
+        self.job = job
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __call__(self, nbytes):
+        self.job.bytes_processed += nbytes
+
+    def __enter__(self):
+        self._thread = threading.Thread(
+            target=self._run, name=f'backup-progress-{self.job.pk}', daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.save()
+                except Exception as e:
+                    logger.warning(f"No se pudo guardar el progreso del trabajo #{self.job.pk}: {e}")
+        finally:
+            # La conexión de Django es por hilo: se cierra la de este
+            connection.close()
+
+    def save(self):
+        with schema_context(get_public_schema_name()):
+            BackupJob.objects.filter(pk=self.job.pk).update(
+                bytes_processed=self.job.bytes_processed, heartbeat_at=timezone.now()
+            )
+
+
+def find_base_backup(clinic, mode):
+    """
+    Backup sobre el que se calcula un incremental (el último) o un diferencial
+    (el último completo). Después de una restauración la cadena anterior ya no
+    describe los datos, así que solo cuentan los backups posteriores.
+    Devuelve None si no hay una cadena válida (hay que hacer uno completo).
+    """
+    with schema_context(get_public_schema_name()):
+        backups = BackupJob.objects.filter(
+            clinic=clinic, kind='backup', status='completed', snapshot_at__isnull=False
+        )
+        if mode == 'differential':
+            backups = backups.filter(mode='full')
+
+        last_restore = BackupJob.objects.filter(
+            clinic=clinic, kind='restore', status='completed'
+        ).order_by('-finished_at').values_list('finished_at', flat=True).first()
+        if last_restore:
+            backups = backups.filter(snapshot_at__gt=last_restore)
+
+        base = backups.select_related('parent').order_by('-snapshot_at').first()
+        if base is None:
+            return None
+        try:
+            chain = base.chain()
+        except ValueError:
+            return None
+
+    if not all(backup.file_path and os.path.exists(backup.file_path) for backup in chain):
+        return None
+    return base
+
+
+def run_backup(job, progress):
+    schema_name = job.clinic.schema_name
+    timestamp = timezone.localtime().strftime('%Y-%m-%d-%H%M%S')
+
+    if job.mode != 'full':
+        job.parent = find_base_backup(job.clinic, job.mode)
+        if job.parent is not None:
+            return run_incremental_backup(job, progress, timestamp)
+        logger.info(f"Trabajo #{job.pk}: no hay backup base válido, se hace un backup completo.")
+        job.mode = 'full'
+
+    dump_format = job.options.get('format', 'plain')
+    if dump_format not in DUMP_FORMATS:
+        dump_format = 'plain'
+    compress = dump_format == 'plain' and bool(job.options.get('compress'))
+
+    with schema_context(schema_name):
+        job.total_bytes = schema_size(schema_name)
+    with schema_context(get_public_schema_name()):
+        BackupJob.objects.filter(pk=job.pk).update(total_bytes=job.total_bytes)
+
+    extension = DUMP_FORMATS[dump_format][1] + ('.gz' if compress else '')
+    file_name = f'backup-sql-{schema_name}-{timestamp}.{extension}'
+    path = backup_dir(schema_name) / file_name
+    # Los incrementos siguientes leen cambios desde antes de empezar el dump
+    job.snapshot_at = snapshot_time()
+
+    try:
+        size = write_pg_dump(schema_name, path, dump_format, compress, progress)
+    except Exception as e:
+        path.unlink(missing_ok=True)
+        # Igual que la vista: si pg_dump falla se usa dumpdata de Django
+        logger.warning(f"pg_dump falló en el trabajo #{job.pk}. Usando fallback de Django. Error: {e}")
+        dump_format, compress = 'json', False
+        file_name = f'backup-json-{schema_name}-{timestamp}.json'
+        path = backup_dir(schema_name) / file_name
+        try:
+            with schema_context(schema_name), open(path, 'w', encoding='utf-8') as output:
+                call_command('dumpdata', *DUMPDATA_APPS, format='json', indent=2, stdout=output)
+        except BaseException:
+            path.unlink(missing_ok=True)
+            raise
+        size = path.stat().st_size
+        progress(size)
+
+    # Lo anterior a este backup completo ya no se necesita para los incrementos
+    with schema_context(schema_name):
+        pruned = prune_change_log(job.snapshot_at)
+
+    job.file_path = str(path)
+    job.file_name = file_name
+    return {'size': size, 'format': dump_format, 'compress': compress, 'pruned_changes': pruned}
+
+
+def run_incremental_backup(job, progress, timestamp):
+    """Exporta a JSON las filas cambiadas desde el snapshot del backup base"""
+    schema_name = job.clinic.schema_name
+    prefix = 'incr' if job.mode == 'incremental' else 'diff'
+    file_name = f'backup-{prefix}-{schema_name}-{timestamp}.json'
+    path = backup_dir(schema_name) / file_name
+    job.snapshot_at = snapshot_time()
+
+    try:
+        with schema_context(schema_name):
+            counts = write_increment(path, job.parent.snapshot_at, progress)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    job.file_path = str(path)
+    job.file_name = file_name
+    return {
+        'size': path.stat().st_size,
+        'format': 'json',
+        'base': job.parent.pk,
+        'since': job.parent.snapshot_at.isoformat(),
+        'objects': counts,
+    }
+
+
+def restore_file(schema_name, path, name, progress, jobs=RESTORE_JOBS):
+    """Restaura un backup completo guardado en disco según su extensión"""
+    name = name.lower()
+
+    def file_chunks(backup):
+        # El progreso se mide sobre el archivo guardado (comprimido o no)
+        for chunk in iter(lambda: backup.read(CHUNK_SIZE), b''):
+            progress(len(chunk))
+            yield chunk
+
+    if name.endswith('.sql') or name.endswith('.sql.gz'):
+        with open(path, 'rb') as backup:
+            chunks = file_chunks(backup)
+            if name.endswith('.gz'):
+                chunks = gunzip_chunks(chunks)
+            restore_sql_stream(schema_name, chunks)
+        return {'format': 'sql'}
+
+    if name.endswith('.dump'):
+        restore_custom_dump(schema_name, path, jobs=jobs)
+        progress(os.path.getsize(path))
+        return {'format': 'custom'}
+
+    if name.endswith('.json'):
+        with schema_context(schema_name), open(path, 'rb') as backup:
+            counts = restore_json_stream(file_chunks(backup))
+        return {'format': 'json', 'objects': counts}
+
+    raise ValueError('Formato de archivo no soportado. Use .sql, .sql.gz, .dump o .json.')
+
+
+def run_restore(job, progress):
+    schema_name = job.clinic.schema_name
+    if schema_name == get_public_schema_name():
+        raise ValueError('No está permitido restaurar el esquema público.')
+
+    if job.options.get('backup_job'):
+        return run_chain_restore(job, progress)
+    return restore_file(schema_name, job.file_path, job.file_name, progress,
+                        jobs=job.options.get('jobs', RESTORE_JOBS))
+
+
+def run_chain_restore(job, progress):
+    """Restaura un backup guardado: el completo de su cadena y luego cada incremento"""
+    schema_name = job.clinic.schema_name
+    with schema_context(get_public_schema_name()):
+        target = BackupJob.objects.get(
+            pk=job.options['backup_job'], clinic=job.clinic, kind='backup', status='completed'
+        )
+        chain = target.chain()
+
+    missing = [backup.pk for backup in chain if not backup.file_path or not os.path.exists(backup.file_path)]
+    if missing:
+        raise ValueError(f'Faltan los archivos de los backups {missing} de la cadena')
+
+    job.total_bytes = sum(os.path.getsize(backup.file_path) for backup in chain)
+    with schema_context(get_public_schema_name()):
+        BackupJob.objects.filter(pk=job.pk).update(total_bytes=job.total_bytes)
+
+    full, increments = chain[0], chain[1:]
+    result = restore_file(schema_name, full.file_path, full.file_name, progress,
+                          jobs=job.options.get('jobs', RESTORE_JOBS))
+    result['chain'] = [backup.pk for backup in chain]
+
+    if increments:
+        with schema_context(schema_name):
+            for backup in increments:
+                with open(backup.file_path, 'rb') as increment:
+                    chunks = _counted(iter(lambda: increment.read(CHUNK_SIZE), b''), progress)
+                    result[f'increment_{backup.pk}'] = load_increment(chunks)
+            # Los índices derivados no viajan en los incrementos
+            rebuild_derived_data()
+    return result
+
+
+def _counted(chunks, progress):
+    for chunk in chunks:
+        progress(len(chunk))
+        yield chunk
+
+
+def record_restore(clinic, requested_by, file_name):
+    """
+    Registra una restauración hecha fuera de la cola (vista síncrona), para
+    que el siguiente incremental no se calcule sobre una cadena anterior.
+    """
+    now = timezone.now()
+    with schema_context(get_public_schema_name()):
+        return BackupJob.objects.create(
+            clinic=clinic, kind='restore', status='completed', requested_by=requested_by,
+            file_name=file_name, started_at=now, finished_at=now, heartbeat_at=now
+        )
+
+
+def run_job(job):
+    """Ejecuta un trabajo ya tomado y guarda su resultado"""
+    logger.info(f"Iniciando trabajo de {job.kind} #{job.pk} para '{job.clinic.schema_name}'.")
+    try:
+        with ProgressReporter(job) as progress:
+            if job.kind == 'backup':
+                result = run_backup(job, progress)
+            else:
+                result = run_restore(job, progress)
+    except Exception as e:
+        logger.error(f"Trabajo de {job.kind} #{job.pk} falló: {e}", exc_info=True)
+        job.status = 'failed'
+        job.error = getattr(e, 'stderr', None) or str(e)
+        result = {}
+    else:
+        logger.info(f"Trabajo de {job.kind} #{job.pk} completado.")
+        job.status = 'completed'
+        if job.kind == 'restore' and job.file_path:
+            # El archivo subido ya no se necesita
+            Path(job.file_path).unlink(missing_ok=True)
+    finally:
+        connection.set_schema_to_public()
+
+    job.result = result
+    job.finished_at = timezone.now()
+    job.heartbeat_at = job.finished_at
+    with schema_context(get_public_schema_name()):
+        job.save(update_fields=[
+            'status', 'mode', 'parent', 'snapshot_at', 'error', 'result', 'file_path',
+            'file_name', 'bytes_processed', 'total_bytes', 'finished_at', 'heartbeat_at'
+        ])
+    return job
@@ -2,13 +2,58 @@
 Comando para mostrar información del sistema de backups
 """
 
+import os
+
 from django.core.management.base import BaseCommand
-from apps.tenants.models import Clinic
+from django.db import connection
+from django.template.defaultfilters import filesizeformat
+from apps.tenants.fanout import add_workers_argument, get_tenants, run_for_tenants
 from django.conf import settings
+from apps.backups.models import ChangeLogEntry
+from apps.tenants.models import BackupJob
+
+
+def schema_size(tenant):
+    """Tablas y tamaño en disco del schema de la clínica (aprox. tamaño del backup)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*), COALESCE(SUM(pg_total_relation_size(format('%%I.%%I', schemaname, tablename))), 0) "
+            "FROM pg_tables WHERE schemaname = %s",
+            [tenant.schema_name]
+        )
+        tables, size = cursor.fetchone()
+    return {'tables': tables, 'size': size, 'pending_changes': ChangeLogEntry.objects.count()}
+
+
+def backup_file_size(backup):
+    if backup.file_path and os.path.exists(backup.file_path):
+        return os.path.getsize(backup.file_path)
+    return backup.result.get('size', 0)
+
+
+def current_chains(tenants):
+    """
+    Cadena vigente de cada clínica: su último backup completo y los
+    incrementales/diferenciales posteriores. {clinic_id: (completo, [incrementos])}
+    """
+    chains = {}
+    backups = BackupJob.objects.filter(
+        clinic__in=tenants, kind='backup', status='completed', snapshot_at__isnull=False
+    ).order_by('snapshot_at')
+    for backup in backups:
+        if backup.mode == 'full':
+            chains[backup.clinic_id] = (backup, [])
+        elif backup.clinic_id in chains:
+            chains[backup.clinic_id][1].append(backup)
+    return chains
+
 
 class Command(BaseCommand):
     help = 'Mostrar información del sistema de copias de seguridad'
 
+    def add_arguments(self, parser):
+        add_workers_argument(parser)
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('💾 Sistema de Copias de Seguridad - Fase 1'))
         self.stdout.write('=' * 60)
@@ -21,27 +66,61 @@ class Command(BaseCommand):
         self.stdout.write(f'   - Puerto: {db_settings["PORT"]}')
         self.stdout.write(f'   - Base de datos: {db_settings["NAME"]}')
         
-        # Tenants disponibles
-        tenants = Clinic.objects.exclude(schema_name='public')
+        # Tenants disponibles (el tamaño de cada schema se consulta en paralelo)
+        tenants = get_tenants()
         self.stdout.write(f'\n🏥 Tenants disponibles para backup:')
+        sizes = run_for_tenants(schema_size, tenants, workers=options['workers'])
+        for result in sizes:
+            tenant = result.tenant
+            if result.ok:
+                self.stdout.write(
+                    f'   - {tenant.name} (schema: {tenant.schema_name}) - '
+                    f'{result.value["tables"]} tablas, {filesizeformat(result.value["size"])}'
+                )
+            else:
+                self.stdout.write(self.style.ERROR(f'   - {tenant.name} (schema: {tenant.schema_name}) - Error: {result.error}'))
+        
+        # Cadenas de backups incrementales (completo + incrementos desde entonces)
+        self.stdout.write(f'\n🔗 Cadenas de backups vigentes:')
+        chains = current_chains(tenants)
+        pending = {result.tenant.pk: result.value['pending_changes'] for result in sizes if result.ok}
         for tenant in tenants:
-            self.stdout.write(f'   - {tenant.name} (schema: {tenant.schema_name})')
+            if tenant.pk not in chains:
+                self.stdout.write(f'   - {tenant.schema_name}: sin backup completo guardado')
+                continue
+            full, increments = chains[tenant.pk]
+            full_size = backup_file_size(full)
+            increments_size = sum(backup_file_size(backup) for backup in increments)
+            differential = sum(1 for backup in increments if backup.mode == 'differential')
+            self.stdout.write(
+                f'   - {tenant.schema_name}: completo #{full.pk} ({filesizeformat(full_size)}, '
+                f'{full.snapshot_at:%Y-%m-%d %H:%M}) + {len(increments) - differential} incrementales y '
+                f'{differential} diferenciales ({filesizeformat(increments_size)}) = '
+                f'{filesizeformat(full_size + increments_size)}'
+            )
+            if tenant.pk in pending:
+                self.stdout.write(f'     Cambios registrados pendientes: {pending[tenant.pk]}')
         
         # Endpoints disponibles
         self.stdout.write(f'\n🌐 Endpoints de la API:')
         self.stdout.write(f'   POST /api/backups/create/  -> Crear y descargar backup')
         self.stdout.write(f'   POST /api/backups/restore/ -> Restaurar desde archivo')
+        self.stdout.write(f'   POST /api/backups/jobs/    -> Encolar backup (mode=full|incremental|differential) o restauración')
+        self.stdout.write(f'   GET  /api/backups/jobs/<id>/ -> Progreso del trabajo (run_backup_worker)')
         
         # Métodos de backup
         self.stdout.write(f'\n🔧 Métodos de backup soportados:')
-        self.stdout.write(f'   1. PostgreSQL nativo (pg_dump/psql) - Archivos .sql')
-        self.stdout.write(f'   2. Restauración robusta: DROP CASCADE + CREATE + psql')
-        self.stdout.write(f'   3. Validación de errores: check=True para detección confiable')
+        self.stdout.write(f'   1. PostgreSQL nativo (pg_dump/psql) - En streaming, sin cargar el dump en memoria')
+        self.stdout.write(f'   2. Restauración robusta: DROP CASCADE + CREATE + psql (en bloques) o pg_restore -j')
+        self.stdout.write(f'   3. JSON: parseo incremental e inserción por lotes (bulk_create)')
+        self.stdout.write(f'   4. Validación de errores: código de salida y stderr de cada herramienta')
         
         # Formatos soportados
         self.stdout.write(f'\n📁 Formatos de archivo soportados:')
-        self.stdout.write(f'   - .sql  -> Backup SQL de texto plano (recomendado)')
-        self.stdout.write(f'   - .json -> Backup Django JSON (alternativo)')
+        self.stdout.write(f'   - .sql  -> Backup SQL de texto plano con COPY (recomendado)')
+        self.stdout.write(f'   - .sql.gz -> SQL comprimido con gzip al vuelo (compress=1)')
+        self.stdout.write(f'   - .dump -> Formato custom de pg_dump, comprimido (format=custom)')
+        self.stdout.write(f'   - .json -> Backup Django JSON (alternativo) e incrementos (backup-incr-*, backup-diff-*)')
         
         # Características mejoradas
         self.stdout.write(f'\n🛡️ Características de seguridad:')
@@ -57,12 +136,12 @@ class Command(BaseCommand):
         
         # Ejemplos de uso
         self.stdout.write(f'\n📖 Ejemplos de uso:')
-        if tenants.exists():
-            tenant = tenants.first()
+        if tenants:
+            tenant = tenants[0]
             self.stdout.write(f'   # Crear backup')
             self.stdout.write(f'   curl -X POST \\')
             self.stdout.write(f'        -H "Authorization: Token <your-token>" \\')
-            self.stdout.write(f'        http://{tenant.schema_name}.localhost:8000/api/backups/create/')
+            self.stdout.write(f'        http://{tenant.schema_name}.localhost:8000/api/backups/create/?compress=1')
             self.stdout.write(f'')
             self.stdout.write(f'   # Restaurar backup')
             self.stdout.write(f'   curl -X POST \\')
@@ -0,0 +1,76 @@
+"""
+Worker de la cola de backups: toma los BackupJob pendientes y los ejecuta
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.backups.jobs import claim_next_job, fail_stale_jobs, run_job, worker_name
+
+
+class Command(BaseCommand):
+    help = 'Ejecutar los trabajos de backup y restauración encolados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=settings.BACKUP_MAX_CONCURRENT_JOBS,
+            help='Trabajos ejecutados a la vez por este worker (default: BACKUP_MAX_CONCURRENT_JOBS)'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=5.0,
+            help='Segundos de espera cuando no hay trabajos pendientes (default: 5)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Procesar los trabajos pendientes y terminar'
+        )
+
+    def handle(self, *args, **options):
+        threads = max(1, options['threads'])
+        name = worker_name()
+        self.stdout.write(self.style.SUCCESS(f'💾 Worker de backups {name} iniciado ({threads} hilos)'))
+
+        stale = fail_stale_jobs()
+        if stale:
+            self.stdout.write(self.style.WARNING(f'⚠️  {stale} trabajos abandonados marcados como fallidos'))
+
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix='backup-job') as executor:
+            try:
+                while True:
+                    running = {future for future in running if not future.done()}
+
+                    job = claim_next_job(name) if len(running) < threads else None
+                    if job is not None:
+                        self.stdout.write(f'▶️  Trabajo #{job.pk}: {job.get_kind_display()} de {job.clinic.schema_name}')
+                        running.add(executor.submit(self._run, job))
+                        continue
+
+                    if options['once'] and not running:
+                        break
+                    time.sleep(options['poll_interval'])
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('\n⏹️  Deteniendo: esperando a los trabajos en curso...'))
+
+        self.stdout.write(self.style.SUCCESS('✅ Worker de backups detenido'))
+
+    def _run(self, job):
+        try:
+            job = run_job(job)
+        finally:
+            # Conexión propia del hilo: no dejarla abierta al terminar
+            connection.close()
+
+        if job.status == 'completed':
+            self.stdout.write(self.style.SUCCESS(f'✅ Trabajo #{job.pk} completado'))
+        else:
+            self.stdout.write(self.style.ERROR(f'❌ Trabajo #{job.pk} falló: {job.error}'))
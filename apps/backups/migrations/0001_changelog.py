@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLogEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(help_text='app_label.model_name', max_length=100)),
+                ('object_pk', models.CharField(max_length=64)),
+                ('action', models.CharField(choices=[('save', 'Guardado'), ('delete', 'Eliminado')], max_length=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Cambio registrado',
+                'verbose_name_plural': 'Cambios registrados',
+                'indexes': [models.Index(fields=['changed_at'], name='changelog_changed_at_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_pk'), name='changelog_model_pk_uniq')],
+            },
+        ),
+    ]
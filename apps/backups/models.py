@@ -1,3 +1,38 @@
+# apps/backups/models.py
+
 from django.db import models
+from django.utils import timezone
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Registro de cambios para los backups incrementales (apps.backups.incremental).
+
+    Guarda la última acción sobre cada fila que no se puede detectar por
+    timestamps: eliminaciones de cualquier modelo, modificaciones de modelos
+    sin `updated_at` y cambios de relaciones M2M. Hay una sola entrada por
+    fila (se actualiza en cada cambio), y las anteriores al último backup
+    completo se eliminan al terminar ese backup.
+    """
+    ACTION_CHOICES = [
+        ('save', 'Guardado'),
+        ('delete', 'Eliminado'),
+    ]
+
+    model = models.CharField(max_length=100, help_text="app_label.model_name")
+    object_pk = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = 'Cambio registrado'
+        verbose_name_plural = 'Cambios registrados'
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_pk'], name='changelog_model_pk_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['changed_at'], name='changelog_changed_at_idx'),
+        ]
 
-# Create your models here.
+    def __str__(self):
+        return f"{self.get_action_display()} {self.model}#{self.object_pk}"
@@ -0,0 +1,415 @@
+# apps/backups/restore.py
+
+"""
+Restauración de backups en streaming.
+
+- SQL (.sql / .sql.gz): el archivo subido se envía en bloques al stdin de psql,
+  descomprimiendo gzip al vuelo.
+- Custom (.dump): pg_restore con varios jobs en paralelo (-j, como mucho
+  BACKUP_MAX_RESTORE_JOBS). pg_restore necesita un archivo con acceso
+  aleatorio, así que se usa el archivo temporal de la subida (o se copia a
+  disco en bloques si la subida quedó en memoria). Antes de tocar nada se lee
+  su índice con `pg_restore --list`.
+- JSON (.json): se parsea objeto por objeto y se inserta con bulk_create en
+  lotes por modelo, sin cargar el archivo completo ni todos los objetos.
+
+SQL y custom restauran sobre un schema nuevo: el actual se aparta con un
+RENAME y solo se borra si la restauración termina bien; si falla, se
+devuelve a su nombre (ver swap_schema).
+"""
+
+import codecs
+import json
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import zlib
+from contextlib import contextmanager
+
+import psycopg2
+from django.apps import apps
+from django.conf import settings
+from django.core.management.color import no_style
+from django.core.serializers.python import Deserializer as PythonDeserializer
+from django.db import connection, transaction
+
+from .streaming import CHUNK_SIZE, DUMP_COMPLETE_MARKER, pg_connection_args, pg_env
+
+logger = logging.getLogger('apps')
+
+# Jobs paralelos de pg_restore para dumps en formato custom
+RESTORE_JOBS = 4
+
+# Entradas SCHEMA del índice de `pg_restore --list` ("5; 2615 16385 SCHEMA - clinica postgres")
+SCHEMA_TOC_ENTRY = re.compile(r'^\d+; \d+ \d+ SCHEMA - (\S+) ', re.MULTILINE)
+
+# Objetos por INSERT en la restauración JSON
+JSON_BATCH_SIZE = 1000
+
+
+def iter_upload_chunks(uploaded_file, gunzip=False, chunk_size=CHUNK_SIZE):
+    """Bloques del archivo subido, descomprimidos si es .gz"""
+    chunks = uploaded_file.chunks(chunk_size)
+    return gunzip_chunks(chunks) if gunzip else chunks
+
+
+def gunzip_chunks(chunks):
+    """Descomprime al vuelo una secuencia de bloques en formato gzip"""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        chunk = decompressor.decompress(chunk)
+        if chunk:
+            yield chunk
+    tail = decompressor.flush()
+    if tail:
+        yield tail
+    if not decompressor.eof:
+        raise ValueError('El archivo .gz está incompleto o dañado')
+
+
+def restore_jobs(value):
+    """Jobs de pg_restore pedidos por el usuario, entre 1 y BACKUP_MAX_RESTORE_JOBS"""
+    try:
+        jobs = int(value)
+    except (TypeError, ValueError):
+        jobs = RESTORE_JOBS
+    return max(1, min(jobs, settings.BACKUP_MAX_RESTORE_JOBS))
+
+
+def _admin_connection():
+    db_settings = settings.DATABASES['default']
+    return psycopg2.connect(
+        dbname=db_settings['NAME'], user=db_settings['USER'],
+        password=db_settings['PASSWORD'], host='127.0.0.1', port=db_settings['PORT']
+    )
+
+
+@contextmanager
+def swap_schema(schema_name):
+    """
+    Aparta el schema actual (RENAME a <schema>_pre_restore) mientras se
+    restaura en uno nuevo, que crea la propia restauración (el dump trae su
+    CREATE SCHEMA). Si el bloque falla, se borra lo restaurado a medias y el
+    schema original vuelve a su nombre en la misma transacción; si termina
+    bien, se borra el apartado.
+    """
+    previous = f'{schema_name[:48]}_pre_restore'
+    conn = _admin_connection()
+    try:
+        with conn, conn.cursor() as cursor:
+            cursor.execute('SELECT nspname FROM pg_namespace WHERE nspname IN (%s, %s)', [schema_name, previous])
+            existing = {row[0] for row in cursor.fetchall()}
+            if previous in existing:
+                # Quedó de una restauración interrumpida: puede ser la única copia buena
+                raise ValueError(
+                    f'Existe el schema "{previous}" de una restauración interrumpida; '
+                    f'revíselo (y bórrelo o renómbrelo) antes de restaurar de nuevo.'
+                )
+            had_schema = schema_name in existing
+            if had_schema:
+                cursor.execute(f'ALTER SCHEMA "{schema_name}" RENAME TO "{previous}";')
+
+        try:
+            yield
+        except BaseException:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE;')
+                if had_schema:
+                    cursor.execute(f'ALTER SCHEMA "{previous}" RENAME TO "{schema_name}";')
+            logger.warning(f"Restauración fallida: se conserva el schema '{schema_name}' anterior.")
+            raise
+
+        if had_schema:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(f'DROP SCHEMA "{previous}" CASCADE;')
+    finally:
+        conn.close()
+
+
+def _run_with_stdin(command, chunks, progress=None):
+    """Ejecuta el comando enviando los bloques a su stdin; stderr va a un archivo temporal"""
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=stderr_file,
+                                   stdout=subprocess.DEVNULL, env=pg_env())
+        try:
+            for chunk in chunks:
+                process.stdin.write(chunk)
+                if progress:
+                    progress(len(chunk))
+            process.stdin.close()
+        except BrokenPipeError:
+            # El proceso terminó antes (error); se informa con su stderr
+            pass
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.wait()
+
+        if process.returncode != 0:
+            stderr_file.seek(0)
+            raise subprocess.CalledProcessError(
+                process.returncode, command, stderr=stderr_file.read().decode(errors='replace')
+            )
+
+
+def require_dump_complete(chunks):
+    """
+    Deja pasar los bloques de un dump plain y, al terminar, exige que acabe
+    con DUMP_COMPLETE_MARKER. Un dump cortado (pg_dump falló durante la
+    descarga) lanza ValueError antes de cerrar el stdin de psql: psql no llega
+    al final del archivo ni al COMMIT de --single-transaction, y swap_schema
+    devuelve el schema anterior.
+    """
+    # Los dumps recientes agregan una línea \unrestrict después de la marca
+    tail = b''
+    for chunk in chunks:
+        tail = (tail + chunk)[-512:]
+        yield chunk
+    if DUMP_COMPLETE_MARKER not in tail:
+        raise ValueError('El dump SQL está incompleto: falta la marca final de pg_dump')
+
+
+def restore_sql_stream(schema_name, chunks, progress=None):
+    """Restaura el dump SQL con psql sobre un schema nuevo, leído en bloques"""
+    # psql solo aplica --single-transaction con -f; sin ON_ERROR_STOP saldría
+    # con 0 aunque fallen sentencias, y swap_schema borraría la copia buena
+    command = ['psql', *pg_connection_args(), '-v', 'ON_ERROR_STOP=1', '--single-transaction', '-f', '-']
+    with swap_schema(schema_name):
+        logger.info(f"Schema '{schema_name}' apartado; restaurando el dump SQL.")
+        _run_with_stdin(command, require_dump_complete(chunks), progress)
+
+
+def check_custom_dump(schema_name, dump_path):
+    """
+    Lee el índice del dump con `pg_restore --list` antes de borrar nada: un
+    archivo dañado o que no es un dump custom falla aquí. El dump debe ser
+    del schema de esta clínica (pg_restore lo restaura con su nombre original).
+    """
+    command = ['pg_restore', '--list', dump_path]
+    result = subprocess.run(command, capture_output=True)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(
+            result.returncode, command, stderr=result.stderr.decode(errors='replace')
+        )
+    schemas = set(SCHEMA_TOC_ENTRY.findall(result.stdout.decode(errors='replace')))
+    if schemas - {schema_name}:
+        raise ValueError(
+            f"El dump es del schema {', '.join(sorted(schemas))}, no de '{schema_name}'."
+        )
+
+
+def restore_custom_dump(schema_name, uploaded_file, jobs=RESTORE_JOBS):
+    """
+    Restaura un dump custom (-Fc) con pg_restore -j. `uploaded_file` puede ser
+    el archivo subido o la ruta de un dump ya guardado en disco.
+    """
+    temp_path = None
+    try:
+        if isinstance(uploaded_file, (str, os.PathLike)):
+            dump_path = os.fspath(uploaded_file)
+        elif hasattr(uploaded_file, 'temporary_file_path'):
+            dump_path = uploaded_file.temporary_file_path()
+        else:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.dump') as temp_file:
+                for chunk in uploaded_file.chunks(CHUNK_SIZE):
+                    temp_file.write(chunk)
+                temp_path = dump_path = temp_file.name
+
+        check_custom_dump(schema_name, dump_path)
+        command = [
+            'pg_restore', *pg_connection_args(), '--no-owner', '--no-privileges',
+            '--exit-on-error', '--jobs', str(restore_jobs(jobs)), dump_path
+        ]
+        with swap_schema(schema_name):
+            result = subprocess.run(command, capture_output=True, env=pg_env())
+            if result.returncode != 0:
+                raise subprocess.CalledProcessError(
+                    result.returncode, command, stderr=result.stderr.decode(errors='replace')
+                )
+    finally:
+        if temp_path:
+            os.remove(temp_path)
+
+
+def iter_json_array(chunks):
+    """
+    Objetos de un arreglo JSON de nivel superior ([{...}, {...}]), parseados a
+    medida que llegan los bloques. Solo se mantiene en memoria el objeto actual.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    started = False
+    exhausted = False
+    chunks = iter(chunks)
+
+    while True:
+        # Saltar espacios, el '[' inicial y las comas entre objetos
+        while position < len(buffer) and (buffer[position].isspace() or buffer[position] in '[,'):
+            if buffer[position] == '[':
+                if started:
+                    raise ValueError('El backup JSON debe ser un arreglo de objetos')
+                started = True
+            position += 1
+
+        if position < len(buffer):
+            if buffer[position] == ']':
+                return
+            try:
+                obj, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # Objeto incompleto: falta leer más bloques
+                if exhausted:
+                    raise
+            else:
+                if not started:
+                    raise ValueError('El backup JSON debe ser un arreglo de objetos')
+                yield obj
+                position = end
+                continue
+
+        if exhausted:
+            if started:
+                raise ValueError('El backup JSON está incompleto')
+            return
+
+        # Se necesita más texto: descartar lo ya consumido y leer otro bloque
+        buffer = buffer[position:]
+        position = 0
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer += text_decoder.decode(b'', final=True)
+        else:
+            buffer += text_decoder.decode(chunk)
+
+
+def _flush_batch(model, objects, counts, replace_m2m=False):
+    """
+    Inserta un lote de un modelo (con sus M2M); actualiza filas existentes como
+    loaddata. Con replace_m2m las relaciones M2M de esas filas se reemplazan
+    en lugar de agregarse (carga de incrementos sobre datos existentes).
+    """
+    if not objects:
+        return
+
+    opts = model._meta
+    update_fields = [
+        field.name for field in opts.concrete_fields
+        if not field.primary_key and not field.generated
+    ]
+    model._base_manager.bulk_create(
+        [deserialized.object for deserialized in objects],
+        batch_size=JSON_BATCH_SIZE,
+        update_conflicts=bool(update_fields),
+        unique_fields=[opts.pk.name] if update_fields else None,
+        update_fields=update_fields or None,
+    )
+
+    for field in opts.many_to_many:
+        through = field.remote_field.through
+        source = field.m2m_field_name() + '_id'
+        target = field.m2m_reverse_field_name() + '_id'
+        if replace_m2m:
+            through._base_manager.filter(
+                **{f'{source}__in': [deserialized.object.pk for deserialized in objects]}
+            ).delete()
+        rows = [
+            through(**{source: deserialized.object.pk, target: related_pk})
+            for deserialized in objects
+            for related_pk in (deserialized.m2m_data or {}).get(field.name, [])
+        ]
+        if rows:
+            through._base_manager.bulk_create(rows, batch_size=JSON_BATCH_SIZE, ignore_conflicts=True)
+
+    counts[opts.label] = counts.get(opts.label, 0) + len(objects)
+    objects.clear()
+
+
+def _apply_deletions(objects, counts):
+    """
+    Aplica los marcadores {"model": ..., "deleted": [pks]} de los backups
+    incrementales y deja pasar el resto de los objetos. Los marcadores van al
+    principio del archivo, antes de cualquier objeto a insertar.
+    """
+    for obj in objects:
+        if 'deleted' not in obj:
+            yield obj
+            continue
+        model = apps.get_model(obj['model'])
+        deleted, _ = model._base_manager.filter(pk__in=obj['deleted']).delete()
+        label = f'{model._meta.label} (eliminados)'
+        counts[label] = counts.get(label, 0) + deleted
+
+
+def load_json_stream(chunks, batch_size=JSON_BATCH_SIZE, replace_m2m=False):
+    """
+    Carga un backup de dumpdata (o un incremento) en el schema actual, en
+    lotes por modelo. Devuelve {modelo: objetos insertados}.
+    """
+    counts = {}
+    loaded_models = set()
+    batch = []
+    batch_model = None
+
+    with transaction.atomic():
+        objects = _apply_deletions(iter_json_array(chunks), counts)
+        for deserialized in PythonDeserializer(objects, ignorenonexistent=True):
+            model = type(deserialized.object)
+            if model is not batch_model or len(batch) >= batch_size:
+                _flush_batch(batch_model, batch, counts, replace_m2m)
+                batch_model = model
+            batch.append(deserialized)
+            loaded_models.add(model)
+        _flush_batch(batch_model, batch, counts, replace_m2m)
+
+        # Igual que loaddata: ajustar las secuencias de IDs a los datos cargados
+        sequence_sql = connection.ops.sequence_reset_sql(no_style(), list(loaded_models))
+        if sequence_sql:
+            with connection.cursor() as cursor:
+                for sql in sequence_sql:
+                    cursor.execute(sql)
+
+    return counts
+
+
+def restore_json_stream(chunks, batch_size=JSON_BATCH_SIZE):
+    """
+    Reemplaza los datos del tenant actual por los de un backup de dumpdata.
+    El borrado y la carga van en la misma transacción: si el archivo está
+    incompleto o falla un lote, los datos anteriores siguen intactos.
+    """
+    with transaction.atomic():
+        clear_tenant_data_safe()
+        return load_json_stream(chunks, batch_size)
+
+
+def clear_tenant_data_safe():
+    """Borra solo los datos del tenant actual, preservando los administradores."""
+    try:
+        from apps.users.models import CustomUser
+        from apps.appointments.models import Appointment
+        from apps.chat.models import ChatMessage
+        from apps.professionals.models import ProfessionalProfile
+        from apps.users.models import PatientProfile
+        
+        logger.info("Iniciando limpieza de datos del tenant (preservando admins)...")
+        
+        ChatMessage.objects.all().delete()
+        Appointment.objects.all().delete()
+        PatientProfile.objects.all().delete()
+        ProfessionalProfile.objects.all().delete()
+        
+        # --- CORRECCIÓN 2: No eliminar usuarios 'admin' ---
+        CustomUser.objects.filter(user_type__in=['patient', 'professional']).delete()
+        logger.info("Usuarios de tipo 'paciente' y 'profesional' eliminados.")
+        
+        logger.info("Limpieza de datos del tenant completada exitosamente.")
+        
+    except Exception as e:
+        logger.error(f"Error en limpieza segura de datos: {e}")
+        raise
@@ -0,0 +1,26 @@
+# apps/backups/serializers.py
+
+from rest_framework import serializers
+from apps.tenants.models import BackupJob
+
+
+class BackupJobSerializer(serializers.ModelSerializer):
+    kind_display = serializers.CharField(source='get_kind_display', read_only=True)
+    mode_display = serializers.CharField(source='get_mode_display', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+    download_available = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BackupJob
+        fields = [
+            'id', 'kind', 'kind_display', 'mode', 'mode_display', 'parent', 'snapshot_at',
+            'status', 'status_display', 'options',
+            'requested_by', 'file_name', 'bytes_processed', 'total_bytes', 'progress',
+            'result', 'error', 'created_at', 'started_at', 'finished_at',
+            'download_available'
+        ]
+        read_only_fields = fields
+
+    def get_download_available(self, obj):
+        return obj.kind == 'backup' and obj.status == 'completed' and bool(obj.file_path)
@@ -0,0 +1,62 @@
+# apps/backups/signals.py
+
+"""
+Alimenta el registro de cambios (ChangeLogEntry) de los backups incrementales
+con lo que los timestamps de los modelos no reflejan: eliminaciones, cambios
+en modelos sin `updated_at` y cambios de relaciones M2M.
+
+Las señales se conectan solo para los modelos incluidos en los backups: una
+señal post_delete global desactivaría el borrado rápido de todos los modelos.
+"""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from .incremental import is_tracked, log_changes, timestamp_fields, tracked_models
+
+
+def record_save(sender, instance, created, **kwargs):
+    if not is_tracked(sender):
+        return
+    updated, created_field = timestamp_fields(sender)
+    if updated or (created and created_field):
+        # El propio timestamp ya identifica la fila como cambiada
+        return
+    log_changes(sender, [instance.pk], 'save')
+
+
+def record_delete(sender, instance, **kwargs):
+    if is_tracked(sender):
+        log_changes(sender, [instance.pk], 'delete')
+
+
+def record_m2m_change(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+
+    owner, field = M2M_FIELDS[sender]
+    if not is_tracked(owner):
+        return
+
+    if not reverse:
+        pks = [instance.pk]
+    elif action == 'pre_clear':
+        # Lado inverso: cambian todas las filas relacionadas con la instancia
+        pks = sender._base_manager.filter(
+            **{field.m2m_reverse_field_name(): instance.pk}
+        ).values_list(field.m2m_field_name() + '_id', flat=True)
+    else:
+        pks = pk_set or []
+    log_changes(owner, list(pks), 'save')
+
+
+# Tabla intermedia -> (modelo dueño del campo M2M, campo)
+M2M_FIELDS = {}
+
+for tracked in tracked_models():
+    uid = tracked._meta.label_lower
+    post_save.connect(record_save, sender=tracked, dispatch_uid=f'backups-changelog-save-{uid}')
+    post_delete.connect(record_delete, sender=tracked, dispatch_uid=f'backups-changelog-delete-{uid}')
+    for m2m_field in tracked._meta.many_to_many:
+        through = m2m_field.remote_field.through
+        M2M_FIELDS[through] = (tracked, m2m_field)
+        m2m_changed.connect(record_m2m_change, sender=through, dispatch_uid=f'backups-changelog-m2m-{uid}-{m2m_field.name}')
@@ -0,0 +1,185 @@
+# apps/backups/streaming.py
+
+"""
+Herramientas para generar backups en streaming.
+
+pg_dump escribe en un pipe que se lee en bloques de CHUNK_SIZE bytes y se
+envía al cliente con StreamingHttpResponse (opcionalmente comprimido con gzip
+al vuelo), así la memoria del worker no depende del tamaño del tenant.
+
+Los encabezados (200) salen con el primer bloque, antes de saber si pg_dump
+terminará bien. Si falla a mitad, DumpProcess.chunks() lanza la excepción
+dentro del generador: el servidor corta la conexión sin cerrar la respuesta
+(chunked sin bloque final) y el cliente ve una descarga incompleta, no un
+archivo válido. Aun así, el archivo se puede comprobar después:
+- plain: termina con DUMP_COMPLETE_MARKER (restore_sql_stream lo exige),
+- .gz: sin el final del stream gzip, gunzip falla (el error corta antes),
+- custom: pg_restore falla al leer un archivo truncado.
+"""
+
+import logging
+import subprocess
+import tempfile
+import zlib
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('apps')
+
+CHUNK_SIZE = 64 * 1024
+
+# Última línea que escribe pg_dump en formato plain cuando termina bien
+DUMP_COMPLETE_MARKER = b'-- PostgreSQL database dump complete'
+
+# Formatos de pg_dump soportados: (opción --format, extensión, content type)
+DUMP_FORMATS = {
+    'plain': ('p', 'sql', 'application/sql'),
+    'custom': ('c', 'dump', 'application/octet-stream'),
+}
+
+# Apps incluidas en el backup JSON de respaldo (dumpdata) cuando pg_dump falla
+DUMPDATA_APPS = ['users', 'professionals', 'appointments', 'chat', 'clinical_history', 'payment_system']
+
+
+def pg_connection_args():
+    """Opciones de conexión comunes para pg_dump, pg_restore y psql"""
+    db_settings = settings.DATABASES['default']
+    # Se usa '127.0.0.1' en lugar de db_settings['HOST'], igual que la restauración
+    return [
+        '--dbname', db_settings['NAME'], '--host', '127.0.0.1',
+        '--port', str(db_settings['PORT']), '--username', db_settings['USER'],
+    ]
+
+
+def pg_env():
+    return {'PGPASSWORD': settings.DATABASES['default']['PASSWORD']}
+
+
+def pg_dump_command(schema_name, dump_format='plain'):
+    """
+    Comando pg_dump para un schema. Sin --inserts: COPY genera dumps varias
+    veces más chicos y rápidos de restaurar.
+    """
+    format_option = DUMP_FORMATS[dump_format][0]
+    return ['pg_dump', *pg_connection_args(), '--schema', schema_name,
+            '--format', format_option, '--no-owner', '--no-privileges']
+
+
+class DumpProcess:
+    """
+    pg_dump en ejecución. start() lee el primer bloque antes de devolver para
+    detectar errores inmediatos (pg_dump ausente, credenciales, schema
+    inexistente) mientras todavía se puede responder con otro método.
+    """
+
+    def __init__(self, command, env=None, chunk_size=CHUNK_SIZE):
+        self.command = command
+        self.env = env
+        self.chunk_size = chunk_size
+        self.bytes_read = 0
+        self.process = None
+        self.first_chunk = b''
+        # stderr va a un archivo temporal: si se leyera solo stdout, un stderr
+        # largo llenaría su pipe y bloquearía a pg_dump
+        self.stderr_file = tempfile.TemporaryFile()
+
+    def start(self):
+        self.process = subprocess.Popen(
+            self.command, stdout=subprocess.PIPE, stderr=self.stderr_file, env=self.env
+        )
+        self.first_chunk = self.process.stdout.read(self.chunk_size)
+        if not self.first_chunk:
+            # Sin salida: pg_dump terminó sin generar nada
+            self.process.wait()
+            self._check_returncode()
+        return self
+
+    def stderr(self):
+        self.stderr_file.seek(0)
+        return self.stderr_file.read().decode(errors='replace')
+
+    def _check_returncode(self):
+        if self.process.returncode != 0:
+            stderr = self.stderr()
+            logger.error(f"Error en pg_dump: {stderr}")
+            raise subprocess.CalledProcessError(self.process.returncode, self.command, stderr=stderr)
+
+    def chunks(self):
+        """
+        Bloques de la salida de pg_dump; si el cliente corta, se termina el
+        proceso. Si pg_dump falla, lanza CalledProcessError después del último
+        bloque para que la respuesta en curso se aborte en lugar de terminar
+        como si el archivo estuviera completo.
+        """
+        try:
+            chunk = self.first_chunk
+            while chunk:
+                self.bytes_read += len(chunk)
+                yield chunk
+                chunk = self.process.stdout.read(self.chunk_size)
+
+            self.process.wait()
+            if self.process.returncode != 0:
+                logger.error(
+                    f"pg_dump terminó con código {self.process.returncode} después de enviar "
+                    f"{self.bytes_read} bytes: se aborta la descarga."
+                )
+            self._check_returncode()
+        finally:
+            if self.process.poll() is None:
+                self.process.kill()
+                self.process.wait()
+            self.process.stdout.close()
+            self.stderr_file.close()
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Comprime al vuelo una secuencia de bloques en formato gzip. Si `chunks`
+    lanza una excepción no se escribe el final del stream (CRC y tamaño), así
+    que un .gz cortado no se descomprime como si estuviera completo.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def write_pg_dump(schema_name, path, dump_format='plain', compress=False, progress=None):
+    """
+    Escribe el dump de un schema en `path` bloque a bloque. `progress(n)` se
+    llama con los bytes leídos de pg_dump. Devuelve el tamaño del archivo.
+    """
+    dump = DumpProcess(pg_dump_command(schema_name, dump_format), env=pg_env()).start()
+    chunks = dump.chunks()
+    if progress:
+        chunks = _report(chunks, progress)
+    if compress:
+        chunks = gzip_chunks(chunks)
+
+    size = 0
+    with open(path, 'wb') as output:
+        for chunk in chunks:
+            output.write(chunk)
+            size += len(chunk)
+    return size
+
+
+def _report(chunks, progress):
+    for chunk in chunks:
+        progress(len(chunk))
+        yield chunk
+
+
+def schema_size(schema_name):
+    """Tamaño en disco de las tablas del schema (estimación del tamaño del dump)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT COALESCE(SUM(pg_total_relation_size(format('%%I.%%I', schemaname, tablename))), 0) "
+            "FROM pg_tables WHERE schemaname = %s",
+            [schema_name]
+        )
+        return cursor.fetchone()[0]
@@ -1,3 +1,111 @@
-from django.test import TestCase
+# apps/backups/tests.py
 
-# Create your tests here.
+import gzip
+import json
+from contextlib import nullcontext
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from .restore import gunzip_chunks, iter_json_array, require_dump_complete, restore_jobs, restore_sql_stream
+from .streaming import DUMP_COMPLETE_MARKER, gzip_chunks
+
+
+def split_bytes(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class IterJsonArrayTests(SimpleTestCase):
+    def parse(self, data, size=7):
+        return list(iter_json_array(split_bytes(data, size)))
+
+    def test_objects_split_across_chunks(self):
+        objects = [{'model': 'users.customuser', 'pk': n, 'fields': {'email': f'u{n}@x.com'}} for n in range(20)]
+        data = json.dumps(objects, indent=2).encode('utf-8')
+        for size in (1, 3, 64, len(data)):
+            self.assertEqual(self.parse(data, size), objects)
+
+    def test_multibyte_characters_split_across_chunks(self):
+        objects = [{'fields': {'name': 'Psicología Ñandú 🧠'}}]
+        data = json.dumps(objects, ensure_ascii=False).encode('utf-8')
+        # Con bloques de 1 byte cada carácter multibyte queda partido
+        self.assertEqual(self.parse(data, 1), objects)
+
+    def test_empty_array_and_empty_input(self):
+        self.assertEqual(self.parse(b'[]'), [])
+        self.assertEqual(self.parse(b'  [ \n ]  '), [])
+        self.assertEqual(self.parse(b''), [])
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(ValueError):
+            self.parse(b'[{"pk": 1}, {"pk": 2}')
+        with self.assertRaises(ValueError):
+            self.parse(b'[{"pk": 1}, {"pk"')
+
+    def test_non_array_raises(self):
+        with self.assertRaises(ValueError):
+            self.parse(b'{"pk": 1}')
+        with self.assertRaises(ValueError):
+            self.parse(b'[[{"pk": 1}]]')
+
+
+class GzipChunksTests(SimpleTestCase):
+    def test_round_trip(self):
+        data = b''.join(f'línea {n}\n'.encode('utf-8') for n in range(5000))
+        compressed = b''.join(gzip_chunks(split_bytes(data, 1000)))
+
+        self.assertEqual(gzip.decompress(compressed), data)
+        self.assertEqual(b''.join(gunzip_chunks(split_bytes(compressed, 100))), data)
+
+    def test_truncated_input_raises(self):
+        compressed = gzip.compress(b'x' * 10000)
+        with self.assertRaises(ValueError):
+            b''.join(gunzip_chunks(split_bytes(compressed[:-8], 100)))
+
+    def test_failed_source_does_not_produce_a_valid_gzip(self):
+        def chunks():
+            yield b'parte del dump'
+            raise RuntimeError('pg_dump falló')
+
+        written = []
+        with self.assertRaises(RuntimeError):
+            for chunk in gzip_chunks(chunks()):
+                written.append(chunk)
+        with self.assertRaises(ValueError):
+            b''.join(gunzip_chunks(written))
+
+
+class RequireDumpCompleteTests(SimpleTestCase):
+    def test_complete_dump_passes_through(self):
+        data = b'SET x = 1;\n' * 100 + DUMP_COMPLETE_MARKER + b'\n--\n\n\\unrestrict abc\n\n'
+        self.assertEqual(b''.join(require_dump_complete(split_bytes(data, 10))), data)
+
+    def test_marker_split_across_chunks(self):
+        data = b'SET x = 1;\n' + DUMP_COMPLETE_MARKER + b'\n'
+        self.assertEqual(b''.join(require_dump_complete(split_bytes(data, 1))), data)
+
+    def test_truncated_dump_raises(self):
+        with self.assertRaises(ValueError):
+            b''.join(require_dump_complete([b'SET x = 1;\n', b'COPY public.t (id) FROM stdin;\n']))
+
+
+@override_settings(BACKUP_MAX_RESTORE_JOBS=4)
+class RestoreJobsTests(SimpleTestCase):
+    def test_value_is_clamped(self):
+        self.assertEqual(restore_jobs('2'), 2)
+        self.assertEqual(restore_jobs('64'), 4)
+        self.assertEqual(restore_jobs('0'), 1)
+        self.assertEqual(restore_jobs('abc'), 4)
+        self.assertEqual(restore_jobs(None), 4)
+
+
+class RestoreSqlStreamTests(SimpleTestCase):
+    def test_psql_stops_on_errors_inside_one_transaction(self):
+        with mock.patch('apps.backups.restore.swap_schema', return_value=nullcontext()) as swap, \
+                mock.patch('apps.backups.restore._run_with_stdin') as run:
+            restore_sql_stream('clinica', [b''])
+
+        swap.assert_called_once_with('clinica')
+        command = run.call_args.args[0]
+        self.assertEqual(command[0], 'psql')
+        self.assertEqual(command[-5:], ['-v', 'ON_ERROR_STOP=1', '--single-transaction', '-f', '-'])
@@ -1,9 +1,15 @@
 # apps/backups/urls.py
 
 from django.urls import path
-from .views import CreateBackupAndDownloadView, RestoreBackupFromFileView
+from .views import (
+    BackupJobDetailView, BackupJobDownloadView, BackupJobListCreateView,
+    CreateBackupAndDownloadView, RestoreBackupFromFileView,
+)
 
 urlpatterns = [
     path('create/', CreateBackupAndDownloadView.as_view(), name='create-backup'),
     path('restore/', RestoreBackupFromFileView.as_view(), name='restore-backup'),
-]
\ No newline at end of file
+    path('jobs/', BackupJobListCreateView.as_view(), name='backup-jobs'),
+    path('jobs/<int:pk>/', BackupJobDetailView.as_view(), name='backup-job-detail'),
+    path('jobs/<int:pk>/download/', BackupJobDownloadView.as_view(), name='backup-job-download'),
+]
@@ -2,19 +2,24 @@
 
 import subprocess
 import datetime
-import psycopg2
-import json
 import os
 import tempfile
-from django.conf import settings
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.core.management import call_command
-from io import StringIO
+from django_tenants.utils import get_public_schema_name, schema_context
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from rest_framework.parsers import MultiPartParser, FormParser
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from apps.clinic_admin.permissions import IsClinicAdmin
+from apps.tenants.models import BackupJob
+from . import jobs
+from .restore import (
+    iter_upload_chunks, restore_custom_dump, restore_jobs,
+    restore_json_stream, restore_sql_stream,
+)
+from .serializers import BackupJobSerializer
+from .streaming import DUMP_FORMATS, DUMPDATA_APPS, DumpProcess, gzip_chunks, pg_dump_command, pg_env
 import logging
 
 # Cambiar para usar el logger de 'apps' que va a la base de datos
@@ -35,31 +40,39 @@ class CreateBackupAndDownloadView(APIView):
             return self._create_backup_with_django(request)
 
     def _create_backup_with_pg_dump(self, request):
-        """Genera un backup en formato .sql usando la herramienta pg_dump."""
+        """
+        Genera un backup con pg_dump y lo envía en streaming, sin cargarlo en memoria.
+        Parámetros opcionales: format=plain|custom (-Fc) y compress=1 (gzip, solo plain).
+        Si pg_dump falla a mitad, la conexión se corta sin terminar la respuesta
+        (ver apps/backups/streaming.py para comprobar la descarga).
+        """
         schema_name = request.tenant.schema_name
-        db_settings = settings.DATABASES['default']
         timestamp = datetime.datetime.now().strftime('%Y-%m-%d-%H%M%S')
-        filename = f"backup-sql-{schema_name}-{timestamp}.sql"
 
-        # --- CORRECCIÓN 1: Usar '127.0.0.1' en lugar de db_settings['HOST'] ---
-        command = [
-            'pg_dump', '--dbname', db_settings['NAME'], '--host', '127.0.0.1',
-            '--port', str(db_settings['PORT']), '--username', db_settings['USER'],
-            '--schema', schema_name, '--format', 'p', '--inserts', '--no-owner', '--no-privileges'
-        ]
-        env = {'PGPASSWORD': db_settings['PASSWORD']}
+        dump_format = request.data.get('format') or request.query_params.get('format') or 'plain'
+        if dump_format not in DUMP_FORMATS:
+            dump_format = 'plain'
+        # El formato custom ya viene comprimido
+        compress = dump_format == 'plain' and str(
+            request.data.get('compress') or request.query_params.get('compress') or ''
+        ).lower() in ('1', 'true')
 
-        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
-        stdout, stderr = process.communicate()
+        _, extension, content_type = DUMP_FORMATS[dump_format]
+        filename = f"backup-sql-{schema_name}-{timestamp}.{extension}"
 
-        if process.returncode != 0:
-            logger.error(f"Error en pg_dump: {stderr.decode()}")
-            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr)
+        dump = DumpProcess(pg_dump_command(schema_name, dump_format), env=pg_env()).start()
+        chunks = dump.chunks()
+        if compress:
+            chunks = gzip_chunks(chunks)
+            filename += '.gz'
+            content_type = 'application/gzip'
 
-        # 🔽 EJEMPLO DE REGISTRO DE ÉXITO
-        logger.info(f"Backup SQL creado exitosamente para el schema '{request.tenant.schema_name}'.")
-        
-        response = HttpResponse(stdout, content_type='application/sql')
+        logger.info(
+            f"Backup {dump_format}{' (gzip)' if compress else ''} iniciado en streaming "
+            f"para el schema '{schema_name}'."
+        )
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         return response
 
@@ -71,16 +84,18 @@ class CreateBackupAndDownloadView(APIView):
 
         logger.info(f"Creando backup JSON para {schema_name} usando Django dumpdata.")
 
-        buffer = StringIO()
-        tenant_apps = ['users', 'professionals', 'appointments', 'chat', 'clinical_history', 'payment_system']
-        call_command('dumpdata', *tenant_apps, format='json', indent=2, stdout=buffer)
-        buffer.seek(0)
+        # dumpdata escribe en un archivo temporal que luego se envía en bloques
+        with tempfile.NamedTemporaryFile(delete=False, mode='w', suffix='.json', encoding='utf-8') as temp_file:
+            call_command('dumpdata', *DUMPDATA_APPS, format='json', indent=2, stdout=temp_file)
+            temp_file_path = temp_file.name
+
+        backup = open(temp_file_path, 'rb')
+        # El archivo abierto sigue siendo legible después de borrarlo del disco
+        os.remove(temp_file_path)
 
         logger.info(f"Backup JSON creado exitosamente para el schema '{schema_name}'.")
 
-        response = HttpResponse(buffer.getvalue(), content_type='application/json')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
+        return FileResponse(backup, as_attachment=True, filename=filename, content_type='application/json')
 
 
 class RestoreBackupFromFileView(APIView):
@@ -101,107 +116,175 @@ class RestoreBackupFromFileView(APIView):
             logger.warning(f"Usuario '{request.user.email}' intentó restaurar el esquema público (prohibido).")
             return Response({'error': 'No está permitido restaurar el esquema público.'}, status=status.HTTP_403_FORBIDDEN)
 
-        if backup_file.name.endswith('.sql'):
-            return self._restore_sql_backup(request, backup_file)
-        elif backup_file.name.endswith('.json'):
-            return self._restore_json_backup(request, backup_file)
+        name = backup_file.name.lower()
+        if name.endswith('.sql') or name.endswith('.sql.gz'):
+            response = self._restore_sql_backup(request, backup_file)
+        elif name.endswith('.dump'):
+            response = self._restore_custom_backup(request, backup_file)
+        elif name.endswith('.json'):
+            response = self._restore_json_backup(request, backup_file)
         else:
-            return Response({'error': 'Formato de archivo no soportado. Use .sql o .json.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'error': 'Formato de archivo no soportado. Use .sql, .sql.gz, .dump o .json.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if response.status_code == status.HTTP_200_OK:
+            # Los backups incrementales posteriores deben partir de uno completo nuevo
+            jobs.record_restore(request.tenant, request.user.email, backup_file.name)
+        return response
 
     def _restore_sql_backup(self, request, backup_file):
         schema_name = request.tenant.schema_name
-        db_settings = settings.DATABASES['default']
-        env = {'PGPASSWORD': db_settings['PASSWORD']}
         
         logger.info(f"Iniciando restauración SQL para el schema '{schema_name}'.")
         
         try:
-            # --- CORRECCIÓN 1: Usar '127.0.0.1' en la conexión ---
-            conn = psycopg2.connect(
-                dbname=db_settings['NAME'], user=db_settings['USER'],
-                password=db_settings['PASSWORD'], host='127.0.0.1', port=db_settings['PORT']
-            )
-            conn.autocommit = True
-            with conn.cursor() as cursor:
-                cursor.execute(f'DROP SCHEMA IF EXISTS "{schema_name}" CASCADE;')
-                cursor.execute(f'CREATE SCHEMA "{schema_name}";')
-                cursor.execute(f'GRANT ALL ON SCHEMA "{schema_name}" TO "{db_settings["USER"]}";')
-            conn.close()
-
-            logger.info(f"Schema '{schema_name}' recreado exitosamente.")
-
-            # --- CORRECCIÓN 1: Usar '127.0.0.1' para psql ---
-            restore_command = [
-                'psql', '--dbname', db_settings['NAME'], '--host', '127.0.0.1',
-                '--port', str(db_settings['PORT']), '--username', db_settings['USER'],
-                '--single-transaction'
-            ]
-            process = subprocess.run(restore_command, input=backup_file.read(), capture_output=True, check=True, env=env)
+            # El archivo se envía a psql en bloques (descomprimiendo .gz al vuelo)
+            chunks = iter_upload_chunks(backup_file, gunzip=backup_file.name.lower().endswith('.gz'))
+            restore_sql_stream(schema_name, chunks)
             
             # 🔽 EJEMPLO DE REGISTRO DE ÉXITO
             logger.info(f"Restauración SQL completada para el schema '{request.tenant.schema_name}'.")
             return Response({'status': 'Restauración desde SQL completada.'}, status=status.HTTP_200_OK)
         except subprocess.CalledProcessError as e:
             # 🔽 EJEMPLO DE REGISTRO DE ERROR
-            logger.error(f"Error en subprocess de restauración SQL: {e.stderr.decode()}")
-            return Response({'error': f"Error en la restauración SQL: {e.stderr.decode()}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            logger.error(f"Error en subprocess de restauración SQL: {e.stderr}")
+            return Response({'error': f"Error en la restauración SQL: {e.stderr}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e:
             # 🔽 EJEMPLO DE REGISTRO DE ERROR CRÍTICO
             logger.error(f"FALLO CRÍTICO en la restauración SQL: {e}", exc_info=True)
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    def _restore_json_backup(self, request, backup_file):
-        """Restaura desde un archivo JSON usando archivos temporales."""
-        temp_file_path = None
+    def _restore_custom_backup(self, request, backup_file):
+        """Restaura un dump en formato custom (-Fc) con pg_restore en paralelo."""
+        schema_name = request.tenant.schema_name
+        jobs = restore_jobs(request.data.get('jobs'))
         
+        logger.info(f"Iniciando restauración custom para el schema '{schema_name}' con {jobs} jobs.")
+        
+        try:
+            restore_custom_dump(schema_name, backup_file, jobs=jobs)
+            logger.info(f"Restauración custom completada para el schema '{schema_name}'.")
+            return Response({'status': 'Restauración desde dump custom completada.'}, status=status.HTTP_200_OK)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Error en pg_restore: {e.stderr}")
+            return Response({'error': f"Error en la restauración: {e.stderr}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        except Exception as e:
+            logger.error(f"FALLO CRÍTICO en la restauración custom: {e}", exc_info=True)
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _restore_json_backup(self, request, backup_file):
+        """Restaura desde un archivo JSON parseándolo en streaming e insertando por lotes."""
         logger.info(f"Iniciando restauración JSON para el schema '{request.tenant.schema_name}'.")
         
         try:
-            with tempfile.NamedTemporaryFile(delete=False, mode='w+', suffix='.json', encoding='utf-8') as temp_file:
-                temp_file.write(backup_file.read().decode('utf-8'))
-                temp_file_path = temp_file.name
-            
-            logger.info("Limpiando datos del tenant de forma segura (preservando admins).")
-            self._clear_tenant_data_safe()
-            
-            logger.info(f"Cargando datos desde archivo temporal: {temp_file_path}")
-            call_command('loaddata', temp_file_path)
+            # Limpieza segura (preservando admins) y carga en una sola transacción
+            counts = restore_json_stream(iter_upload_chunks(backup_file))
             
-            logger.info(f"Restauración JSON completada para el schema '{request.tenant.schema_name}'.")
-            return Response({'status': 'Restauración desde JSON completada.'}, status=status.HTTP_200_OK)
+            logger.info(
+                f"Restauración JSON completada para el schema '{request.tenant.schema_name}': "
+                f"{sum(counts.values())} objetos."
+            )
+            return Response({'status': 'Restauración desde JSON completada.', 'objects': counts}, status=status.HTTP_200_OK)
         except Exception as e:
             logger.error(f"Error en restauración JSON: {str(e)}")
             return Response({'error': f"Error en la restauración JSON: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        finally:
-            if temp_file_path and os.path.exists(temp_file_path):
-                try:
-                    os.remove(temp_file_path)
-                    logger.info(f"Archivo temporal eliminado: {temp_file_path}")
-                except Exception as e:
-                    logger.warning(f"No se pudo eliminar archivo temporal {temp_file_path}: {e}")
-
-    def _clear_tenant_data_safe(self):
-        """Borra solo los datos del tenant actual, preservando los administradores."""
-        try:
-            from apps.users.models import CustomUser
-            from apps.appointments.models import Appointment
-            from apps.chat.models import ChatMessage
-            from apps.professionals.models import ProfessionalProfile
-            from apps.users.models import PatientProfile
-            
-            logger.info("Iniciando limpieza de datos del tenant (preservando admins)...")
-            
-            ChatMessage.objects.all().delete()
-            Appointment.objects.all().delete()
-            PatientProfile.objects.all().delete()
-            ProfessionalProfile.objects.all().delete()
-            
-            # --- CORRECCIÓN 2: No eliminar usuarios 'admin' ---
-            CustomUser.objects.filter(user_type__in=['patient', 'professional']).delete()
-            logger.info("Usuarios de tipo 'paciente' y 'profesional' eliminados.")
-            
-            logger.info("Limpieza de datos del tenant completada exitosamente.")
-            
-        except Exception as e:
-            logger.error(f"Error en limpieza segura de datos: {e}")
-            raise
\ No newline at end of file
+
+
+class BackupJobListCreateView(APIView):
+    """
+    Backups y restauraciones en segundo plano.
+    GET lista los trabajos de la clínica; POST encola uno y responde 202 con
+    su id para consultar el progreso en jobs/<id>/. Los ejecuta el comando
+    run_backup_worker.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsClinicAdmin]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def get(self, request, *args, **kwargs):
+        with schema_context(get_public_schema_name()):
+            queryset = BackupJob.objects.filter(clinic_id=request.tenant.pk)[:50]
+            data = BackupJobSerializer(queryset, many=True).data
+        return Response(data)
+
+    def post(self, request, *args, **kwargs):
+        kind = request.data.get('kind', 'backup')
+        if kind not in ('backup', 'restore'):
+            return Response({'error': "kind debe ser 'backup' o 'restore'."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if request.tenant.schema_name == get_public_schema_name():
+            return Response({'error': 'No está permitido operar sobre el esquema público.'}, status=status.HTTP_403_FORBIDDEN)
+
+        options = {}
+        uploaded_file = None
+        mode = 'full'
+        if kind == 'backup':
+            # mode=incremental|differential: solo los cambios desde el backup base
+            mode = request.data.get('mode') or 'full'
+            if mode not in dict(BackupJob.MODE_CHOICES):
+                return Response({'error': "mode debe ser 'full', 'incremental' o 'differential'."}, status=status.HTTP_400_BAD_REQUEST)
+            dump_format = request.data.get('format') or 'plain'
+            options['format'] = dump_format if dump_format in DUMP_FORMATS else 'plain'
+            options['compress'] = str(request.data.get('compress') or '').lower() in ('1', 'true')
+        else:
+            options['jobs'] = restore_jobs(request.data.get('jobs'))
+
+            backup_job = request.data.get('backup_job')
+            if backup_job:
+                # Restaurar un backup guardado: se reproduce su cadena completa
+                if not str(backup_job).isdigit():
+                    return Response({'error': 'backup_job debe ser un id.'}, status=status.HTTP_400_BAD_REQUEST)
+                with schema_context(get_public_schema_name()):
+                    exists = BackupJob.objects.filter(
+                        pk=backup_job, clinic_id=request.tenant.pk, kind='backup', status='completed'
+                    ).exists()
+                if not exists:
+                    return Response({'error': 'Backup no encontrado.'}, status=status.HTTP_404_NOT_FOUND)
+                options['backup_job'] = int(backup_job)
+            else:
+                uploaded_file = request.FILES.get('backup_file')
+                if uploaded_file is None:
+                    return Response({'error': 'No se proporcionó ningún archivo.'}, status=status.HTTP_400_BAD_REQUEST)
+                name = uploaded_file.name.lower()
+                if not name.endswith(('.sql', '.sql.gz', '.dump', '.json')):
+                    return Response({'error': 'Formato de archivo no soportado. Use .sql, .sql.gz, .dump o .json.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        logger.info(f"Usuario '{request.user.email}' encoló un trabajo de {kind}.")
+        job = jobs.enqueue(request.tenant, kind, requested_by=request.user.email,
+                           options=options, uploaded_file=uploaded_file, mode=mode)
+        with schema_context(get_public_schema_name()):
+            data = BackupJobSerializer(job).data
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class BackupJobDetailView(APIView):
+    """Estado y progreso de un trabajo de la clínica actual"""
+    permission_classes = [permissions.IsAuthenticated, IsClinicAdmin]
+
+    def get(self, request, pk, *args, **kwargs):
+        with schema_context(get_public_schema_name()):
+            job = get_clinic_job(request, pk)
+            data = BackupJobSerializer(job).data
+        return Response(data)
+
+
+class BackupJobDownloadView(APIView):
+    """Descarga el archivo generado por un trabajo de backup completado"""
+    permission_classes = [permissions.IsAuthenticated, IsClinicAdmin]
+
+    def get(self, request, pk, *args, **kwargs):
+        with schema_context(get_public_schema_name()):
+            job = get_clinic_job(request, pk)
+
+        if job.kind != 'backup' or job.status != 'completed' or not job.file_path:
+            return Response({'error': 'El backup todavía no está disponible.'}, status=status.HTTP_409_CONFLICT)
+        if not os.path.exists(job.file_path):
+            return Response({'error': 'El archivo del backup ya no existe.'}, status=status.HTTP_410_GONE)
+
+        logger.info(f"Usuario '{request.user.email}' descargó el backup del trabajo #{job.pk}.")
+        return FileResponse(open(job.file_path, 'rb'), as_attachment=True, filename=job.file_name)
+
+
+def get_clinic_job(request, pk):
+    try:
+        return BackupJob.objects.get(pk=pk, clinic_id=request.tenant.pk)
+    except BackupJob.DoesNotExist:
+        raise Http404('Trabajo no encontrado')
@@ -0,0 +1,95 @@
+# apps/chat/cache.py
+
+"""
+Caché token → usuario para la autenticación de los WebSockets del chat
+(apps.chat.middleware.get_user).
+
+También guarda la clínica de cada dominio (TenantWebSocketMiddleware) y los
+participantes de cada cita (apps.chat.rooms), que se consultan en cada
+conexión igual que el token.
+
+Las claves llevan el schema de la clínica: el mismo token no vale en otra
+clínica. Junto a cada token se guarda la clave inversa usuario → token, para
+poder invalidar por usuario sin consultar la base de datos. Las señales de
+apps.chat.signals invalidan al borrar un token (logout_user, change_password)
+y al guardar el usuario (cambio de contraseña, desactivación).
+
+El TTL es corto (CACHES['chat_auth']): con la caché en memoria de cada
+proceso, la invalidación solo llega al proceso que atendió la petición, y el
+TTL acota cuánto tiempo puede reutilizarse un token revocado en los demás.
+Con varios workers conviene un backend compartido (CHAT_AUTH_CACHE_BACKEND).
+
+Las lecturas y escrituras desde el bucle de eventos (middleware y consumers)
+usan la API asíncrona de la caché (funciones `a...`); las síncronas quedan
+para las señales y el código que ya corre en un hilo del pool.
+"""
+
+import hashlib
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+
+CHAT_AUTH_CACHE_ALIAS = 'chat_auth'
+
+
+def get_auth_cache():
+    return caches[CHAT_AUTH_CACHE_ALIAS]
+
+
+def _token_key(schema_name, token_key):
+    # El token en claro no se usa como clave de caché
+    digest = hashlib.sha256(token_key.encode('utf-8')).hexdigest()
+    return f'chat:token:{schema_name}:{digest}'
+
+
+def _domain_key(hostname):
+    return f'chat:domain:{hostname}'
+
+
+def _room_key(schema_name, appointment_id):
+    return f'chat:room:{schema_name}:{appointment_id}'
+
+
+def _user_key(schema_name, user_id):
+    return f'chat:user:{schema_name}:{user_id}'
+
+
+def cache_user(schema_name, token_key, user):
+    cache = get_auth_cache()
+    key = _token_key(schema_name, token_key)
+    cache.set_many({key: user, _user_key(schema_name, user.pk): key})
+
+
+async def aget_cached_user(schema_name, token_key):
+    return await get_auth_cache().aget(_token_key(schema_name, token_key))
+
+
+async def aget_cached_tenant(hostname):
+    return await get_auth_cache().aget(_domain_key(hostname))
+
+
+async def acache_tenant(hostname, tenant):
+    await get_auth_cache().aset(_domain_key(hostname), tenant)
+
+
+async def aget_cached_participants(schema_name, appointment_id):
+    return await get_auth_cache().aget(_room_key(schema_name, appointment_id))
+
+
+async def acache_participants(schema_name, appointment_id, participants, timeout=DEFAULT_TIMEOUT):
+    await get_auth_cache().aset(_room_key(schema_name, appointment_id), participants, timeout)
+
+
+def invalidate_participants(schema_name, appointment_id):
+    get_auth_cache().delete(_room_key(schema_name, appointment_id))
+
+
+def invalidate_token(schema_name, token_key):
+    get_auth_cache().delete(_token_key(schema_name, token_key))
+
+
+def invalidate_user(schema_name, user_id):
+    cache = get_auth_cache()
+    user_key = _user_key(schema_name, user_id)
+    token_key = cache.get(user_key)
+    cache.delete_many([user_key] + ([token_key] if token_key else []))
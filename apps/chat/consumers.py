@@ -1,22 +1,45 @@
 # apps/chat/consumers.py
 import json
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name
+
+from .persistence import buffer
+from .rooms import can_join_room, record_connect
+
+# Un mensaje tiene que caber en un NOTIFY de la capa de PostgreSQL (apps/chat/layers.py)
+MAX_MESSAGE_LENGTH = 1500
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.appointment_id = self.scope['url_route']['kwargs']['appointment_id']
         self.room_group_name = f'chat_{self.appointment_id}'
         self.user = self.scope.get('user')
+        self.schema_name = self.scope.get('schema_name', get_public_schema_name())
 
+        # Los mensajes se guardan en el schema de la clínica: sin clínica no hay chat
+        if self.schema_name == get_public_schema_name():
+            record_connect(False, 'no_tenant')
+            await self.close()
+            return
         if self.user.is_anonymous:
+            record_connect(False, 'anonymous')
             await self.close()
-        else:
-            # Unirse al grupo de la sala
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
-            await self.accept()
+            return
+
+        # Solo el paciente y el psicólogo de la cita; se comprueba una vez por socket
+        if not await can_join_room(self.schema_name, self.user.id, int(self.appointment_id)):
+            record_connect(False, 'participant')
+            await self.close()
+            return
+
+        # Unirse al grupo de la sala
+        await self.channel_layer.group_add(
+            self.room_group_name,
+            self.channel_name
+        )
+        await self.accept()
+        record_connect(True)
 
     async def disconnect(self, close_code):
         # Salir del grupo de la sala
@@ -24,12 +47,29 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        # Lo que quede pendiente se guarda antes de soltar el socket
+        await buffer.flush()
 
     # Recibir mensaje desde WebSocket
     async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
+        try:
+            text_data_json = json.loads(text_data)
+            message = str(text_data_json['message']).strip()
+        except (ValueError, TypeError, KeyError):
+            return
+        if not message:
+            return
+        if len(message) > MAX_MESSAGE_LENGTH:
+            await self.send(text_data=json.dumps({
+                'error': f'El mensaje supera los {MAX_MESSAGE_LENGTH} caracteres'
+            }))
+            return
+
         sender_name = self.user.first_name if self.user.first_name else self.user.username
+        timestamp = timezone.now()
+
+        # Se guarda en segundo plano (persistence.buffer); la entrega no espera a la BD
+        buffer.add(self.schema_name, int(self.appointment_id), self.user.id, message, timestamp)
 
         # Enviar mensaje al grupo de la sala
         await self.channel_layer.group_send(
@@ -37,17 +77,18 @@ class ChatConsumer(AsyncWebsocketConsumer):
             {
                 'type': 'chat_message',
                 'message': message,
-                'sender': sender_name
+                'sender': sender_name,
+                'sender_id': self.user.id,
+                'timestamp': timestamp.isoformat(),
             }
         )
 
     # Recibir mensaje desde el grupo de la sala
     async def chat_message(self, event):
-        message = event['message']
-        sender = event['sender']
-
         # Enviar mensaje al WebSocket
         await self.send(text_data=json.dumps({
-            'message': message,
-            'sender': sender
-        }))
\ No newline at end of file
+            'message': event['message'],
+            'sender': event['sender'],
+            'sender_id': event.get('sender_id'),
+            'timestamp': event.get('timestamp'),
+        }))
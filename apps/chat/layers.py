@@ -0,0 +1,475 @@
+# apps/chat/layers.py
+
+"""
+Channel layer sobre PostgreSQL LISTEN/NOTIFY.
+
+Permite correr varios procesos ASGI sin un broker aparte: un group_send en
+cualquier proceso llega a los sockets de la sala en todos los procesos.
+
+- Cada proceso abre una conexión propia (fuera del ORM) que atiende un hilo
+  en segundo plano. Ese hilo escucha (LISTEN) el canal del proceso y el de
+  cada grupo con miembros locales, y publica los NOTIFY salientes.
+- La pertenencia a los grupos es local: un group_send es un solo NOTIFY al
+  canal del grupo, y cada proceso lo reparte entre sus propios miembros.
+- Los mensajes salientes se agrupan durante `batch_delay` segundos y se
+  empaquetan en la menor cantidad de NOTIFY posible (máx. ~8000 bytes cada
+  uno), con varios pg_notify por sentencia.
+- Contrapresión: cada grupo (o canal) admite como mucho `group_capacity`
+  mensajes pendientes de publicar, y cada canal local `capacity` mensajes sin
+  leer. Lo que exceda esos límites se descarta y se cuenta (`stats()`), igual
+  que hace channels_redis con los canales llenos en group_send.
+
+Los mensajes se serializan como JSON, así que no admiten bytes. La entrega es
+como mucho una vez: si la conexión se cae, lo publicado mientras tanto se
+pierde y el hilo vuelve a conectar y a escuchar sus canales.
+
+Configuración (settings.CHANNEL_LAYERS):
+
+    'BACKEND': 'apps.chat.layers.PostgresChannelLayer',
+    'CONFIG': {'prefix': 'chat', 'capacity': 100, 'group_capacity': 1000, 'batch_delay': 0.005},
+"""
+
+import asyncio
+import concurrent.futures
+import copy
+import hashlib
+import json
+import logging
+import os
+import random
+import select
+import socket
+import string
+import threading
+import time
+from collections import Counter, deque
+
+from channels.exceptions import ChannelFull
+from channels.layers import BaseChannelLayer
+from django.conf import settings
+
+logger = logging.getLogger('apps')
+
+# PostgreSQL rechaza payloads de 8000 bytes o más
+MAX_PAYLOAD = 7900
+
+# pg_notify por sentencia al publicar un lote
+NOTIFY_PER_STATEMENT = 50
+
+# Opciones de DATABASES que son de Django y no de libpq
+DJANGO_ONLY_OPTIONS = {'isolation_level', 'server_side_binding', 'assume_role', 'pool'}
+
+
+class MessageTooLarge(ValueError):
+    pass
+
+
+class _LocalChannel:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.messages = deque()
+        # (loop, future) del receive() que espera
+        self.waiter = None
+
+
+class PostgresChannelLayer(BaseChannelLayer):
+    extensions = ['groups', 'flush']
+
+    def __init__(
+        self,
+        database='default',
+        prefix='chat',
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        group_capacity=1000,
+        batch_delay=0.005,
+        **kwargs,
+    ):
+        super().__init__(expiry=expiry, capacity=capacity, channel_capacity=channel_capacity, **kwargs)
+        self.database = database
+        self.prefix = prefix
+        self.group_expiry = group_expiry
+        self.group_capacity = group_capacity
+        self.batch_delay = batch_delay
+        self.counters = Counter()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self.client_id = ''.join(random.choice(string.ascii_lowercase + string.digits) for _ in range(12))
+        self._channels = {}     # canal -> _LocalChannel
+        self._groups = {}       # grupo -> {canal: hora de alta}
+        self._listening = {}    # canal de PostgreSQL -> Future (resuelto al quedar escuchando)
+        self._outgoing = []     # [(canal de PostgreSQL, destino, json)]
+        self._pending = Counter()  # destino -> mensajes sin publicar
+        self._listener = None
+
+    def _ensure_started(self):
+        # Tras un fork el hilo y la conexión no existen en el hijo: se empieza de cero
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                self._reset()
+            self._pid = os.getpid()
+            self._listening[self._process_channel()] = concurrent.futures.Future()
+            self._listener = _Listener(self)
+            self._listener.start()
+
+    # --- Nombres ---
+
+    def _process_channel(self, client_id=None):
+        return f'{self.prefix}_p_{client_id or self.client_id}'
+
+    def _named_channel(self, kind, name):
+        digest = hashlib.sha1(name.encode()).hexdigest()[:24]
+        return f'{self.prefix}_{kind}_{digest}'
+
+    def _route(self, channel):
+        """Canal de PostgreSQL que recibe los mensajes de `channel`"""
+        if '!' in channel:
+            client_id = self.non_local_name(channel)[:-1].rsplit('.', 1)[-1]
+            return self._process_channel(client_id)
+        return self._named_channel('c', channel)
+
+    # --- API de channels ---
+
+    async def new_channel(self, prefix='specific'):
+        self._ensure_started()
+        suffix = ''.join(random.choice(string.ascii_letters) for _ in range(12))
+        return f'{prefix}.{self.client_id}!{suffix}'
+
+    async def send(self, channel, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_channel_name(channel)
+        self._ensure_started()
+
+        route = self._route(channel)
+        if route == self._process_channel():
+            # Canal de este mismo proceso: no hace falta pasar por PostgreSQL
+            if not self._deliver(channel, copy.deepcopy(message)):
+                raise ChannelFull(channel)
+            return
+        if not self._enqueue(route, channel, ['c', channel, message]):
+            raise ChannelFull(channel)
+
+    async def receive(self, channel):
+        self.require_valid_channel_name(channel)
+        self._ensure_started()
+        if '!' not in channel:
+            await self._listen(self._named_channel('c', channel))
+
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                local = self._channels.setdefault(channel, _LocalChannel(self.get_capacity(channel)))
+                now = time.time()
+                while local.messages and local.messages[0][0] < now:
+                    local.messages.popleft()
+                    self.counters['expired'] += 1
+                if local.messages:
+                    return local.messages.popleft()[1]
+                future = loop.create_future()
+                local.waiter = (loop, future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                with self._lock:
+                    if local.waiter is not None and local.waiter[1] is future:
+                        local.waiter = None
+                    if not local.messages and self._channels.get(channel) is local:
+                        del self._channels[channel]
+                raise
+
+    async def group_add(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        self._ensure_started()
+        with self._lock:
+            self._groups.setdefault(group, {})[channel] = time.time()
+        # Antes de volver el proceso ya debe estar escuchando al grupo
+        await self._listen(self._named_channel('g', group))
+
+    async def group_discard(self, group, channel):
+        self.require_valid_group_name(group)
+        self.require_valid_channel_name(channel)
+        self._ensure_started()
+        with self._lock:
+            members = self._groups.get(group)
+            if members is None:
+                return
+            members.pop(channel, None)
+            if members:
+                return
+            del self._groups[group]
+            self._listening.pop(self._named_channel('g', group), None)
+        self._listener.wakeup()
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), 'message is not a dict'
+        self.require_valid_group_name(group)
+        self._ensure_started()
+        self._enqueue(self._named_channel('g', group), group, ['g', group, message])
+
+    async def flush(self):
+        with self._lock:
+            self._channels = {}
+            self._groups = {}
+            self._outgoing = []
+            self._pending = Counter()
+            process_channel = self._process_channel()
+            self._listening = {
+                name: future for name, future in self._listening.items() if name == process_channel
+            }
+        if self._listener is not None:
+            self._listener.wakeup()
+
+    async def close(self):
+        if self._listener is not None and self._pid == os.getpid():
+            await asyncio.get_running_loop().run_in_executor(None, self._listener.stop)
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.counters[key] += amount
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['outgoing'] = len(self._outgoing)
+            stats['groups'] = len(self._groups)
+            stats['channels'] = len(self._channels)
+        return stats
+
+    # --- Interno ---
+
+    async def _listen(self, pg_channel):
+        with self._lock:
+            future = self._listening.get(pg_channel)
+            if future is None:
+                future = self._listening[pg_channel] = concurrent.futures.Future()
+        if not future.done():
+            self._listener.wakeup()
+            await asyncio.wrap_future(future)
+
+    def _enqueue(self, pg_channel, target, item):
+        data = json.dumps(item, ensure_ascii=False, separators=(',', ':'))
+        if len(data.encode()) + 2 > MAX_PAYLOAD:
+            raise MessageTooLarge(f'El mensaje para "{target}" supera el límite de NOTIFY ({MAX_PAYLOAD} bytes)')
+        with self._lock:
+            if self._pending[target] >= self.group_capacity:
+                self.counters['dropped_outgoing'] += 1
+                return False
+            self._pending[target] += 1
+            self._outgoing.append((pg_channel, target, data))
+            first = len(self._outgoing) == 1
+        if first:
+            self._listener.wakeup()
+        return True
+
+    def _take_outgoing(self):
+        with self._lock:
+            outgoing, self._outgoing = self._outgoing, []
+            self._pending = Counter()
+        return outgoing
+
+    def _deliver(self, channel, message):
+        """Deja el mensaje en el canal local; False si el canal está lleno"""
+        with self._lock:
+            local = self._channels.get(channel)
+            if local is None:
+                local = self._channels[channel] = _LocalChannel(self.get_capacity(channel))
+            if len(local.messages) >= local.capacity:
+                self.counters['dropped_full'] += 1
+                return False
+            local.messages.append((time.time() + self.expiry, message))
+            self.counters['delivered'] += 1
+            waiter, local.waiter = local.waiter, None
+        if waiter is not None:
+            loop, future = waiter
+            loop.call_soon_threadsafe(_wake, future)
+        return True
+
+    def _dispatch(self, payload):
+        """Reparte un NOTIFY recibido entre los canales locales"""
+        try:
+            items = json.loads(payload)
+        except ValueError:
+            self._count('invalid')
+            return
+        expired_before = time.time() - self.group_expiry
+        for kind, name, message in items:
+            if kind == 'c':
+                self._deliver(name, message)
+                continue
+            with self._lock:
+                members = self._groups.get(name, {})
+                for channel, joined in list(members.items()):
+                    if joined < expired_before:
+                        del members[channel]
+                channels = list(members)
+            # Cada miembro recibe su propia copia (un consumer puede modificarla);
+            # el último se queda con el mensaje decodificado
+            for index, channel in enumerate(channels):
+                self._deliver(channel, message if index == len(channels) - 1 else copy.deepcopy(message))
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Listener:
+    """Hilo con la conexión LISTEN/NOTIFY del proceso"""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.connection = None
+        self.active = set()
+        self._stopping = threading.Event()
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._thread = threading.Thread(target=self._run, name='chat-layer-listener', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def wakeup(self):
+        try:
+            self._wake_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def stop(self):
+        self._stopping.set()
+        self.wakeup()
+        self._thread.join(timeout=5.0)
+
+    def _connect(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        db = settings.DATABASES[self.layer.database]
+        options = {key: value for key, value in db.get('OPTIONS', {}).items() if key not in DJANGO_ONLY_OPTIONS}
+        connection = psycopg2.connect(
+            dbname=db['NAME'],
+            user=db.get('USER') or None,
+            password=db.get('PASSWORD') or None,
+            host=db.get('HOST') or None,
+            port=db.get('PORT') or None,
+            application_name='chat-channel-layer',
+            **options,
+        )
+        connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        self.connection = connection
+        self.active = set()
+
+    def _disconnect(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception:
+                pass
+        self.connection = None
+        self.active = set()
+
+    def _run(self):
+        backoff = 0.5
+        while not self._stopping.is_set():
+            try:
+                if self.connection is None:
+                    self._connect()
+                self._sync_listening()
+                self._wait()
+                self._read_notifies()
+                self._publish_due()
+                backoff = 0.5
+            except Exception as e:
+                self.layer._count('reconnects')
+                logger.error(f'Channel layer: conexión LISTEN/NOTIFY perdida ({e}); reconectando')
+                self._disconnect()
+                self._stopping.wait(backoff)
+                backoff = min(backoff * 2, 10.0)
+
+        # Lo que quede por publicar se envía antes de cerrar
+        try:
+            if self.connection is not None:
+                self._publish(self.layer._take_outgoing())
+        except Exception:
+            pass
+        self._disconnect()
+
+    def _sync_listening(self):
+        with self.layer._lock:
+            wanted = dict(self.layer._listening)
+        with self.connection.cursor() as cursor:
+            for name in wanted.keys() - self.active:
+                cursor.execute(f'LISTEN "{name}"')
+                self.active.add(name)
+            for name in self.active - wanted.keys():
+                cursor.execute(f'UNLISTEN "{name}"')
+                self.active.discard(name)
+        for future in wanted.values():
+            if not future.done():
+                future.set_result(None)
+
+    def _wait(self):
+        timeout = 1.0
+        with self.layer._lock:
+            if self.layer._outgoing:
+                timeout = self.layer.batch_delay
+        ready, _, _ = select.select([self.connection, self._wake_r], [], [], timeout)
+        if self._wake_r in ready:
+            try:
+                while self._wake_r.recv(4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def _read_notifies(self):
+        self.connection.poll()
+        while self.connection.notifies:
+            notify = self.connection.notifies.pop(0)
+            self.layer._count('notifies_received')
+            self.layer._dispatch(notify.payload)
+
+    def _publish_due(self):
+        with self.layer._lock:
+            if not self.layer._outgoing:
+                return
+        # Deja pasar batch_delay desde que llegó el primero para juntar más mensajes
+        if not self._stopping.wait(self.layer.batch_delay):
+            self._publish(self.layer._take_outgoing())
+
+    def _publish(self, outgoing):
+        if not outgoing:
+            return
+        payloads = []
+        by_channel = {}
+        for pg_channel, _target, data in outgoing:
+            by_channel.setdefault(pg_channel, []).append(data)
+        for pg_channel, items in by_channel.items():
+            chunk, size = [], 2
+            for data in items:
+                length = len(data.encode()) + 1
+                if chunk and size + length > MAX_PAYLOAD:
+                    payloads.append((pg_channel, '[' + ','.join(chunk) + ']'))
+                    chunk, size = [], 2
+                chunk.append(data)
+                size += length
+            payloads.append((pg_channel, '[' + ','.join(chunk) + ']'))
+
+        with self.connection.cursor() as cursor:
+            for start in range(0, len(payloads), NOTIFY_PER_STATEMENT):
+                part = payloads[start:start + NOTIFY_PER_STATEMENT]
+                cursor.execute(
+                    'SELECT ' + ', '.join(['pg_notify(%s, %s)'] * len(part)),
+                    [value for payload in part for value in payload]
+                )
+        self.layer._count('published', len(outgoing))
+        self.layer._count('notifies_sent', len(payloads))
@@ -0,0 +1,130 @@
+# apps/chat/management/commands/benchmark_chat_connect.py
+
+"""
+Mide la latencia de conexión al chat (tenant, autorización de la sala y alta
+en el grupo) con miles de sockets abiertos a la vez, en frío (caché vacía) y
+en caliente. Una parte de las conexiones usa un usuario que no participa en
+la cita, para comprobar que se rechazan.
+"""
+
+import asyncio
+import random
+import statistics
+import time
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management.base import BaseCommand
+from django_tenants.utils import get_tenant_domain_model, schema_context
+
+from apps.appointments.models import Appointment
+from apps.chat import rooms
+from apps.chat.cache import get_auth_cache
+from apps.chat.middleware import TenantWebSocketMiddleware
+from apps.chat.routing import websocket_urlpatterns
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de conexión de ChatConsumer con muchos sockets concurrentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            required=True,
+            help='Schema del tenant (ej: mindcare, bienestar)'
+        )
+        parser.add_argument('--sockets', type=int, default=2000, help='Sockets abiertos a la vez por ronda')
+        parser.add_argument('--concurrency', type=int, default=200, help='Conexiones en curso a la vez')
+        parser.add_argument('--appointments', type=int, default=200, help='Citas distintas a usar')
+        parser.add_argument('--denied-ratio', type=float, default=0.1, help='Fracción de conexiones no autorizadas')
+        parser.add_argument('--target-ms', type=float, default=50.0, help='Objetivo de p95 de conexión en caliente (ms)')
+
+    def handle(self, *args, **options):
+        schema_name = options['tenant']
+        with schema_context(schema_name):
+            appointments = list(
+                Appointment.objects.select_related('patient', 'psychologist').order_by('-id')[:options['appointments']]
+            )
+        domain = get_tenant_domain_model().objects.filter(tenant__schema_name=schema_name).order_by('-is_primary').first()
+
+        if len(appointments) < 2 or domain is None:
+            self.stdout.write(self.style.ERROR('❌ Se necesitan al menos 2 citas y un dominio para el tenant'))
+            return
+
+        plan = []
+        for number in range(options['sockets']):
+            appointment = appointments[number % len(appointments)]
+            # Un paciente de otra cita: debe rechazarse
+            outsider = next((
+                a.patient for a in appointments
+                if a.patient_id not in (appointment.patient_id, appointment.psychologist_id)
+            ), None)
+            if outsider is not None and random.random() < options['denied_ratio']:
+                plan.append((appointment.pk, outsider, False))
+            else:
+                plan.append((appointment.pk, random.choice([appointment.patient, appointment.psychologist]), True))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"🔌 Conexiones al chat en {schema_name}: {options['sockets']} sockets, "
+            f"{len(appointments)} citas, concurrencia {options['concurrency']}"
+        ))
+        self.stdout.write('=' * 60)
+
+        get_auth_cache().clear()
+        warm_p95 = None
+        for label in ('frío', 'caliente'):
+            rooms.stats.clear()
+            latencies, wrong, elapsed = asyncio.run(self.run_round(plan, domain.domain, options['concurrency']))
+            latencies.sort()
+            warm_p95 = percentile(latencies, 0.95)
+            self.stdout.write(
+                f'⏱️  En {label:<8}: p50 {statistics.median(latencies):.1f} ms, p95 {warm_p95:.1f} ms, '
+                f'p99 {percentile(latencies, 0.99):.1f} ms, {len(plan) / elapsed:.0f} conexiones/s'
+            )
+            self.stdout.write(
+                f"   aceptadas {rooms.stats['accepted']}, rechazadas {rooms.stats['denied']}, "
+                f"caché {rooms.stats['cache_hits']} aciertos / {rooms.stats['cache_misses']} fallos"
+            )
+            if wrong:
+                self.stdout.write(self.style.ERROR(f'   ❌ {wrong} conexiones con autorización incorrecta'))
+
+        if warm_p95 <= options['target_ms']:
+            self.stdout.write(self.style.SUCCESS(f"\n✅ p95 en caliente dentro del objetivo ({options['target_ms']:.0f} ms)"))
+        else:
+            self.stdout.write(self.style.ERROR(f"\n❌ p95 en caliente supera el objetivo ({options['target_ms']:.0f} ms)"))
+
+    async def run_round(self, plan, hostname, concurrency):
+        application = TenantWebSocketMiddleware(URLRouter(websocket_urlpatterns))
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+        open_sockets = []
+        wrong = 0
+
+        async def connect(appointment_id, user, allowed):
+            nonlocal wrong
+            communicator = WebsocketCommunicator(
+                application, f'/ws/chat/{appointment_id}/', headers=[(b'host', hostname.encode())]
+            )
+            # Usuario ya autenticado: se mide la parte de la sala, no la del token
+            communicator.scope['user'] = user
+            async with semaphore:
+                started = time.perf_counter()
+                connected, _ = await communicator.connect(timeout=30)
+                latencies.append((time.perf_counter() - started) * 1000)
+            if connected != allowed:
+                wrong += 1
+            if connected:
+                open_sockets.append(communicator)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect(*entry) for entry in plan))
+        elapsed = time.perf_counter() - started
+
+        # Todos los sockets siguen abiertos hasta el final de la ronda
+        await asyncio.gather(*(communicator.disconnect() for communicator in open_sockets))
+        return latencies, wrong, elapsed
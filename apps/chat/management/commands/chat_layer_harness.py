@@ -0,0 +1,180 @@
+# apps/chat/management/commands/chat_layer_harness.py
+
+"""
+Prueba local de la capa de canales sobre PostgreSQL con varios procesos.
+
+Levanta N procesos, cada uno con su propia instancia de PostgresChannelLayer
+y varios "sockets" (canales) repartidos en salas compartidas entre procesos.
+Todos los procesos envían mensajes a las salas con group_send y cada socket
+cuenta lo que recibe. Solo necesita la base de datos, sin broker externo.
+"""
+
+import asyncio
+import multiprocessing
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from apps.chat.layers import PostgresChannelLayer
+
+
+def layer_config():
+    layer = settings.CHANNEL_LAYERS.get('default', {})
+    if layer.get('BACKEND') == 'apps.chat.layers.PostgresChannelLayer':
+        return dict(layer.get('CONFIG', {}))
+    return {}
+
+
+def expected_per_room(room, rooms, processes, messages):
+    return processes * len(range(room, messages, rooms))
+
+
+async def run_worker(index, options, barrier):
+    config = layer_config()
+    config['prefix'] = f"harness{int(options['started'])}"
+    layer = PostgresChannelLayer(**config)
+    rooms, sockets = options['rooms'], options['sockets']
+
+    channels = []
+    for number in range(sockets):
+        channel = await layer.new_channel()
+        await layer.group_add(f'harness.room{number % rooms}', channel)
+        channels.append((channel, number % rooms))
+
+    latencies = []
+    received = 0
+
+    async def socket_reader(channel, room):
+        nonlocal received
+        expected = expected_per_room(room, rooms, options['processes'], options['messages'])
+        for _ in range(expected):
+            message = await layer.receive(channel)
+            latencies.append(time.time() - message['sent'])
+            received += 1
+
+    readers = [asyncio.create_task(socket_reader(channel, room)) for channel, room in channels]
+
+    # Todos los procesos escuchan sus salas antes de que nadie envíe
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+    started = time.perf_counter()
+    for number in range(options['messages']):
+        await layer.group_send(f'harness.room{number % rooms}', {
+            'type': 'chat.message', 'sent': time.time(), 'process': index, 'number': number,
+        })
+        if options['rate']:
+            await asyncio.sleep(1 / options['rate'])
+    send_time = time.perf_counter() - started
+
+    done, pending = await asyncio.wait(readers, timeout=options['timeout'])
+    for task in pending:
+        task.cancel()
+    elapsed = time.perf_counter() - started
+
+    # Deja publicar lo que quede antes de cerrar
+    await asyncio.sleep(layer.batch_delay * 2)
+    stats = layer.stats()
+    await layer.close()
+
+    expected = sum(
+        expected_per_room(room, rooms, options['processes'], options['messages']) for _, room in channels
+    )
+    return {
+        'received': received,
+        'expected': expected,
+        'latencies': latencies,
+        'send_time': send_time,
+        'elapsed': elapsed,
+        'stats': stats,
+    }
+
+
+def worker_main(index, options, barrier, results):
+    try:
+        results.put(asyncio.run(run_worker(index, options, barrier)))
+    except Exception as e:
+        barrier.abort()
+        results.put({'error': f'{type(e).__name__}: {e}'})
+
+
+class Command(BaseCommand):
+    help = 'Prueba la capa de canales de PostgreSQL con varios procesos en esta máquina'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Procesos (workers ASGI simulados)')
+        parser.add_argument('--sockets', type=int, default=50, help='Sockets por proceso')
+        parser.add_argument('--rooms', type=int, default=10, help='Salas compartidas entre procesos')
+        parser.add_argument('--messages', type=int, default=200, help='Mensajes enviados por cada proceso')
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=0,
+            help='Mensajes por segundo por proceso (0: sin límite, para medir la contrapresión)'
+        )
+        parser.add_argument('--timeout', type=float, default=30.0, help='Segundos máximos de espera de entrega')
+
+    def handle(self, *args, **options):
+        options['started'] = time.time()
+        processes = options['processes']
+        rooms = min(options['rooms'], processes * options['sockets'])
+        options['rooms'] = rooms
+
+        self.stdout.write(self.style.SUCCESS(
+            f"📡 Capa de canales PostgreSQL: {processes} procesos × {options['sockets']} sockets, "
+            f"{rooms} salas, {options['messages']} mensajes por proceso"
+        ))
+        self.stdout.write('=' * 60)
+
+        # Cada proceso hijo abre sus propias conexiones
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(processes)
+        results = context.Queue()
+        workers = [
+            context.Process(target=worker_main, args=(index, options, barrier, results))
+            for index in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        reports = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        errors = [report['error'] for report in reports if 'error' in report]
+        if errors:
+            for error in errors:
+                self.stdout.write(self.style.ERROR(f'❌ {error}'))
+            return
+
+        received = sum(report['received'] for report in reports)
+        expected = sum(report['expected'] for report in reports)
+        latencies = sorted(latency * 1000 for report in reports for latency in report['latencies'])
+        published = sum(report['stats'].get('published', 0) for report in reports)
+        notifies = sum(report['stats'].get('notifies_sent', 0) for report in reports)
+        dropped_outgoing = sum(report['stats'].get('dropped_outgoing', 0) for report in reports)
+        dropped_full = sum(report['stats'].get('dropped_full', 0) for report in reports)
+        elapsed = max(report['elapsed'] for report in reports)
+
+        self.stdout.write(f'📬 Entregados: {received}/{expected} ({received / expected:.1%})')
+        if latencies:
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            self.stdout.write(
+                f'⏱️  Latencia: p50 {statistics.median(latencies):.1f} ms, '
+                f'p95 {p95:.1f} ms, p99 {p99:.1f} ms, máx {latencies[-1]:.1f} ms'
+            )
+        self.stdout.write(f'🚀 Rendimiento: {received / elapsed:.0f} entregas/s')
+        if notifies:
+            self.stdout.write(f'📦 {published} mensajes en {notifies} NOTIFY ({published / notifies:.1f} por NOTIFY)')
+        if dropped_outgoing or dropped_full:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Descartados: {dropped_outgoing} por sala saturada, {dropped_full} por socket lleno'
+            ))
+
+        if received == expected:
+            self.stdout.write(self.style.SUCCESS('\n✅ Todos los mensajes llegaron a todos los procesos'))
+        else:
+            self.stdout.write(self.style.ERROR('\n❌ Faltaron mensajes'))
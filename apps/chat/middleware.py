@@ -1,24 +1,74 @@
 # apps/chat/middleware.py
 from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
-from django.contrib.auth import get_user_model
+from django_tenants.utils import get_public_schema_name, get_tenant_domain_model, remove_www, schema_context
 from rest_framework.authtoken.models import Token
 from urllib.parse import parse_qs
-User = get_user_model()
-
-@database_sync_to_async  # <--- ¡UNA SOLA VEZ!
-def get_user(token_key):
-    try:
-        token = Token.objects.get(key=token_key)
-        # --- 3. CAMBIO ---
-        # En lugar de devolver token.user (que puede ser perezoso),
-        # buscamos al usuario completo por su ID para asegurar que funcione.
-        user = User.objects.get(id=token.user_id)
-        return user
-        # --------------------
-    except (Token.DoesNotExist, User.DoesNotExist):
+
+from .cache import acache_tenant, aget_cached_tenant, aget_cached_user, cache_user
+
+
+async def get_user(token_key, schema_name):
+    # API asíncrona de la caché: un backend de red (Redis) no bloquea el bucle.
+    # Solo los fallos consultan la base de datos en el pool de hilos
+    user = await aget_cached_user(schema_name, token_key)
+    if user is None:
+        user = await load_user(token_key, schema_name)
+    return user
+
+
+@database_sync_to_async
+def load_user(token_key, schema_name):
+    # Los tokens y usuarios viven en el schema de la clínica
+    with schema_context(schema_name):
+        try:
+            # Token y usuario en una sola consulta
+            token = Token.objects.select_related('user').get(key=token_key)
+        except Token.DoesNotExist:
+            return AnonymousUser()
+
+    user = token.user
+    if not user.is_active:
         return AnonymousUser()
-        
+    # Ya se está en un hilo del pool: la versión síncrona basta
+    cache_user(schema_name, token_key, user)
+    return user
+
+
+async def get_tenant(hostname):
+    tenant = await aget_cached_tenant(hostname)
+    if tenant is None:
+        tenant = await load_tenant(hostname)
+        if tenant is not None:
+            await acache_tenant(hostname, tenant)
+    return tenant
+
+
+@database_sync_to_async
+def load_tenant(hostname):
+    with schema_context(get_public_schema_name()):
+        domain = get_tenant_domain_model().objects.select_related('tenant').filter(domain=hostname).first()
+    return domain.tenant if domain else None
+
+
+class TenantWebSocketMiddleware:
+    """
+    Equivalente de TenantMainMiddleware para WebSockets: resuelve la clínica
+    por el Host y deja scope['tenant'] y scope['schema_name'] para que el
+    middleware de tokens y los consumers consulten el schema correcto.
+    """
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        headers = dict(scope.get('headers', []))
+        hostname = remove_www(headers.get(b'host', b'').decode('latin1').split(':')[0])
+        tenant = await get_tenant(hostname)
+
+        scope['tenant'] = tenant
+        scope['schema_name'] = tenant.schema_name if tenant else get_public_schema_name()
+        return await self.inner(scope, receive, send)
+
 
 class TokenAuthMiddleware:
     def __init__(self, inner):
@@ -34,8 +84,8 @@ class TokenAuthMiddleware:
         token_key = query_params.get("token", [None])[0]
 
         if token_key:
-            scope['user'] = await get_user(token_key)
+            scope['user'] = await get_user(token_key, scope.get('schema_name', get_public_schema_name()))
         else:
             scope['user'] = AnonymousUser()
         
-        return await self.inner(scope, receive, send)
\ No newline at end of file
+        return await self.inner(scope, receive, send)
@@ -1,15 +1,22 @@
 # apps/chat/models.py
 from django.db import models
 from django.conf import settings  # ← Importar settings
+from django.utils import timezone
 
 class ChatMessage(models.Model):
     appointment_id = models.IntegerField()
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # ← Cambiar aquí
     message = models.TextField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            # Historial de una cita (apps/chat/pagination.py)
+            models.Index(fields=['appointment_id', 'timestamp'], name='chat_appointment_time_idx'),
+            # Mensajes guardados después de un id (?since=, al reconectar)
+            models.Index(fields=['appointment_id', 'id'], name='chat_appointment_id_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.message[:50]}"
\ No newline at end of file
@@ -0,0 +1,97 @@
+# apps/chat/pagination.py
+
+"""
+Paginación del historial del chat de una cita.
+
+- Sin parámetros: los mensajes más recientes (en orden cronológico) y un
+  cursor `next` hacia los anteriores, por la clave (timestamp, id) con el
+  índice (appointment_id, timestamp).
+- `?since=<id>`: los mensajes guardados después de ese id, del más antiguo al
+  más nuevo, para ponerse al día al reconectar. Se usa el id y no la hora
+  porque los mensajes se guardan en diferido (apps.chat.persistence): uno
+  entregado antes puede guardarse después.
+
+El id tampoco es exactamente el orden en que los mensajes se hacen visibles:
+se toma de la secuencia en el INSERT, y con varios procesos uno puede tomar el
+100 y confirmar después de que otro confirme el 101. Por eso `since` devuelve
+además los mensajes con id menor enviados hasta SINCE_LOOKBACK antes del
+mensaje `since`; el cliente descarta por id los que ya tenía. Un mensaje que
+pase más tiempo en el buffer (base de datos caída) puede no llegar por esta vía.
+"""
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.utils.urls import replace_query_param
+
+from apps.appointments.pagination import AppointmentCursorPagination
+
+SINCE_LOOKBACK = timedelta(seconds=getattr(settings, 'CHAT_SINCE_LOOKBACK_SECONDS', 10))
+
+
+class ChatMessageCursorPagination(AppointmentCursorPagination):
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    max_page_size = 200
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.since = self.decode_since(request)
+        if self.since is None:
+            page = super().paginate_queryset(queryset, request, view)
+            # La página se recorre hacia atrás pero se muestra en orden cronológico
+            return page[::-1]
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        results = list(queryset.filter(id__gt=self.since).order_by('id')[:page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        # La página siguiente sigue desde self.page; los reenviados van aparte
+        return self.lookback(queryset, page_size) + self.page
+
+    def lookback(self, queryset, limit):
+        """Mensajes con id menor que `since` que pudieron confirmarse después de él"""
+        since_timestamp = queryset.filter(id=self.since).values_list('timestamp', flat=True).first()
+        if since_timestamp is None:
+            return []
+        return list(queryset.filter(
+            id__lt=self.since,
+            timestamp__gte=since_timestamp - SINCE_LOOKBACK
+        ).order_by('id')[:limit])
+
+    def decode_since(self, request):
+        value = request.query_params.get(self.since_query_param)
+        if value is None:
+            return None
+        if not value.isdigit():
+            raise ValidationError({self.since_query_param: 'Debe ser el id de un mensaje.'})
+        return int(value)
+
+    def after(self, timestamp, pk):
+        return Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk)
+
+    def encode_cursor(self, message):
+        key = f'{message.timestamp.isoformat()},{message.pk}'
+        return urlsafe_b64encode(key.encode('ascii')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_timestamp, raw_pk = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').split(',')
+            return datetime.fromisoformat(raw_timestamp), int(raw_pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if self.since is None:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return replace_query_param(self.base_url, self.since_query_param, self.page[-1].pk)
@@ -0,0 +1,184 @@
+# apps/chat/persistence.py
+
+"""
+Guardado diferido (write-behind) de los mensajes del chat.
+
+El consumer entrega cada mensaje a la sala en cuanto lo recibe y solo lo
+anota aquí; el buffer lo guarda después con un bulk_create por schema:
+
+- en cuanto hay FLUSH_BATCH_SIZE mensajes pendientes, o
+- FLUSH_DELAY segundos después del primer mensaje pendiente, o
+- cuando un socket se desconecta, o al terminar el proceso (atexit).
+
+Hay un buffer por proceso (`buffer`). Si la base de datos falla, los mensajes
+vuelven a la cola hasta MAX_PENDING; lo que exceda ese límite se descarta y
+se cuenta en `buffer.counters['dropped']`. Si el lote viola una restricción
+(p. ej. la cita se borró entretanto), se reintenta fila a fila y solo se
+descartan las filas inválidas (`buffer.counters['rejected']`).
+"""
+
+import asyncio
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django_tenants.utils import schema_context
+
+from .models import ChatMessage
+
+logger = logging.getLogger('apps')
+
+FLUSH_BATCH_SIZE = getattr(settings, 'CHAT_FLUSH_BATCH_SIZE', 50)
+FLUSH_DELAY = getattr(settings, 'CHAT_FLUSH_DELAY_MS', 200) / 1000
+MAX_PENDING = getattr(settings, 'CHAT_MAX_PENDING_MESSAGES', 10000)
+
+
+def _insert(schema_name, messages):
+    from apps.backups.incremental import is_tracked, log_changes
+
+    with schema_context(schema_name), transaction.atomic():
+        created = ChatMessage.objects.bulk_create(messages)
+        # bulk_create no envía post_save: se anota a mano para los backups incrementales
+        if is_tracked(ChatMessage):
+            log_changes(ChatMessage, [message.pk for message in created], 'save')
+
+
+def write_messages(pending):
+    """
+    Guarda [(schema, ChatMessage)] con un INSERT por schema. Devuelve
+    (fallidos, rechazados): los fallidos se pueden reintentar; los rechazados
+    violan una restricción y no se guardarán nunca.
+    """
+    by_schema = {}
+    for schema_name, message in pending:
+        by_schema.setdefault(schema_name, []).append(message)
+
+    failed = []
+    rejected = 0
+    for schema_name, messages in by_schema.items():
+        try:
+            _insert(schema_name, messages)
+        except IntegrityError:
+            # Una fila inválida no debe arrastrar al resto del lote
+            for message in messages:
+                try:
+                    _insert(schema_name, [message])
+                except IntegrityError as e:
+                    logger.warning(
+                        f'Chat: mensaje de la cita {message.appointment_id} descartado en "{schema_name}": {e}'
+                    )
+                    rejected += 1
+                except Exception as e:
+                    logger.error(f'Chat: no se pudo guardar un mensaje en "{schema_name}": {e}')
+                    failed.append((schema_name, message))
+        except Exception as e:
+            logger.error(f'Chat: no se pudieron guardar {len(messages)} mensajes en "{schema_name}": {e}')
+            failed.extend((schema_name, message) for message in messages)
+    return failed, rejected
+
+
+class MessageBuffer:
+    def __init__(self, batch_size=FLUSH_BATCH_SIZE, delay=FLUSH_DELAY, max_pending=MAX_PENDING):
+        self.batch_size = batch_size
+        self.delay = delay
+        self.max_pending = max_pending
+        self.counters = Counter()
+        self._pending = []
+        # El lock de threading protege _pending también frente al flush de atexit
+        self._pending_lock = threading.Lock()
+        self._flush_lock = None
+        self._timer = None
+        self._timer_loop = None
+
+    def add(self, schema_name, appointment_id, sender_id, message, timestamp):
+        """Anota el mensaje y programa su guardado; nunca espera a la base de datos"""
+        with self._pending_lock:
+            if len(self._pending) >= self.max_pending:
+                self.counters['dropped'] += 1
+                return
+            self._pending.append((schema_name, ChatMessage(
+                appointment_id=appointment_id,
+                sender_id=sender_id,
+                message=message,
+                timestamp=timestamp,
+            )))
+            self.counters['queued'] += 1
+            size = len(self._pending)
+
+        loop = asyncio.get_running_loop()
+        if size >= self.batch_size:
+            self._cancel_timer()
+            loop.create_task(self.flush())
+        elif self._timer is None or self._timer_loop is not loop:
+            self._schedule(loop, self.delay)
+
+    def _schedule(self, loop, delay):
+        self._timer = loop.call_later(delay, self._on_timer, loop)
+        self._timer_loop = loop
+
+    def _on_timer(self, loop):
+        self._timer = None
+        loop.create_task(self.flush())
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _take(self):
+        with self._pending_lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    def _requeue(self, failed):
+        with self._pending_lock:
+            room = max(self.max_pending - len(self._pending), 0)
+            self._pending[:0] = failed[:room]
+            self.counters['dropped'] += len(failed) - min(len(failed), room)
+            self.counters['failed'] += len(failed)
+
+    async def flush(self):
+        """Guarda todo lo pendiente; los flush concurrentes se encadenan"""
+        # Un asyncio.Lock solo sirve en su bucle (async_to_sync o tests crean otros)
+        loop = asyncio.get_running_loop()
+        if self._flush_lock is None or self._flush_lock[0] is not loop:
+            self._flush_lock = (loop, asyncio.Lock())
+        async with self._flush_lock[1]:
+            pending = self._take()
+            if not pending:
+                return
+            failed, rejected = await database_sync_to_async(write_messages)(pending)
+            self.counters['written'] += len(pending) - len(failed) - rejected
+            self.counters['rejected'] += rejected
+            if failed:
+                self._requeue(failed)
+                # Se reintenta más tarde sin bloquear la entrega
+                if self._timer is None:
+                    self._schedule(loop, self.delay * 10)
+
+    def flush_sync(self):
+        """Guardado final al cerrar el proceso, ya sin bucle de eventos"""
+        pending = self._take()
+        if not pending:
+            return
+        try:
+            failed, rejected = write_messages(pending)
+        finally:
+            close_old_connections()
+        self.counters['written'] += len(pending) - len(failed) - rejected
+        self.counters['rejected'] += rejected
+        if failed:
+            self.counters['dropped'] += len(failed)
+
+    def stats(self):
+        stats = dict(self.counters)
+        stats['pending'] = len(self._pending)
+        return stats
+
+
+buffer = MessageBuffer()
+atexit.register(buffer.flush_sync)
@@ -0,0 +1,63 @@
+# apps/chat/rooms.py
+
+"""
+Autorización de las salas del chat: solo el paciente y el psicólogo de la
+cita pueden unirse a ws/chat/<appointment_id>/.
+
+Los participantes de cada cita se cachean (apps.chat.cache, una entrada por
+cita que sirve a los dos usuarios) y la señal de Appointment los invalida. El
+consumer comprueba una vez al conectar y el resultado vale durante toda la
+vida del socket.
+
+Una cita inexistente se cachea solo ROOM_MISSING_TIMEOUT segundos: la señal
+que invalida al crear la cita solo llega a la caché de ese proceso (con la
+caché en memoria y varios workers), y un "no existe" no debe durar todo el
+TTL de CACHES['chat_auth'] en los demás.
+"""
+
+from collections import Counter
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django_tenants.utils import schema_context
+
+from apps.appointments.models import Appointment
+
+from .cache import acache_participants, aget_cached_participants
+
+# Segundos que se recuerda que una cita no existe
+ROOM_MISSING_TIMEOUT = getattr(settings, 'CHAT_ROOM_MISSING_TIMEOUT', 5)
+
+# Contadores del proceso: conexiones aceptadas, rechazadas y uso de la caché
+stats = Counter()
+
+
+@database_sync_to_async
+def load_participants(schema_name, appointment_id):
+    with schema_context(schema_name):
+        row = Appointment.objects.filter(pk=appointment_id).values_list('patient_id', 'psychologist_id').first()
+    # Tupla vacía si la cita no existe (se cachea por poco tiempo)
+    return tuple(row) if row else ()
+
+
+async def can_join_room(schema_name, user_id, appointment_id):
+    participants = await aget_cached_participants(schema_name, appointment_id)
+    if participants is None:
+        stats['cache_misses'] += 1
+        participants = await load_participants(schema_name, appointment_id)
+        await acache_participants(
+            schema_name, appointment_id, participants,
+            timeout=DEFAULT_TIMEOUT if participants else ROOM_MISSING_TIMEOUT
+        )
+    else:
+        stats['cache_hits'] += 1
+    return user_id in participants
+
+
+def record_connect(accepted, reason=None):
+    if accepted:
+        stats['accepted'] += 1
+    else:
+        stats['denied'] += 1
+        stats[f'denied_{reason}'] += 1
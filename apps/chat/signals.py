@@ -0,0 +1,37 @@
+# apps/chat/signals.py
+
+"""
+Invalida la caché de autenticación del chat (apps.chat.cache) cuando un token
+deja de valer: logout, cambio de contraseña, borrado del token o cambios en el
+usuario (contraseña, is_active), y los participantes cacheados de una sala
+cuando cambia o se elimina su cita.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from apps.appointments.models import Appointment
+
+from .cache import invalidate_participants, invalidate_token, invalidate_user
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    invalidate_token(connection.schema_name, instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user(connection.schema_name, instance.pk)
+
+
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+def appointment_changed(sender, instance, **kwargs):
+    invalidate_participants(connection.schema_name, instance.pk)
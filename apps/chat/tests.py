@@ -1,3 +1,359 @@
-from django.test import TestCase
+# apps/chat/tests.py
 
-# Create your tests here.
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.test import SimpleTestCase
+from django_tenants.test.cases import TenantTestCase
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .layers import MAX_PAYLOAD, NOTIFY_PER_STATEMENT, PostgresChannelLayer, _Listener
+from .models import ChatMessage
+from .pagination import SINCE_LOOKBACK, ChatMessageCursorPagination
+from .persistence import MessageBuffer, write_messages
+
+
+class FakeListener:
+    """Reemplaza al hilo LISTEN/NOTIFY: la capa solo lo despierta"""
+    def wakeup(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+
+class FakeConnection:
+    def __init__(self):
+        self.statements = []
+
+    def cursor(self):
+        return FakeCursor(self.statements)
+
+
+def make_layer(**kwargs):
+    # Sin _ensure_started: no se abre ninguna conexión a PostgreSQL
+    layer = PostgresChannelLayer(**kwargs)
+    layer._listener = FakeListener()
+    return layer
+
+
+def notify_payload(*items):
+    return json.dumps([list(item) for item in items])
+
+
+class RouteTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = make_layer(prefix='chat')
+
+    def test_process_specific_channel_goes_to_its_process(self):
+        self.assertEqual(self.layer._route('specific.abc123!xyz'), 'chat_p_abc123')
+
+    def test_named_channel_is_hashed_and_stable(self):
+        route = self.layer._route('worker')
+        self.assertTrue(route.startswith('chat_c_'))
+        self.assertEqual(route, self.layer._route('worker'))
+        self.assertNotEqual(route, self.layer._route('other'))
+
+    def test_group_and_channel_with_same_name_do_not_collide(self):
+        self.assertNotEqual(self.layer._named_channel('g', 'chat_1'), self.layer._named_channel('c', 'chat_1'))
+
+
+class DispatchTests(SimpleTestCase):
+    def setUp(self):
+        self.layer = make_layer(capacity=2, group_expiry=60)
+
+    def received(self, channel):
+        local = self.layer._channels.get(channel)
+        return [message for _, message in local.messages] if local else []
+
+    def test_group_message_reaches_every_member_as_its_own_copy(self):
+        now = time.time()
+        self.layer._groups['chat_1'] = {'a!1': now, 'b!1': now}
+        self.layer._dispatch(notify_payload(('g', 'chat_1', {'type': 'chat.message', 'data': {'n': 1}})))
+
+        first, second = self.received('a!1'), self.received('b!1')
+        self.assertEqual(first, second)
+        first[0]['data']['n'] = 99
+        self.assertEqual(second[0]['data']['n'], 1)
+
+    def test_expired_members_are_removed_and_skipped(self):
+        now = time.time()
+        self.layer._groups['chat_1'] = {'old!1': now - 120, 'new!1': now}
+        self.layer._dispatch(notify_payload(('g', 'chat_1', {'type': 'chat.message'})))
+
+        self.assertEqual(self.received('old!1'), [])
+        self.assertEqual(len(self.received('new!1')), 1)
+        self.assertNotIn('old!1', self.layer._groups['chat_1'])
+
+    def test_full_channel_drops_and_counts(self):
+        for number in range(3):
+            self.layer._dispatch(notify_payload(('c', 'a!1', {'type': 'x', 'n': number})))
+
+        self.assertEqual([message['n'] for message in self.received('a!1')], [0, 1])
+        self.assertEqual(self.layer.counters['dropped_full'], 1)
+        self.assertEqual(self.layer.counters['delivered'], 2)
+
+    def test_invalid_payload_is_counted(self):
+        self.layer._dispatch('not json')
+        self.assertEqual(self.layer.counters['invalid'], 1)
+
+
+class EnqueueTests(SimpleTestCase):
+    def test_group_capacity_drops_and_counts(self):
+        layer = make_layer(group_capacity=2)
+        results = [layer._enqueue('chat_g_x', 'chat_1', ['g', 'chat_1', {'n': n}]) for n in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(layer.counters['dropped_outgoing'], 1)
+        self.assertEqual(len(layer._take_outgoing()), 2)
+        # Al publicar se libera el cupo del grupo
+        self.assertTrue(layer._enqueue('chat_g_x', 'chat_1', ['g', 'chat_1', {'n': 3}]))
+
+
+class PublishTests(SimpleTestCase):
+    def publish(self, outgoing):
+        layer = make_layer()
+        listener = _Listener(layer)
+        self.addCleanup(listener._wake_r.close)
+        self.addCleanup(listener._wake_w.close)
+        listener.connection = FakeConnection()
+        listener._publish(outgoing)
+        return layer, listener.connection.statements
+
+    def test_messages_are_packed_into_payloads_under_the_limit(self):
+        data = json.dumps(['g', 'chat_1', {'type': 'chat.message', 'message': 'x' * 500}])
+        outgoing = [('chat_g_a', 'chat_1', data)] * 40
+        layer, statements = self.publish(outgoing)
+
+        payloads = [params[i + 1] for _, params in statements for i in range(0, len(params), 2)]
+        self.assertGreater(len(payloads), 1)
+        self.assertLess(len(payloads), len(outgoing))
+        for payload in payloads:
+            self.assertLessEqual(len(payload.encode()), MAX_PAYLOAD)
+        self.assertEqual(sum(len(json.loads(payload)) for payload in payloads), len(outgoing))
+        self.assertEqual(layer.counters['published'], len(outgoing))
+        self.assertEqual(layer.counters['notifies_sent'], len(payloads))
+
+    def test_payloads_are_split_by_channel_and_by_statement(self):
+        outgoing = [(f'chat_g_{n}', f'chat_{n}', '["g","chat","{}"]') for n in range(NOTIFY_PER_STATEMENT + 5)]
+        _, statements = self.publish(outgoing)
+
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(statements[0][0].count('pg_notify'), NOTIFY_PER_STATEMENT)
+        self.assertEqual(statements[1][0].count('pg_notify'), 5)
+        channels = [params[i] for _, params in statements for i in range(0, len(params), 2)]
+        self.assertEqual(channels, [pg_channel for pg_channel, _, _ in outgoing])
+
+
+def api_request(**params):
+    return Request(APIRequestFactory().get('/api/chat/1/messages/', params))
+
+
+class ChatMessageCursorPaginationTests(SimpleTestCase):
+    def setUp(self):
+        self.paginator = ChatMessageCursorPagination()
+
+    def test_cursor_round_trip(self):
+        timestamp = datetime(2025, 3, 3, 9, 30, 15, 123456, tzinfo=timezone.utc)
+        cursor = self.paginator.encode_cursor(SimpleNamespace(timestamp=timestamp, pk=7))
+
+        self.assertEqual(self.paginator.decode_cursor(api_request(cursor=cursor)), (timestamp, 7))
+
+    def test_invalid_cursor_is_not_found(self):
+        # Un cursor de citas (fecha, hora, id) tampoco vale para el chat
+        for cursor in ('!!!', 'MjAyNS0wMy0wMywwOTozMDowMCw0Mg==', 'ñ'):
+            with self.subTest(cursor=cursor), self.assertRaises(NotFound):
+                self.paginator.decode_cursor(api_request(cursor=cursor))
+
+    def test_since_must_be_a_message_id(self):
+        self.assertIsNone(self.paginator.decode_since(api_request()))
+        self.assertEqual(self.paginator.decode_since(api_request(since='12')), 12)
+        for since in ('abc', '-1', ''):
+            with self.subTest(since=since), self.assertRaises(ValidationError):
+                self.paginator.decode_since(api_request(since=since))
+
+
+class ChatSinceLookbackTests(TenantTestCase):
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Clínica de pruebas'
+
+    def setUp(self):
+        self.sender = get_user_model().objects.create_user(
+            'paciente@test.com', 'clave-segura-123', first_name='Luis', last_name='Rojas'
+        )
+        self.now = datetime.now(timezone.utc)
+
+    def message(self, pk, seconds_ago):
+        return ChatMessage.objects.create(
+            id=pk, appointment_id=1, sender=self.sender, message=f'mensaje {pk}',
+            timestamp=self.now - timedelta(seconds=seconds_ago)
+        )
+
+    def catch_up(self, since):
+        paginator = ChatMessageCursorPagination()
+        page = paginator.paginate_queryset(ChatMessage.objects.filter(appointment_id=1), api_request(since=since))
+        return [message.pk for message in page], paginator.get_next_link()
+
+    def test_lower_ids_committed_late_are_sent_again(self):
+        # El 100 lo guardó otro proceso y se confirmó después del 101
+        self.message(99, SINCE_LOOKBACK.total_seconds() + 60)
+        self.message(101, 0)
+        self.message(100, 1)
+        self.message(102, 0)
+
+        self.assertEqual(self.catch_up(101), ([100, 102], None))
+        self.assertEqual(self.catch_up(102), ([100, 101], None))
+
+    def test_next_page_continues_after_the_new_messages(self):
+        self.message(1, 1)
+        for pk in range(2, 6):
+            self.message(pk, 0)
+
+        paginator = ChatMessageCursorPagination()
+        page = paginator.paginate_queryset(
+            ChatMessage.objects.filter(appointment_id=1), api_request(since=2, page_size=2)
+        )
+        self.assertEqual([message.pk for message in page], [1, 3, 4])
+        self.assertIn('since=4', paginator.get_next_link())
+
+
+def pending_messages(count, schema_name='clinica'):
+    buffer = MessageBuffer()
+    for number in range(count):
+        buffer._pending.append((schema_name, SimpleNamespace(appointment_id=number)))
+    return buffer._take()
+
+
+class MessageBufferTests(SimpleTestCase):
+    def make_buffer(self, **kwargs):
+        buffer = MessageBuffer(**{'batch_size': 100, 'delay': 60, **kwargs})
+        self.addCleanup(buffer._cancel_timer)
+        return buffer
+
+    def add(self, buffer, count):
+        for number in range(count):
+            buffer.add('clinica', 1, 2, f'mensaje {number}', datetime.now(timezone.utc))
+
+    async def test_flush_writes_everything_pending(self):
+        buffer = self.make_buffer()
+        self.add(buffer, 3)
+        with mock.patch('apps.chat.persistence.write_messages', return_value=([], 0)) as write:
+            await buffer.flush()
+
+        self.assertEqual(len(write.call_args.args[0]), 3)
+        self.assertEqual(buffer.stats(), {'queued': 3, 'written': 3, 'rejected': 0, 'pending': 0})
+
+    async def test_full_batch_flushes_without_waiting_for_the_timer(self):
+        buffer = self.make_buffer(batch_size=2)
+        with mock.patch('apps.chat.persistence.write_messages', return_value=([], 0)) as write:
+            self.add(buffer, 2)
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            await asyncio.gather(*tasks)
+
+        write.assert_called_once()
+        self.assertIsNone(buffer._timer)
+        self.assertEqual(buffer.counters['written'], 2)
+
+    async def test_failed_messages_are_requeued_and_retried_later(self):
+        buffer = self.make_buffer()
+        self.add(buffer, 3)
+        with mock.patch('apps.chat.persistence.write_messages', side_effect=lambda pending: (pending, 0)):
+            buffer._cancel_timer()
+            await buffer.flush()
+
+        self.assertEqual(buffer.counters['failed'], 3)
+        self.assertEqual(buffer.counters['written'], 0)
+        self.assertEqual(len(buffer._pending), 3)
+        self.assertIsNotNone(buffer._timer)
+
+    async def test_rejected_messages_are_counted_apart(self):
+        buffer = self.make_buffer()
+        self.add(buffer, 3)
+        with mock.patch('apps.chat.persistence.write_messages', return_value=([], 1)):
+            await buffer.flush()
+
+        self.assertEqual(buffer.counters['written'], 2)
+        self.assertEqual(buffer.counters['rejected'], 1)
+        self.assertEqual(buffer._pending, [])
+
+    def test_requeue_keeps_order_and_respects_max_pending(self):
+        buffer = self.make_buffer(max_pending=4)
+        failed = pending_messages(3)
+        buffer._pending = pending_messages(2, 'nuevos')
+        buffer._requeue(failed)
+
+        # Los fallidos vuelven delante de los más nuevos; el que no cabe se descarta
+        self.assertEqual(buffer._pending[:2], failed[:2])
+        self.assertEqual([schema for schema, _ in buffer._pending[2:]], ['nuevos', 'nuevos'])
+        self.assertEqual(buffer.counters['failed'], 3)
+        self.assertEqual(buffer.counters['dropped'], 1)
+
+    async def test_add_drops_when_max_pending_is_reached(self):
+        buffer = self.make_buffer(max_pending=2)
+        self.add(buffer, 3)
+
+        self.assertEqual(len(buffer._pending), 2)
+        self.assertEqual(buffer.counters['dropped'], 1)
+
+    def test_flush_sync_drops_what_cannot_be_written(self):
+        buffer = self.make_buffer()
+        buffer._pending = pending_messages(3)
+        with mock.patch('apps.chat.persistence.write_messages', side_effect=lambda pending: (pending[:1], 1)):
+            buffer.flush_sync()
+
+        self.assertEqual(buffer.counters['written'], 1)
+        self.assertEqual(buffer.counters['rejected'], 1)
+        self.assertEqual(buffer.counters['dropped'], 1)
+
+
+class WriteMessagesTests(SimpleTestCase):
+    def test_one_insert_per_schema(self):
+        pending = pending_messages(2, 'a') + pending_messages(1, 'b') + pending_messages(1, 'a')
+        with mock.patch('apps.chat.persistence._insert') as insert:
+            self.assertEqual(write_messages(pending), ([], 0))
+
+        self.assertEqual([(schema, len(messages)) for schema, messages in (c.args for c in insert.call_args_list)],
+                         [('a', 3), ('b', 1)])
+
+    def test_invalid_row_is_rejected_and_the_rest_saved(self):
+        pending = pending_messages(3)
+        bad = pending[1][1]
+        saved = []
+
+        def insert(schema_name, messages):
+            if bad in messages:
+                raise IntegrityError('la cita ya no existe')
+            saved.extend(messages)
+
+        with mock.patch('apps.chat.persistence._insert', side_effect=insert), self.assertLogs('apps', 'WARNING'):
+            self.assertEqual(write_messages(pending), ([], 1))
+        self.assertEqual(saved, [pending[0][1], pending[2][1]])
+
+    def test_database_error_returns_the_batch_for_retry(self):
+        pending = pending_messages(2)
+        with mock.patch('apps.chat.persistence._insert', side_effect=RuntimeError('sin conexión')), \
+                self.assertLogs('apps', 'ERROR'):
+            failed, rejected = write_messages(pending)
+
+        self.assertEqual(failed, pending)
+        self.assertEqual(rejected, 0)
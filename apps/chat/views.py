@@ -4,16 +4,19 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from .models import ChatMessage
+from .pagination import ChatMessageCursorPagination
 from .serializers import ChatMessageSerializer
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def chat_messages_view(request, appointment_id):
     if request.method == 'GET':
-        # Obtener todos los mensajes de esta cita
-        messages = ChatMessage.objects.filter(appointment_id=appointment_id)
-        serializer = ChatMessageSerializer(messages, many=True)
-        return Response(serializer.data)
+        # Historial paginado: ?cursor= para mensajes anteriores, ?since=<id> para ponerse al día
+        messages = ChatMessage.objects.filter(appointment_id=appointment_id).select_related('sender')
+        paginator = ChatMessageCursorPagination()
+        page = paginator.paginate_queryset(messages, request)
+        serializer = ChatMessageSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
     
     elif request.method == 'POST':
         # Crear nuevo mensaje
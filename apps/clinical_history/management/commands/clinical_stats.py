@@ -5,9 +5,8 @@ Comando para mostrar estadísticas de los historiales clínicos
 from django.core.management.base import BaseCommand
 from apps.clinical_history.models import ClinicalHistory
 from apps.users.models import CustomUser
-from apps.tenants.models import Clinic
+from apps.tenants.fanout import add_workers_argument, get_tenants, run_for_tenants
 from django_tenants.utils import schema_context
-from django.db.models import Count
 
 class Command(BaseCommand):
     help = 'Mostrar estadísticas de los historiales clínicos'
@@ -24,6 +23,7 @@ class Command(BaseCommand):
             action='store_true',
             help='Mostrar información detallada de cada historial',
         )
+        add_workers_argument(parser)
 
     def handle(self, *args, **options):
         specific_tenant = options.get('tenant')
@@ -33,73 +33,47 @@ class Command(BaseCommand):
         self.stdout.write('=' * 60)
         
         # Obtener tenants
-        if specific_tenant:
-            tenants = Clinic.objects.filter(schema_name=specific_tenant)
-            if not tenants.exists():
-                self.stdout.write(self.style.ERROR(f'❌ Tenant "{specific_tenant}" no encontrado'))
-                return
-        else:
-            tenants = Clinic.objects.exclude(schema_name='public')
+        tenants = get_tenants(specific_tenant)
+        if specific_tenant and not tenants:
+            self.stdout.write(self.style.ERROR(f'❌ Tenant "{specific_tenant}" no encontrado'))
+            return
         
         total_histories = 0
         total_patients_with_history = 0
         total_patients = 0
         
-        for tenant in tenants:
+        # Las clínicas se consultan en paralelo; la salida se imprime en orden
+        results = run_for_tenants(
+            lambda tenant: self.collect_tenant_stats(detailed),
+            tenants,
+            workers=options['workers']
+        )
+        
+        for result in results:
+            tenant = result.tenant
             self.stdout.write(f'\n🏥 {tenant.name} ({tenant.schema_name})')
             self.stdout.write('-' * 50)
             
-            with schema_context(tenant.schema_name):
-                # Estadísticas básicas
-                histories_count = ClinicalHistory.objects.count()
-                patients_count = CustomUser.objects.filter(user_type='patient').count()
-                patients_with_history = ClinicalHistory.objects.values('patient').distinct().count()
-                professionals_count = CustomUser.objects.filter(user_type='professional').count()
-                
-                total_histories += histories_count
-                total_patients_with_history += patients_with_history
-                total_patients += patients_count
-                
-                self.stdout.write(f'📋 Historiales clínicos: {histories_count}')
-                self.stdout.write(f'👥 Pacientes totales: {patients_count}')
-                self.stdout.write(f'📝 Pacientes con historial: {patients_with_history}')
-                self.stdout.write(f'👨‍⚕️ Profesionales: {professionals_count}')
-                
-                if patients_count > 0:
-                    coverage = (patients_with_history / patients_count) * 100
-                    self.stdout.write(f'📊 Cobertura de historiales: {coverage:.1f}%')
-                
-                # Mostrar detalles si se solicita
-                if detailed and histories_count > 0:
-                    self.stdout.write('\n📋 Historiales detallados:')
-                    histories = ClinicalHistory.objects.select_related(
-                        'patient', 'created_by', 'last_updated_by'
-                    ).all()
-                    
-                    for i, history in enumerate(histories, 1):
-                        self.stdout.write(f'\n  {i}. 👤 {history.patient.get_full_name()}')
-                        
-                        created_by = "N/A"
-                        if history.created_by:
-                            created_by = history.created_by.get_full_name()
-                        
-                        updated_by = "N/A"
-                        if history.last_updated_by:
-                            updated_by = history.last_updated_by.get_full_name()
-                        
-                        self.stdout.write(f'     📅 Creado: {history.created_at.strftime("%d/%m/%Y")} por {created_by}')
-                        self.stdout.write(f'     🔄 Actualizado: {history.updated_at.strftime("%d/%m/%Y")} por {updated_by}')
-                        self.stdout.write(f'     📝 Motivo: {history.consultation_reason[:50]}...')
-                        
-                        # Mostrar diagnósticos si existen
-                        if history.diagnoses:
-                            diagnoses_list = [d.get('descripcion', 'N/A') for d in history.diagnoses]
-                            self.stdout.write(f'     🔍 Diagnósticos: {", ".join(diagnoses_list)}')
-                        
-                        # Mostrar evaluación de riesgos
-                        if history.risk_assessment:
-                            risks = history.risk_assessment
-                            self.stdout.write(f'     ⚠️ Riesgos: Autolesión={risks.get("autolesion", "N/A")}, Recaída={risks.get("recaida", "N/A")}')
+            if not result.ok:
+                self.stdout.write(self.style.ERROR(f'❌ Error: {result.error}'))
+                continue
+            
+            stats = result.value
+            total_histories += stats['histories_count']
+            total_patients_with_history += stats['patients_with_history']
+            total_patients += stats['patients_count']
+            
+            self.stdout.write(f'📋 Historiales clínicos: {stats["histories_count"]}')
+            self.stdout.write(f'👥 Pacientes totales: {stats["patients_count"]}')
+            self.stdout.write(f'📝 Pacientes con historial: {stats["patients_with_history"]}')
+            self.stdout.write(f'👨‍⚕️ Profesionales: {stats["professionals_count"]}')
+            
+            if stats['patients_count'] > 0:
+                coverage = (stats['patients_with_history'] / stats['patients_count']) * 100
+                self.stdout.write(f'📊 Cobertura de historiales: {coverage:.1f}%')
+            
+            for line in stats['detail_lines']:
+                self.stdout.write(line)
         
         # Resumen final
         self.stdout.write(f'\n🎯 RESUMEN GENERAL')
@@ -107,7 +81,7 @@ class Command(BaseCommand):
         self.stdout.write(f'📊 Total historiales: {total_histories}')
         self.stdout.write(f'👥 Total pacientes: {total_patients}')
         self.stdout.write(f'📝 Pacientes con historial: {total_patients_with_history}')
-        self.stdout.write(f'🏥 Tenants activos: {tenants.count()}')
+        self.stdout.write(f'🏥 Tenants activos: {len(tenants)}')
         
         if total_patients > 0:
             global_coverage = (total_patients_with_history / total_patients) * 100
@@ -121,11 +95,57 @@ class Command(BaseCommand):
         # Mostrar ejemplo de uso
         if total_histories > 0:
             self.stdout.write(f'\n📖 Ejemplo de uso:')
-            with schema_context(tenants.first().schema_name):
+            with schema_context(tenants[0].schema_name):
                 sample_patient = CustomUser.objects.filter(user_type='patient').first()
                 if sample_patient:
-                    tenant_schema = tenants.first().schema_name
+                    tenant_schema = tenants[0].schema_name
                     self.stdout.write(f'   curl -H "Authorization: Token <your-token>" \\')
                     self.stdout.write(f'        http://{tenant_schema}.localhost:8000/api/clinical-history/patient/{sample_patient.id}/')
         
-        self.stdout.write(self.style.SUCCESS(f'\n✅ Sistema de historiales clínicos operativo!'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Sistema de historiales clínicos operativo!'))
+
+    def collect_tenant_stats(self, detailed):
+        """Estadísticas del tenant actual (se ejecuta en un worker, dentro de su schema)"""
+        histories_count = ClinicalHistory.objects.count()
+        stats = {
+            'histories_count': histories_count,
+            'patients_count': CustomUser.objects.filter(user_type='patient').count(),
+            'patients_with_history': ClinicalHistory.objects.values('patient').distinct().count(),
+            'professionals_count': CustomUser.objects.filter(user_type='professional').count(),
+            'detail_lines': [],
+        }
+        
+        # Mostrar detalles si se solicita
+        if detailed and histories_count > 0:
+            lines = stats['detail_lines']
+            lines.append('\n📋 Historiales detallados:')
+            histories = ClinicalHistory.objects.select_related(
+                'patient', 'created_by', 'last_updated_by'
+            ).all()
+            
+            for i, history in enumerate(histories, 1):
+                lines.append(f'\n  {i}. 👤 {history.patient.get_full_name()}')
+                
+                created_by = "N/A"
+                if history.created_by:
+                    created_by = history.created_by.get_full_name()
+                
+                updated_by = "N/A"
+                if history.last_updated_by:
+                    updated_by = history.last_updated_by.get_full_name()
+                
+                lines.append(f'     📅 Creado: {history.created_at.strftime("%d/%m/%Y")} por {created_by}')
+                lines.append(f'     🔄 Actualizado: {history.updated_at.strftime("%d/%m/%Y")} por {updated_by}')
+                lines.append(f'     📝 Motivo: {history.consultation_reason[:50]}...')
+                
+                # Mostrar diagnósticos si existen
+                if history.diagnoses:
+                    diagnoses_list = [d.get('descripcion', 'N/A') for d in history.diagnoses]
+                    lines.append(f'     🔍 Diagnósticos: {", ".join(diagnoses_list)}')
+                
+                # Mostrar evaluación de riesgos
+                if history.risk_assessment:
+                    risks = history.risk_assessment
+                    lines.append(f'     ⚠️ Riesgos: Autolesión={risks.get("autolesion", "N/A")}, Recaída={risks.get("recaida", "N/A")}')
+        
+        return stats
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProfessionalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.professionals'
+
+    def ready(self):
+        # Invalidación de la caché del directorio público
+        from . import signals  # noqa: F401
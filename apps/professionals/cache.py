@@ -0,0 +1,128 @@
+# apps/professionals/cache.py
+
+"""
+Caché del directorio público de profesionales (list_professionals y
+professional_public_detail).
+
+Las claves incluyen el schema del tenant (ver CACHES['directory'] en settings)
+y un número de versión: invalidar el directorio de una clínica es incrementar
+su versión, sin tener que buscar y borrar claves. Las señales de
+apps.professionals.signals llaman a invalidate_directory().
+
+La versión vive en la propia caché: con el backend por defecto (memoria
+local) cada worker tiene la suya, y una invalidación solo llega al proceso
+que atendió el cambio; los demás sirven datos viejos hasta el TIMEOUT. Con
+varios workers hay que usar un backend compartido (DIRECTORY_CACHE_BACKEND,
+p. ej. Redis).
+"""
+
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import caches
+
+DIRECTORY_CACHE_ALIAS = 'directory'
+
+# Parámetros de filtro que afectan el resultado de list_professionals
+DIRECTORY_FILTER_PARAMS = ['specialization', 'city', 'max_fee', 'min_rating', 'accepts_online', 'search']
+
+VERSION_KEY = 'directory:version'
+HITS_KEY = 'directory:hits'
+MISSES_KEY = 'directory:misses'
+
+
+def get_directory_cache():
+    return caches[DIRECTORY_CACHE_ALIAS]
+
+
+def filter_params(query_params):
+    """
+    Filtros que afectan el resultado de list_professionals, sin espacios
+    sobrantes. Se conservan las mayúsculas: son los valores que usa la consulta.
+    """
+    filters = {}
+    for name in DIRECTORY_FILTER_PARAMS:
+        value = ' '.join(str(query_params.get(name, '')).split())
+        if value:
+            filters[name] = value
+    return filters
+
+
+def normalize_params(filters):
+    """
+    Forma canónica de los filtros para la clave de caché: en minúsculas, así
+    '?city=La Paz ' y '?city=la paz' comparten la misma entrada. Vale porque
+    los filtros de texto no distinguen mayúsculas (icontains, búsqueda de
+    texto completo); solo se usa para la clave, nunca para la consulta.
+    """
+    return {name: value.lower() for name, value in filter_params(filters).items()}
+
+
+def _incr(key):
+    cache = get_directory_cache()
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave no existe (primer uso o expulsada de la caché)
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def _directory_version():
+    # Si la versión se perdió (caché reiniciada o expulsada), se parte de la hora
+    # actual para no volver a una versión anterior con entradas obsoletas
+    return get_directory_cache().get_or_set(VERSION_KEY, lambda: int(time.time()), timeout=None)
+
+
+def make_directory_key(kind, params=None):
+    if isinstance(params, dict):
+        params = urlencode(sorted(params.items()))
+    digest = hashlib.md5(str(params or '').encode('utf-8')).hexdigest()
+    return f'directory:v{_directory_version()}:{kind}:{digest}'
+
+
+def get_or_compute(kind, params, compute):
+    """
+    Devuelve el valor cacheado para (kind, params) o lo calcula con compute().
+    Las excepciones de compute() (ej: Http404) no se cachean.
+    """
+    cache = get_directory_cache()
+    key = make_directory_key(kind, params)
+
+    value = cache.get(key)
+    if value is not None:
+        _incr(HITS_KEY)
+        return value
+
+    _incr(MISSES_KEY)
+    value = compute()
+    cache.set(key, value)
+    return value
+
+
+def invalidate_directory():
+    """Invalida todo el directorio del tenant actual"""
+    cache = get_directory_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time()), timeout=None)
+
+
+def get_stats():
+    """Aciertos y fallos de la caché del directorio en el tenant actual"""
+    cache = get_directory_cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else 0.0,
+        'version': cache.get(VERSION_KEY),
+    }
+
+
+def reset_stats():
+    get_directory_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -54,12 +54,15 @@ class Command(BaseCommand):
             "Muy satisfecho con el tratamiento, profesional muy dedicada."
         ]
         
-        created_count = 0
         max_to_create = min(count, available_appointments.count())
         
         # Crear reseñas aleatorias
-        selected_appointments = random.sample(list(available_appointments), max_to_create)
+        selected_appointments = random.sample(
+            list(available_appointments.select_related('patient', 'psychologist__professional_profile')),
+            max_to_create
+        )
         
+        reviews = []
         for appointment in selected_appointments:
             # Generar rating (más probabilidad de ratings altos)
             rating = random.choices([3, 4, 5], weights=[1, 3, 6])[0]
@@ -67,25 +70,27 @@ class Command(BaseCommand):
             # Seleccionar comentario aleatorio
             comment = random.choice(comments)
             
-            try:
-                review = Review.objects.create(
-                    professional=appointment.psychologist.professional_profile,
-                    patient=appointment.patient,
-                    appointment=appointment,
-                    rating=rating,
-                    comment=comment
-                )
-                
-                created_count += 1
-                self.stdout.write(
-                    f'✅ Reseña creada: {appointment.patient.get_full_name()} → '
-                    f'{appointment.psychologist.get_full_name()}: {rating}/5 estrellas'
-                )
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'Error creando reseña para cita {appointment.id}: {e}')
-                )
+            reviews.append(Review(
+                professional=appointment.psychologist.professional_profile,
+                patient=appointment.patient,
+                appointment=appointment,
+                rating=rating,
+                comment=comment
+            ))
+        
+        # Un solo INSERT masivo y un recálculo del rating por profesional
+        try:
+            created = Review.bulk_create_reviews(reviews)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error creando reseñas: {e}'))
+            return
+        
+        created_count = len(created)
+        for review in created:
+            self.stdout.write(
+                f'✅ Reseña creada: {review.patient.get_full_name()} → '
+                f'{review.appointment.psychologist.get_full_name()}: {review.rating}/5 estrellas'
+            )
         
         self.stdout.write(
             self.style.SUCCESS(f'\n🎉 Se crearon {created_count} reseñas exitosamente!')
@@ -95,7 +100,7 @@ class Command(BaseCommand):
         self.stdout.write('\n📊 Estadísticas actualizadas:')
         from apps.professionals.models import ProfessionalProfile
         
-        for profile in ProfessionalProfile.objects.filter(reviews__isnull=False).distinct():
+        for profile in ProfessionalProfile.objects.filter(total_reviews__gt=0).select_related('user'):
             self.stdout.write(
                 f'  • {profile.user.get_full_name()}: {profile.average_rating}/5.0 '
                 f'({profile.total_reviews} reseñas)'
@@ -0,0 +1,64 @@
+# apps/professionals/management/commands/directory_cache_stats.py
+
+"""
+Comando para ver los aciertos y fallos de la caché del directorio público.
+Con un backend compartido (Redis) los contadores suman todos los procesos;
+con memoria local solo reflejan el proceso actual.
+"""
+
+from django.core.management.base import BaseCommand
+from django_tenants.utils import schema_context
+
+from apps.professionals import cache as directory_cache
+from apps.tenants.models import Clinic
+
+
+class Command(BaseCommand):
+    help = 'Muestra aciertos y fallos de la caché del directorio de profesionales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Schema del tenant específico (ej: mindcare, bienestar)',
+            default=None
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Reiniciar los contadores después de mostrarlos',
+        )
+        parser.add_argument(
+            '--invalidate',
+            action='store_true',
+            help='Invalidar el directorio cacheado del tenant',
+        )
+
+    def handle(self, *args, **options):
+        specific_tenant = options.get('tenant')
+
+        if specific_tenant:
+            tenants = Clinic.objects.filter(schema_name=specific_tenant)
+            if not tenants.exists():
+                self.stdout.write(self.style.ERROR(f'❌ Tenant "{specific_tenant}" no encontrado'))
+                return
+        else:
+            tenants = Clinic.objects.exclude(schema_name='public')
+
+        self.stdout.write(self.style.SUCCESS('📊 Caché del directorio de profesionales'))
+        self.stdout.write('=' * 60)
+
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                stats = directory_cache.get_stats()
+                self.stdout.write(
+                    f'🏥 {tenant.name} ({tenant.schema_name}): '
+                    f'{stats["hits"]} aciertos, {stats["misses"]} fallos, '
+                    f'tasa de acierto {stats["hit_rate"]:.1%}'
+                )
+
+                if options['reset']:
+                    directory_cache.reset_stats()
+                if options['invalidate']:
+                    directory_cache.invalidate_directory()
+                    self.stdout.write('   🔄 Directorio invalidado')
@@ -0,0 +1,95 @@
+# apps/professionals/management/commands/reconcile_ratings.py
+
+"""
+Comando para reparar los agregados de rating de los profesionales.
+Review actualiza total_reviews, rating_sum y el histograma de forma incremental;
+si algo los desvía (borrados masivos con queryset.delete(), ediciones directas
+en la base de datos) este comando los recalcula desde las reseñas.
+"""
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django_tenants.utils import schema_context
+
+from apps.professionals.models import RATING_VALUES, ProfessionalProfile, rating_count_field
+from apps.tenants.models import Clinic
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de rating de los profesionales y corrige desvíos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenant',
+            type=str,
+            help='Schema del tenant específico (ej: mindcare, bienestar)',
+            default=None
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo mostrar los desvíos, sin corregirlos',
+        )
+
+    def handle(self, *args, **options):
+        specific_tenant = options.get('tenant')
+
+        if specific_tenant:
+            tenants = Clinic.objects.filter(schema_name=specific_tenant)
+            if not tenants.exists():
+                self.stdout.write(self.style.ERROR(f'❌ Tenant "{specific_tenant}" no encontrado'))
+                return
+        else:
+            tenants = Clinic.objects.exclude(schema_name='public')
+
+        self.stdout.write(self.style.SUCCESS('⭐ Reconciliación de ratings de profesionales'))
+        self.stdout.write('=' * 60)
+
+        total_fixed = 0
+        for tenant in tenants:
+            with schema_context(tenant.schema_name):
+                drifted = self.find_drifted_profiles()
+                self.stdout.write(
+                    f'🏥 {tenant.name} ({tenant.schema_name}): {len(drifted)} perfiles con desvío'
+                )
+
+                for profile in drifted:
+                    self.stdout.write(
+                        f'   • {profile.user.get_full_name()}: '
+                        f'{profile.total_reviews} reseñas guardadas, {profile.actual_total} reales'
+                    )
+                    if not options['dry_run']:
+                        profile.update_rating()
+                total_fixed += len(drifted)
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'\n🔍 {total_fixed} perfiles por corregir (dry-run)'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ {total_fixed} perfiles corregidos'))
+
+    def find_drifted_profiles(self):
+        """
+        Perfiles cuyos agregados no coinciden con sus reseñas, comparados en
+        una sola consulta agregada.
+        """
+        profiles = ProfessionalProfile.objects.select_related('user').annotate(
+            actual_total=Count('reviews'),
+            actual_sum=Coalesce(Sum('reviews__rating'), 0),
+            **{
+                f'actual_{rating}': Count('reviews', filter=Q(reviews__rating=rating))
+                for rating in RATING_VALUES
+            }
+        )
+
+        drifted = []
+        for profile in profiles:
+            stored = [profile.total_reviews, profile.rating_sum] + [
+                getattr(profile, rating_count_field(rating)) for rating in RATING_VALUES
+            ]
+            actual = [profile.actual_total, profile.actual_sum] + [
+                getattr(profile, f'actual_{rating}') for rating in RATING_VALUES
+            ]
+            if stored != actual:
+                drifted.append(profile)
+        return drifted
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:46
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+# Configuración de texto en español que ignora acentos. Se crea en 'public'
+# (junto a la extensión unaccent) para que la vean todos los esquemas de tenants.
+CREATE_SEARCH_CONFIG = '''
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA public;
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_ts_config c
+        JOIN pg_namespace n ON n.oid = c.cfgnamespace
+        WHERE c.cfgname = 'spanish_unaccent' AND n.nspname = 'public'
+    ) THEN
+        CREATE TEXT SEARCH CONFIGURATION public.spanish_unaccent (COPY = pg_catalog.spanish);
+        ALTER TEXT SEARCH CONFIGURATION public.spanish_unaccent
+            ALTER MAPPING FOR hword, hword_part, word WITH public.unaccent, spanish_stem;
+    END IF;
+END
+$$;
+'''
+
+# Mismo vector que apps.professionals.search.build_search_vector, para los perfiles existentes
+BACKFILL_SEARCH_VECTOR = '''
+UPDATE professional_profiles p SET search_vector =
+    setweight(to_tsvector('spanish_unaccent', trim(coalesce(u.first_name, '') || ' ' || coalesce(u.last_name, ''))), 'A') ||
+    setweight(to_tsvector('spanish_unaccent', coalesce((
+        SELECT string_agg(s.name, ' ')
+        FROM professional_profiles_specializations ps
+        JOIN specializations s ON s.id = ps.specialization_id
+        WHERE ps.professionalprofile_id = p.id
+    ), '')), 'A') ||
+    setweight(to_tsvector('spanish_unaccent', coalesce(p.city, '')), 'B') ||
+    setweight(to_tsvector('spanish_unaccent', coalesce(p.bio, '')), 'C')
+FROM users u
+WHERE u.id = p.user_id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professionals', '0002_review'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SEARCH_CONFIG, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='professionalprofile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='prof_search_vector_idx'),
+        ),
+        migrations.RunSQL(BACKFILL_SEARCH_VECTOR, reverse_sql=migrations.RunSQL.noop),
+    ]
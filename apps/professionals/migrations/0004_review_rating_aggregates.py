@@ -0,0 +1,70 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:48
+
+from django.db import migrations, models
+
+# Inicializa los agregados con las reseñas existentes
+BACKFILL_RATING_AGGREGATES = '''
+UPDATE professional_profiles p SET
+    total_reviews = r.total,
+    rating_sum = r.rating_sum,
+    average_rating = round(r.rating_sum::numeric / r.total, 2),
+    rating_1_count = r.c1,
+    rating_2_count = r.c2,
+    rating_3_count = r.c3,
+    rating_4_count = r.c4,
+    rating_5_count = r.c5
+FROM (
+    SELECT professional_id,
+           count(*) AS total,
+           sum(rating) AS rating_sum,
+           count(*) FILTER (WHERE rating = 1) AS c1,
+           count(*) FILTER (WHERE rating = 2) AS c2,
+           count(*) FILTER (WHERE rating = 3) AS c3,
+           count(*) FILTER (WHERE rating = 4) AS c4,
+           count(*) FILTER (WHERE rating = 5) AS c5
+    FROM reviews
+    GROUP BY professional_id
+) r
+WHERE r.professional_id = p.id;
+'''
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('professionals', '0003_professional_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='professionalprofile',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunSQL(BACKFILL_RATING_AGGREGATES, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,29 @@
 # apps/professionals/models.py
 
-from django.db import models
+from decimal import Decimal
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db.models import Avg
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import Cast, Round
+from django.db.models.lookups import GreaterThan
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.utils import timezone
 
 User = get_user_model()
 
+# Valores posibles de Review.rating
+RATING_VALUES = range(1, 6)
+
+
+def rating_count_field(rating):
+    """Campo del histograma de ProfessionalProfile para un valor de rating"""
+    return f'rating_{rating}_count'
+
+
 class Specialization(models.Model):
     """
     Especialidades de los profesionales
@@ -68,6 +84,14 @@ class ProfessionalProfile(models.Model):
         validators=[MinValueValidator(0), MaxValueValidator(5)]
     )
     total_reviews = models.PositiveIntegerField(default=0)
+    # Agregados incrementales: suma y cantidad de reseñas por estrella.
+    # Review los actualiza con expresiones F (ver apply_rating_change)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_1_count = models.PositiveIntegerField(default=0)
+    rating_2_count = models.PositiveIntegerField(default=0)
+    rating_3_count = models.PositiveIntegerField(default=0)
+    rating_4_count = models.PositiveIntegerField(default=0)
+    rating_5_count = models.PositiveIntegerField(default=0)
     
     # Estado del perfil
     is_verified = models.BooleanField(default=False)
@@ -76,30 +100,124 @@ class ProfessionalProfile(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    # Búsqueda de texto completo (ver apps.professionals.search)
+    search_vector = SearchVectorField(null=True, editable=False)
     
     class Meta:
         db_table = 'professional_profiles'
         verbose_name = 'Perfil Profesional'
         verbose_name_plural = 'Perfiles Profesionales'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='prof_search_vector_idx'),
+        ]
     
+    # Duración guardada, para regenerar el índice de slots si cambia
+    _original_session_duration = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_session_duration = dict(zip(field_names, values)).get('session_duration')
+        return instance
+
     def __str__(self):
         return f"Dr. {self.user.get_full_name()}"
 
+    def save(self, *args, **kwargs):
+        is_new = self._state.adding
+        if not is_new and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Los agregados de rating los mantiene Review con UPDATE ... F(): un
+            # save completo los pisaría con los valores leídos antes
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in RATING_AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+        # Actualizar el vector de búsqueda si cambió algún campo indexado
+        from .search import PROFILE_SEARCH_FIELDS, update_search_vector
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or PROFILE_SEARCH_FIELDS & set(update_fields):
+            update_search_vector(self)
+
+        # Los slots dependen de la duración de sesión
+        if is_new or self.session_duration != self._original_session_duration:
+            from apps.appointments.slot_index import rebuild_psychologist_slots
+            rebuild_psychologist_slots(self.user_id, self.session_duration)
+            self._original_session_duration = self.session_duration
+
+    @property
+    def rating_histogram(self):
+        """Cantidad de reseñas por estrella: {1: n, ..., 5: n}"""
+        return {rating: getattr(self, rating_count_field(rating)) for rating in RATING_VALUES}
+
+    def apply_rating_change(self, added=None, removed=None):
+        """
+        Actualiza los agregados de rating con un solo UPDATE atómico, sin
+        recorrer las reseñas: `added` es el rating que entra y `removed` el
+        que sale (ambos al modificar una reseña existente).
+        """
+        if added == removed:
+            return
+
+        count_delta = (added is not None) - (removed is not None)
+        sum_delta = (added or 0) - (removed or 0)
+        new_total = F('total_reviews') + count_delta
+        new_sum = F('rating_sum') + sum_delta
+
+        updates = {
+            'updated_at': timezone.now(),
+            'total_reviews': new_total,
+            'rating_sum': new_sum,
+            'average_rating': Case(
+                When(
+                    GreaterThan(new_total, 0),
+                    then=Round(Cast(new_sum, models.DecimalField(max_digits=12, decimal_places=4)) / new_total, 2)
+                ),
+                default=Value(Decimal('0.00')),
+                output_field=models.DecimalField(max_digits=3, decimal_places=2)
+            ),
+        }
+        if added is not None:
+            updates[rating_count_field(added)] = F(rating_count_field(added)) + 1
+        if removed is not None:
+            updates[rating_count_field(removed)] = F(rating_count_field(removed)) - 1
+
+        ProfessionalProfile.objects.filter(pk=self.pk).update(**updates)
+
     def update_rating(self):
         """
-        Calcula y actualiza la calificación promedio y el total de reseñas.
+        Recalcula desde cero la calificación promedio, el total de reseñas y el
+        histograma con una sola consulta. Se usa para reparar desvíos
+        (comando reconcile_ratings) y tras cargas masivas de reseñas.
         """
-        reviews = self.reviews.all()
-        self.total_reviews = reviews.count()
+        aggregates = self.reviews.aggregate(
+            total=Count('id'),
+            rating_sum=Sum('rating'),
+            **{
+                rating_count_field(rating): Count('id', filter=Q(rating=rating))
+                for rating in RATING_VALUES
+            }
+        )
+        self.total_reviews = aggregates['total']
+        self.rating_sum = aggregates['rating_sum'] or 0
+        for rating in RATING_VALUES:
+            setattr(self, rating_count_field(rating), aggregates[rating_count_field(rating)])
 
         if self.total_reviews > 0:
-            # Calcula el promedio de la columna 'rating'
-            average = reviews.aggregate(Avg('rating'))['rating__avg']
-            self.average_rating = round(average, 2)
+            self.average_rating = round(Decimal(self.rating_sum) / self.total_reviews, 2)
         else:
-            self.average_rating = 0.00
+            self.average_rating = Decimal('0.00')
 
-        self.save(update_fields=['average_rating', 'total_reviews'])
+        self.save(update_fields=[*RATING_AGGREGATE_FIELDS, 'updated_at'])
+
+
+# Campos que mantienen Review.save/delete y ProfessionalProfile.update_rating;
+# ProfessionalProfile.save no los escribe salvo que se pidan en update_fields
+RATING_AGGREGATE_FIELDS = ['average_rating', 'total_reviews', 'rating_sum'] + [
+    rating_count_field(rating) for rating in RATING_VALUES
+]
 
 
 class WorkingHours(models.Model):
@@ -174,18 +292,62 @@ class Review(models.Model):
     def __str__(self):
         return f'Calificación de {self.patient.get_full_name()} para {self.professional.user.get_full_name()}: {self.rating} estrellas'
 
+    # Valores guardados, para aplicar solo la diferencia a los agregados del profesional
+    _original_rating = None
+    _original_professional_id = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # En __init__ _state.adding sigue siendo True también para filas leídas
+        instance = super().from_db(db, field_names, values)
+        loaded = dict(zip(field_names, values))
+        instance._original_rating = loaded.get('rating')
+        instance._original_professional_id = loaded.get('professional_id')
+        return instance
+
     def save(self, *args, **kwargs):
         """
-        Sobrescribimos save para recalcular el rating del profesional.
+        Sobrescribimos save para actualizar el rating del profesional de forma
+        incremental (sin recorrer todas sus reseñas).
         """
-        super().save(*args, **kwargs)
-        # Después de guardar la reseña, actualizamos el perfil del profesional
-        self.professional.update_rating()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            if self._original_professional_id not in (None, self.professional_id):
+                # La reseña cambió de profesional: sale de uno y entra en el otro
+                ProfessionalProfile(pk=self._original_professional_id).apply_rating_change(
+                    removed=self._original_rating
+                )
+                self.professional.apply_rating_change(added=self.rating)
+            else:
+                self.professional.apply_rating_change(added=self.rating, removed=self._original_rating)
+
+        self._original_rating = self.rating
+        self._original_professional_id = self.professional_id
 
     def delete(self, *args, **kwargs):
         """
-        Sobrescribimos delete para recalcular el rating del profesional.
+        Sobrescribimos delete para descontar la reseña del rating del profesional.
         """
         professional = self.professional
-        super().delete(*args, **kwargs)
-        professional.update_rating()
\ No newline at end of file
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            professional.apply_rating_change(removed=self._original_rating)
+        return result
+
+    @classmethod
+    def bulk_create_reviews(cls, reviews, batch_size=500):
+        """
+        Carga masiva de reseñas: un bulk_create y un recálculo por profesional,
+        en lugar de un UPDATE de agregados por reseña.
+        """
+        with transaction.atomic():
+            created = cls.objects.bulk_create(reviews, batch_size=batch_size)
+            for review in created:
+                review._original_rating = review.rating
+                review._original_professional_id = review.professional_id
+
+            professional_ids = {review.professional_id for review in created}
+            for professional in ProfessionalProfile.objects.filter(pk__in=professional_ids):
+                professional.update_rating()
+        return created
\ No newline at end of file
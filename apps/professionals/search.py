@@ -0,0 +1,81 @@
+# apps/professionals/search.py
+
+"""
+Búsqueda de texto completo del directorio de profesionales.
+
+Cada ProfessionalProfile guarda en `search_vector` un tsvector con su nombre,
+especialidades, ciudad y bio (con pesos A, A, B y C), indexado con GIN. El
+vector se actualiza al guardar el perfil y desde las señales de
+apps.professionals.signals cuando cambian el nombre del usuario o las
+especialidades.
+
+La configuración `spanish_unaccent` (creada en la migración 0003) quita los
+acentos antes del stemming en español: "psicología" y "psicologia" coinciden.
+"""
+
+import re
+
+from django.db.models import F, Value
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.utils import timezone
+
+SEARCH_CONFIG = 'spanish_unaccent'
+
+# Campos del perfil que forman parte del vector
+PROFILE_SEARCH_FIELDS = {'bio', 'city'}
+
+
+def _weighted(text, weight):
+    return SearchVector(Value(text or ''), config=SEARCH_CONFIG, weight=weight)
+
+
+def build_search_vector(profile, specialization_names):
+    """Expresión tsvector para el perfil dado"""
+    return (
+        _weighted(profile.user.get_full_name(), 'A') +
+        _weighted(' '.join(specialization_names), 'A') +
+        _weighted(profile.city, 'B') +
+        _weighted(profile.bio, 'C')
+    )
+
+
+def update_search_vector(profile):
+    """Recalcula el vector de un perfil con un solo UPDATE"""
+    from .models import ProfessionalProfile
+
+    names = list(profile.specializations.values_list('name', flat=True))
+    # updated_at también: los backups incrementales detectan cambios por ese campo
+    ProfessionalProfile.objects.filter(pk=profile.pk).update(
+        search_vector=build_search_vector(profile, names), updated_at=timezone.now()
+    )
+
+
+def update_search_vectors(profiles):
+    for profile in profiles.select_related('user'):
+        update_search_vector(profile)
+
+
+def build_search_query(text):
+    """
+    Consulta con prefijos ("psicol" encuentra "psicología") que exige todos los
+    términos. Solo se usan caracteres de palabra, así el texto del usuario no
+    puede romper la sintaxis de to_tsquery.
+    """
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    return SearchQuery(
+        ' & '.join(f'{term}:*' for term in terms),
+        search_type='raw',
+        config=SEARCH_CONFIG
+    )
+
+
+def search_profiles(queryset, text):
+    """Filtra el queryset por el texto y lo ordena por relevancia"""
+    query = build_search_query(text)
+    if query is None:
+        return queryset
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    ).order_by('-search_rank', 'id')
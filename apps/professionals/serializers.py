@@ -97,6 +97,7 @@ class ProfessionalPublicSerializer(serializers.ModelSerializer):
     working_hours = WorkingHoursSerializer(many=True, read_only=True)
     full_name = serializers.CharField(source='user.get_full_name', read_only=True)
     user_id = serializers.ReadOnlyField(source='user.id') # <--- 1. AÑADE ESTA LÍNEA
+    rating_histogram = serializers.ReadOnlyField()
 
     class Meta:
         model = ProfessionalProfile
@@ -104,7 +105,7 @@ class ProfessionalPublicSerializer(serializers.ModelSerializer):
             'id', 'user_id', 'full_name', 'bio', 'education', 'experience_years', # <-- 2. AÑADE 'user_id' AQUÍ
             'consultation_fee', 'session_duration', 'accepts_online_sessions',
             'accepts_in_person_sessions', 'city', 'state', 'average_rating',
-            'total_reviews', 'specializations', 'working_hours'
+            'total_reviews', 'rating_histogram', 'specializations', 'working_hours'
         ]
 
 
@@ -0,0 +1,83 @@
+# apps/professionals/signals.py
+
+"""
+Invalida la caché del directorio público cuando cambia algo que se muestra en él,
+y mantiene el vector de búsqueda de los perfiles cuando cambian datos que viven
+fuera de ProfessionalProfile (nombre del usuario, especialidades).
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django_tenants.utils import get_public_schema_name
+
+from .cache import invalidate_directory
+from .models import ProfessionalProfile, Review, Specialization, WorkingHours
+from .search import update_search_vector, update_search_vectors
+
+User = get_user_model()
+
+# Campos del usuario que aparecen en el directorio (full_name)
+USER_DIRECTORY_FIELDS = {'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=ProfessionalProfile)
+@receiver(post_delete, sender=ProfessionalProfile)
+@receiver(post_save, sender=Specialization)
+@receiver(post_delete, sender=Specialization)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=WorkingHours)
+@receiver(post_delete, sender=WorkingHours)
+def directory_model_changed(sender, **kwargs):
+    invalidate_directory()
+
+
+@receiver(m2m_changed, sender=ProfessionalProfile.specializations.through)
+def directory_specializations_changed(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # Después del clear ya no se sabe qué perfiles tenían la especialidad
+        instance._search_profile_ids = list(instance.professionalprofile_set.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    invalidate_directory()
+
+    if not reverse:
+        update_search_vector(instance)
+    elif pk_set:
+        update_search_vectors(ProfessionalProfile.objects.filter(pk__in=pk_set))
+    else:
+        update_search_vectors(ProfessionalProfile.objects.filter(pk__in=instance._search_profile_ids))
+
+
+@receiver(post_save, sender=Specialization)
+def specialization_renamed(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(instance.professionalprofile_set.all())
+
+
+@receiver(pre_delete, sender=Specialization)
+def specialization_deleting(sender, instance, **kwargs):
+    instance._search_profile_ids = list(instance.professionalprofile_set.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Specialization)
+def specialization_deleted(sender, instance, **kwargs):
+    update_search_vectors(ProfessionalProfile.objects.filter(pk__in=instance._search_profile_ids))
+
+
+@receiver(post_save, sender=User)
+def directory_user_changed(sender, instance, update_fields=None, **kwargs):
+    # Ignorar guardados parciales que no tocan el nombre (ej: last_login al iniciar sesión)
+    if update_fields is not None and not USER_DIRECTORY_FIELDS & set(update_fields):
+        return
+    if instance.user_type == 'professional':
+        invalidate_directory()
+
+        # Los perfiles solo existen en los esquemas de las clínicas
+        if connection.schema_name == get_public_schema_name():
+            return
+        profile = ProfessionalProfile.objects.filter(user=instance).first()
+        if profile:
+            update_search_vector(profile)
@@ -1,3 +1,118 @@
-from django.test import TestCase
+# apps/professionals/tests.py
 
-# Create your tests here.
+from datetime import date, time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django_tenants.test.cases import TenantTestCase
+
+from apps.appointments.models import Appointment
+
+from .models import ProfessionalProfile, Review
+
+User = get_user_model()
+
+
+class RatingAggregateTests(TenantTestCase):
+    @classmethod
+    def setup_tenant(cls, tenant):
+        tenant.name = 'Clínica de pruebas'
+
+    def setUp(self):
+        psychologist = User.objects.create_user(
+            'psicologo@test.com', 'clave-segura-123', user_type='professional',
+            first_name='Ana', last_name='Pérez'
+        )
+        self.patient = User.objects.create_user(
+            'paciente@test.com', 'clave-segura-123', user_type='patient',
+            first_name='Luis', last_name='Rojas'
+        )
+        self.profile = ProfessionalProfile.objects.create(
+            user=psychologist,
+            license_number='LP-0001',
+            bio='Terapia cognitivo-conductual',
+            education='Licenciatura en Psicología',
+            experience_years=5,
+            consultation_fee=Decimal('150.00')
+        )
+        self.next_hour = 8
+
+    def review(self, rating):
+        self.next_hour += 1
+        appointment = Appointment.objects.create(
+            patient=self.patient,
+            psychologist=self.profile.user,
+            appointment_date=date(2025, 3, 3),
+            start_time=time(self.next_hour),
+            end_time=time(self.next_hour + 1),
+            status='completed'
+        )
+        return Review.objects.create(
+            professional=self.profile, patient=self.patient, appointment=appointment, rating=rating
+        )
+
+    def assertAggregates(self, histogram, average):
+        profile = ProfessionalProfile.objects.get(pk=self.profile.pk)
+        expected = {rating: histogram.get(rating, 0) for rating in range(1, 6)}
+        self.assertEqual(profile.rating_histogram, expected)
+        self.assertEqual(profile.total_reviews, sum(expected.values()))
+        self.assertEqual(profile.rating_sum, sum(rating * count for rating, count in expected.items()))
+        self.assertEqual(profile.average_rating, Decimal(average))
+
+    def test_create_change_and_delete(self):
+        review = self.review(5)
+        self.review(4)
+        self.review(4)
+        self.assertAggregates({5: 1, 4: 2}, '4.33')
+
+        review.rating = 1
+        review.save()
+        self.assertAggregates({1: 1, 4: 2}, '3.00')
+
+        review.delete()
+        self.assertAggregates({4: 2}, '4.00')
+
+    def test_reviews_loaded_from_the_database(self):
+        # Como en las vistas: la reseña se lee de nuevo antes de editarla o borrarla
+        self.review(5)
+        pk = self.review(4).pk
+
+        review = Review.objects.get(pk=pk)
+        review.save()
+        self.assertAggregates({5: 1, 4: 1}, '4.50')
+
+        review = Review.objects.get(pk=pk)
+        review.rating = 2
+        review.save()
+        self.assertAggregates({5: 1, 2: 1}, '3.50')
+
+        Review.objects.get(pk=pk).delete()
+        self.assertAggregates({5: 1}, '5.00')
+
+    def test_deleting_the_last_review_resets_the_average(self):
+        self.review(3).delete()
+        self.assertAggregates({}, '0.00')
+
+    def test_full_profile_save_keeps_the_aggregates(self):
+        # self.profile se leyó antes de las reseñas: sus agregados en memoria están vacíos
+        self.review(5)
+        self.review(2)
+        self.profile.bio = 'Terapia de pareja'
+        self.profile.save()
+
+        self.assertAggregates({5: 1, 2: 1}, '3.50')
+        self.assertEqual(ProfessionalProfile.objects.get(pk=self.profile.pk).bio, 'Terapia de pareja')
+
+    def test_update_rating_matches_incremental_aggregates(self):
+        for rating in (5, 3, 3, 1):
+            self.review(rating)
+        incremental = ProfessionalProfile.objects.get(pk=self.profile.pk)
+
+        # Desvío a propósito: update_rating lo repara desde las reseñas
+        ProfessionalProfile.objects.filter(pk=self.profile.pk).update(rating_sum=0, rating_3_count=9)
+        rebuilt = ProfessionalProfile.objects.get(pk=self.profile.pk)
+        rebuilt.update_rating()
+
+        self.assertAggregates({5: 1, 3: 2, 1: 1}, '3.00')
+        self.assertEqual(rebuilt.rating_histogram, incremental.rating_histogram)
+        self.assertEqual(rebuilt.average_rating, incremental.average_rating)
@@ -5,7 +5,6 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
-from django.db.models import Q
 from .models import ProfessionalProfile, Specialization, Review
 from .serializers import (
     ProfessionalProfileSerializer,
@@ -15,6 +14,8 @@ from .serializers import (
     ReviewSerializer
 )
 from apps.appointments.models import Appointment
+from . import cache as directory_cache
+from .search import search_profiles
 
 User = get_user_model()
 
@@ -127,13 +128,25 @@ def list_professionals(request):
     """
     CU-08: Buscar y Filtrar Profesionales
     """
+    # Respuesta cacheada por tenant y filtros normalizados (ver apps.professionals.cache)
+    filters = directory_cache.filter_params(request.query_params)
+    data = directory_cache.get_or_compute(
+        'list',
+        directory_cache.normalize_params(filters),
+        lambda: _build_professional_list(filters)
+    )
+    return Response(data, status=status.HTTP_200_OK)
+
+
+def _build_professional_list(filters):
+    """Resultado de list_professionals sin caché"""
     # Filtros disponibles
-    specialization = request.query_params.get('specialization')
-    city = request.query_params.get('city')
-    max_fee = request.query_params.get('max_fee')
-    min_rating = request.query_params.get('min_rating')
-    accepts_online = request.query_params.get('accepts_online')
-    search = request.query_params.get('search')
+    specialization = filters.get('specialization')
+    city = filters.get('city')
+    max_fee = filters.get('max_fee')
+    min_rating = filters.get('min_rating')
+    accepts_online = filters.get('accepts_online')
+    search = filters.get('search')
     
     # Query base: solo perfiles activos (quitamos is_verified para testing)
     profiles = ProfessionalProfile.objects.filter(
@@ -164,16 +177,18 @@ def list_professionals(request):
         profiles = profiles.filter(accepts_online_sessions=True)
     
     if search:
-        profiles = profiles.filter(
-            Q(user__first_name__icontains=search) |
-            Q(user__last_name__icontains=search)
-        )
+        # Texto completo sobre nombre, especialidades, ciudad y bio, por relevancia
+        profiles = search_profiles(profiles, search)
     
-    serializer = ProfessionalPublicSerializer(profiles, many=True)
-    return Response({
-        'count': profiles.count(),
-        'professionals': serializer.data
-    }, status=status.HTTP_200_OK)
+    # Relaciones que muestra ProfessionalPublicSerializer
+    profiles = profiles.select_related('user').prefetch_related('specializations', 'working_hours')
+    
+    professionals = ProfessionalPublicSerializer(profiles, many=True).data
+    return {
+        'count': len(professionals),
+        'professionals': professionals
+    }
+
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
@@ -183,16 +198,19 @@ def professional_public_detail(request, professional_id):
     Vista pública de un psicólogo específico
     """
     try:
-        profile = get_object_or_404(
-            ProfessionalProfile.objects.filter(
-                is_active=True,
-                profile_completed=True
-            ),
-            id=professional_id
-        )
+        def build_detail():
+            profile = get_object_or_404(
+                ProfessionalProfile.objects.filter(
+                    is_active=True,
+                    profile_completed=True
+                ).select_related('user').prefetch_related('specializations', 'working_hours'),
+                id=professional_id
+            )
+            return ProfessionalPublicSerializer(profile).data
         
-        serializer = ProfessionalPublicSerializer(profile)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Los 404 no se cachean (get_object_or_404 lanza la excepción)
+        data = directory_cache.get_or_compute('detail', str(professional_id), build_detail)
+        return Response(data, status=status.HTTP_200_OK)
         
     except ProfessionalProfile.DoesNotExist:
         return Response({
@@ -262,8 +280,9 @@ def professional_reviews(request, professional_id):
         serializer = ReviewSerializer(reviews, many=True)
         return Response({
             'professional_id': professional_id,
-            'total_reviews': reviews.count(),
+            'total_reviews': professional.total_reviews,
             'average_rating': professional.average_rating,
+            'rating_histogram': professional.rating_histogram,
             'reviews': serializer.data
         }, status=status.HTTP_200_OK)
         
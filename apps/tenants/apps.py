@@ -5,4 +5,7 @@ from django.apps import AppConfig
 class TenantsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.tenants'
-    verbose_name = 'Gestión de Clínicas'
\ No newline at end of file
+    verbose_name = 'Gestión de Clínicas'
+    def ready(self):
+        # Invalidación de las estadísticas globales cacheadas
+        from . import signals  # noqa: F401
@@ -0,0 +1,98 @@
+# apps/tenants/fanout.py
+
+"""
+Ejecución de una función en varias clínicas en paralelo.
+
+run_for_tenants(func, tenants, workers) llama a func(tenant) dentro del
+schema_context de cada clínica usando un pool de hilos acotado. Django abre una
+conexión por hilo, así que cada worker trabaja con su propia conexión y su
+propio schema; la conexión se cierra al terminar cada clínica. Las excepciones
+no detienen al resto: quedan en el TenantResult de su clínica.
+
+Los resultados se devuelven en el mismo orden que `tenants`, para que los
+comandos impriman su salida igual que cuando recorrían las clínicas una a una.
+"""
+
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import connection
+from django_tenants.utils import get_public_schema_name, schema_context
+
+from .models import Clinic
+
+DEFAULT_WORKERS = 4
+
+
+class TenantResult:
+    """Resultado de ejecutar la función en una clínica"""
+
+    def __init__(self, tenant, value=None, error=None, traceback=None, elapsed=0.0):
+        self.tenant = tenant
+        self.value = value
+        self.error = error
+        self.traceback = traceback
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = 'ok' if self.ok else f'error={self.error!r}'
+        return f'<TenantResult {self.tenant.schema_name} {status} {self.elapsed:.2f}s>'
+
+
+def get_tenants(schema_name=None):
+    """Clínicas reales (sin el schema público), o solo la indicada"""
+    tenants = Clinic.objects.exclude(schema_name=get_public_schema_name()).order_by('id')
+    if schema_name:
+        tenants = tenants.filter(schema_name=schema_name)
+    return list(tenants)
+
+
+def add_workers_argument(parser):
+    """Opción --workers común a los comandos que recorren clínicas"""
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Clínicas procesadas en paralelo (default: {DEFAULT_WORKERS}; 1 = secuencial)'
+    )
+
+
+def _run_one(func, tenant, close_connection):
+    start = time.monotonic()
+    try:
+        with schema_context(tenant.schema_name):
+            value = func(tenant)
+        return TenantResult(tenant, value=value, elapsed=time.monotonic() - start)
+    except Exception as e:
+        return TenantResult(
+            tenant,
+            error=e,
+            traceback=traceback.format_exc(),
+            elapsed=time.monotonic() - start
+        )
+    finally:
+        if close_connection:
+            # Conexión propia del hilo worker: no dejarla abierta al terminar
+            connection.close()
+
+
+def run_for_tenants(func, tenants=None, workers=DEFAULT_WORKERS):
+    """
+    Ejecuta func(tenant) en cada clínica y devuelve una lista de TenantResult
+    en el orden de `tenants` (por defecto, todas las clínicas reales).
+    Con workers=1 se ejecuta en el hilo actual, sin pool.
+    """
+    tenants = get_tenants() if tenants is None else list(tenants)
+    workers = max(1, min(workers or 1, len(tenants) or 1))
+
+    if workers == 1:
+        return [_run_one(func, tenant, close_connection=False) for tenant in tenants]
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tenant-fanout') as executor:
+        futures = [executor.submit(_run_one, func, tenant, True) for tenant in tenants]
+        return [future.result() for future in futures]
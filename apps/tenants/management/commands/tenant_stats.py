@@ -0,0 +1,46 @@
+# apps/tenants/management/commands/tenant_stats.py
+
+"""
+Comando para ver (y recalcular) las estadísticas globales de las clínicas que
+muestran global_admin_stats y el admin público.
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.tenants.stats import TTL_SECONDS, get_global_stats
+
+
+class Command(BaseCommand):
+    help = 'Muestra las estadísticas globales de clínicas (cacheadas o recalculadas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--refresh',
+            action='store_true',
+            help='Recalcular ignorando la caché',
+        )
+
+    def handle(self, *args, **options):
+        stats = get_global_stats(refresh=options['refresh'])
+
+        self.stdout.write(self.style.SUCCESS('📊 Estadísticas globales de clínicas'))
+        self.stdout.write('=' * 60)
+        self.stdout.write(f'🕐 Calculadas: {stats["generated_at"]:%d/%m/%Y %H:%M:%S} (caché de {TTL_SECONDS}s)')
+        self.stdout.write(
+            f'🏥 Clínicas: {stats["total_clinics"]} | '
+            f'🌐 Dominios: {stats["active_domains"]}/{stats["total_domains"]} activos'
+        )
+        self.stdout.write(
+            f'👥 Usuarios: {stats["total_users_global"]} '
+            f'({stats["total_patients"]} pacientes, {stats["total_professionals"]} profesionales, '
+            f'{stats["total_admins"]} admins)\n'
+        )
+
+        for clinic in stats['clinics']:
+            if 'error' in clinic:
+                self.stdout.write(self.style.ERROR(f'❌ {clinic["name"]} ({clinic["schema_name"]}): {clinic["error"]}'))
+                continue
+            self.stdout.write(
+                f'   • {clinic["name"]} ({clinic["schema_name"]}): {clinic["total_users"]} usuarios '
+                f'- {clinic["primary_domain"] or "sin dominio"}'
+            )
@@ -1,62 +1,90 @@
 # apps/tenants/management/commands/verify_clinic_data.py
 
 from django.core.management.base import BaseCommand
+from django.db.models import Count, Q
+
+from apps.tenants.fanout import add_workers_argument, get_tenants, run_for_tenants
 
 
 class Command(BaseCommand):
-    help = 'Verifica los datos en el esquema de una clínica específica'
+    help = 'Verifica los datos en el esquema de una clínica específica (o de todas)'
 
     def add_arguments(self, parser):
-        parser.add_argument('--schema', type=str, default='bienestar', help='Esquema de la clínica a verificar')
+        parser.add_argument('--schema', type=str, default=None, help='Esquema de la clínica a verificar (default: todas)')
+        add_workers_argument(parser)
 
     def handle(self, *args, **options):
         schema = options['schema']
-        self.stdout.write(self.style.SUCCESS(f'=== Verificación de Datos - Clínica ({schema}) ===\n'))
-        
-        # Importar modelos después de configurar el esquema
-        from apps.users.models import CustomUser
-        from apps.professionals.models import ProfessionalProfile, Specialization
-        from apps.appointments.models import Appointment, PsychologistAvailability
-        
-        # Verificar usuarios
-        total_users = CustomUser.objects.count()
-        patients = CustomUser.objects.filter(user_type='patient').count()
-        professionals = CustomUser.objects.filter(user_type='professional').count()
-        
-        self.stdout.write(f'👥 Total usuarios: {total_users}')
-        self.stdout.write(f'   • Pacientes: {patients}')
-        self.stdout.write(f'   • Profesionales: {professionals}')
-        
-        # Verificar profesionales
-        professional_profiles = ProfessionalProfile.objects.count()
-        self.stdout.write(f'\n👨‍⚕️ Perfiles profesionales: {professional_profiles}')
-        
-        # Verificar especializaciones
-        specializations = Specialization.objects.count()
-        self.stdout.write(f'🎓 Especializaciones: {specializations}')
-        
-        # Verificar citas
-        appointments = Appointment.objects.count()
-        pending_appointments = Appointment.objects.filter(status='pending').count()
-        confirmed_appointments = Appointment.objects.filter(status='confirmed').count()
-        completed_appointments = Appointment.objects.filter(status='completed').count()
-        
-        self.stdout.write(f'\n📅 Total citas: {appointments}')
-        self.stdout.write(f'   • Pendientes: {pending_appointments}')
-        self.stdout.write(f'   • Confirmadas: {confirmed_appointments}')
-        self.stdout.write(f'   • Completadas: {completed_appointments}')
-        
-        # Verificar disponibilidad
-        availability_slots = PsychologistAvailability.objects.count()
-        self.stdout.write(f'⏰ Slots de disponibilidad: {availability_slots}')
-        
-        # Mostrar algunos ejemplos
-        if patients > 0:
-            sample_patient = CustomUser.objects.filter(user_type='patient').first()
-            self.stdout.write(f'\n👤 Paciente de ejemplo: {sample_patient.get_full_name()} ({sample_patient.email})')
-        
-        if professionals > 0:
-            sample_professional = CustomUser.objects.filter(user_type='professional').first()
-            self.stdout.write(f'👨‍⚕️ Profesional de ejemplo: {sample_professional.get_full_name()} ({sample_professional.email})')
-        
-        self.stdout.write(self.style.SUCCESS(f'\n🎉 Verificación de la clínica "{schema}" completada!'))
\ No newline at end of file
+        tenants = get_tenants(schema)
+        if schema and not tenants:
+            self.stdout.write(self.style.ERROR(f'❌ Clínica con esquema "{schema}" no encontrada'))
+            return
+
+        # Cada clínica se verifica en su propio schema, en paralelo
+        for result in run_for_tenants(collect_clinic_data, tenants, workers=options['workers']):
+            tenant = result.tenant
+            self.stdout.write(self.style.SUCCESS(f'\n=== Verificación de Datos - {tenant.name} ({tenant.schema_name}) ===\n'))
+
+            if not result.ok:
+                self.stdout.write(self.style.ERROR(f'❌ Error verificando la clínica: {result.error}'))
+                continue
+
+            data = result.value
+            self.stdout.write(f'👥 Total usuarios: {data["total_users"]}')
+            self.stdout.write(f'   • Pacientes: {data["patients"]}')
+            self.stdout.write(f'   • Profesionales: {data["professionals"]}')
+
+            self.stdout.write(f'\n👨‍⚕️ Perfiles profesionales: {data["professional_profiles"]}')
+            self.stdout.write(f'🎓 Especializaciones: {data["specializations"]}')
+
+            self.stdout.write(f'\n📅 Total citas: {data["appointments"]}')
+            self.stdout.write(f'   • Pendientes: {data["pending_appointments"]}')
+            self.stdout.write(f'   • Confirmadas: {data["confirmed_appointments"]}')
+            self.stdout.write(f'   • Completadas: {data["completed_appointments"]}')
+
+            self.stdout.write(f'⏰ Slots de disponibilidad: {data["availability_slots"]}')
+
+            # Mostrar algunos ejemplos
+            if data['sample_patient']:
+                self.stdout.write(f'\n👤 Paciente de ejemplo: {data["sample_patient"]}')
+            if data['sample_professional']:
+                self.stdout.write(f'👨‍⚕️ Profesional de ejemplo: {data["sample_professional"]}')
+
+            self.stdout.write(self.style.SUCCESS(
+                f'\n🎉 Verificación de la clínica "{tenant.schema_name}" completada! ({result.elapsed:.2f}s)'
+            ))
+
+
+def collect_clinic_data(tenant):
+    """Conteos de la clínica actual (se ejecuta dentro de su schema)"""
+    # Importar modelos después de configurar el esquema
+    from apps.users.models import CustomUser
+    from apps.professionals.models import ProfessionalProfile, Specialization
+    from apps.appointments.models import Appointment, PsychologistAvailability
+
+    users = CustomUser.objects.aggregate(
+        total_users=Count('id'),
+        patients=Count('id', filter=Q(user_type='patient')),
+        professionals=Count('id', filter=Q(user_type='professional')),
+    )
+    appointments = Appointment.objects.aggregate(
+        appointments=Count('id'),
+        pending_appointments=Count('id', filter=Q(status='pending')),
+        confirmed_appointments=Count('id', filter=Q(status='confirmed')),
+        completed_appointments=Count('id', filter=Q(status='completed')),
+    )
+
+    sample_patient = CustomUser.objects.filter(user_type='patient').first()
+    sample_professional = CustomUser.objects.filter(user_type='professional').first()
+
+    return {
+        **users,
+        **appointments,
+        'professional_profiles': ProfessionalProfile.objects.count(),
+        'specializations': Specialization.objects.count(),
+        'availability_slots': PsychologistAvailability.objects.count(),
+        'sample_patient': f'{sample_patient.get_full_name()} ({sample_patient.email})' if sample_patient else None,
+        'sample_professional': (
+            f'{sample_professional.get_full_name()} ({sample_professional.email})' if sample_professional else None
+        ),
+    }
@@ -2,12 +2,17 @@
 
 from django.core.management.base import BaseCommand
 from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from apps.tenants.fanout import add_workers_argument, get_tenants, run_for_tenants
 from apps.tenants.models import Clinic, Domain
 
 
 class Command(BaseCommand):
     help = 'Verifica que los inquilinos fueron creados correctamente'
 
+    def add_arguments(self, parser):
+        add_workers_argument(parser)
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('=== Verificación de Inquilinos ===\n'))
         
@@ -19,35 +24,56 @@ class Command(BaseCommand):
             self.stdout.write(f'   • {clinic.name} (esquema: {clinic.schema_name})')
         
         # Verificar dominios
-        domains = Domain.objects.all()
+        domains = Domain.objects.select_related('tenant')
         self.stdout.write(f'\n🌐 Total de dominios: {domains.count()}')
         
         for domain in domains:
             primary = "✅ Principal" if domain.is_primary else "❌ Secundario"
             self.stdout.write(f'   • {domain.domain} → {domain.tenant.name} ({primary})')
         
-        # Verificar esquemas en la base de datos
+        # Verificar esquemas en la base de datos (una sola consulta agrupada)
         self.stdout.write('\n📊 Esquemas en PostgreSQL:')
         with connection.cursor() as cursor:
             cursor.execute("""
-                SELECT schema_name 
-                FROM information_schema.schemata 
-                WHERE schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
-                ORDER BY schema_name;
+                SELECT s.schema_name, COUNT(t.table_name)
+                FROM information_schema.schemata s
+                LEFT JOIN information_schema.tables t ON t.table_schema = s.schema_name
+                WHERE s.schema_name NOT IN ('information_schema', 'pg_catalog', 'pg_toast')
+                GROUP BY s.schema_name
+                ORDER BY s.schema_name;
             """)
-            schemas = cursor.fetchall()
-            
-            for schema in schemas:
-                schema_name = schema[0]
+            for schema_name, table_count in cursor.fetchall():
                 self.stdout.write(f'   • {schema_name}')
-                
-                # Contar tablas en cada esquema
-                cursor.execute(f"""
-                    SELECT COUNT(*) 
-                    FROM information_schema.tables 
-                    WHERE table_schema = '{schema_name}';
-                """)
-                table_count = cursor.fetchone()[0]
                 self.stdout.write(f'     └─ {table_count} tablas')
         
-        self.stdout.write(self.style.SUCCESS('\n🎉 Verificación de inquilinos completada!'))
\ No newline at end of file
+        # Verificar cada clínica en su schema (en paralelo)
+        self.stdout.write('\n🔍 Estado de cada clínica:')
+        for result in run_for_tenants(verify_tenant_schema, get_tenants(), workers=options['workers']):
+            tenant = result.tenant
+            if not result.ok:
+                self.stdout.write(self.style.ERROR(f'   ❌ {tenant.name} ({tenant.schema_name}): {result.error}'))
+                continue
+            
+            data = result.value
+            self.stdout.write(f'   • {tenant.name}: {data["users"]} usuarios')
+            if data['pending_migrations']:
+                self.stdout.write(self.style.WARNING(
+                    f'     └─ ⚠️ {len(data["pending_migrations"])} migraciones pendientes '
+                    f'(ej: {data["pending_migrations"][0]})'
+                ))
+            else:
+                self.stdout.write('     └─ ✅ Migraciones al día')
+        
+        self.stdout.write(self.style.SUCCESS('\n🎉 Verificación de inquilinos completada!'))
+
+
+def verify_tenant_schema(tenant):
+    """Usuarios y migraciones pendientes del schema actual"""
+    from apps.users.models import CustomUser
+
+    executor = MigrationExecutor(connection)
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return {
+        'users': CustomUser.objects.count(),
+        'pending_migrations': [f'{migration.app_label}.{migration.name}' for migration, _ in plan],
+    }
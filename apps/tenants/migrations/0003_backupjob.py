@@ -0,0 +1,42 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_publicuser'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('backup', 'Backup'), ('restore', 'Restauración')], max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En ejecución'), ('completed', 'Completado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('options', models.JSONField(blank=True, default=dict, help_text='format, compress, jobs...')),
+                ('requested_by', models.CharField(blank=True, help_text='Email del usuario que lo solicitó', max_length=254)),
+                ('file_path', models.CharField(blank=True, max_length=500)),
+                ('file_name', models.CharField(blank=True, max_length=255)),
+                ('bytes_processed', models.BigIntegerField(default=0)),
+                ('total_bytes', models.BigIntegerField(blank=True, help_text='Estimado para backups', null=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('error', models.TextField(blank=True)),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('clinic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='backup_jobs', to='tenants.clinic')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Backup',
+                'verbose_name_plural': 'Trabajos de Backup',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='backupjob_status_created_idx'), models.Index(fields=['clinic', '-created_at'], name='backupjob_clinic_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 10:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_backupjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='backupjob',
+            name='mode',
+            field=models.CharField(choices=[('full', 'Completo'), ('incremental', 'Incremental'), ('differential', 'Diferencial')], default='full', max_length=12),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='increments', to='tenants.backupjob'),
+        ),
+        migrations.AddField(
+            model_name='backupjob',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, help_text='Momento hasta el que el backup incluye cambios', null=True),
+        ),
+    ]
@@ -100,4 +100,90 @@ class Domain(DomainMixin):
     """
     Este modelo representa los dominios o subdominios asociados a cada clínica.
     """
-    pass
\ No newline at end of file
+    pass
+
+class BackupJob(models.Model):
+    """
+    Trabajo de backup o restauración en segundo plano (apps.backups.jobs).
+
+    Vive en el schema público y no en el de la clínica: una restauración
+    elimina y recrea el schema del tenant, y con él se perdería el propio
+    registro del trabajo.
+    """
+    KIND_CHOICES = [
+        ('backup', 'Backup'),
+        ('restore', 'Restauración'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('running', 'En ejecución'),
+        ('completed', 'Completado'),
+        ('failed', 'Fallido'),
+    ]
+
+    MODE_CHOICES = [
+        ('full', 'Completo'),
+        ('incremental', 'Incremental'),
+        ('differential', 'Diferencial'),
+    ]
+
+    clinic = models.ForeignKey(Clinic, on_delete=models.CASCADE, related_name='backup_jobs')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    mode = models.CharField(max_length=12, choices=MODE_CHOICES, default='full')
+    # Backup sobre el que se calcula un incremental/diferencial (cadena hasta el completo)
+    parent = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='increments'
+    )
+    snapshot_at = models.DateTimeField(
+        null=True, blank=True, help_text="Momento hasta el que el backup incluye cambios"
+    )
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    options = models.JSONField(default=dict, blank=True, help_text="format, compress, jobs...")
+    requested_by = models.CharField(max_length=254, blank=True, help_text="Email del usuario que lo solicitó")
+
+    # Archivos en disco (BACKUP_ROOT): el backup generado o el archivo a restaurar
+    file_path = models.CharField(max_length=500, blank=True)
+    file_name = models.CharField(max_length=255, blank=True)
+
+    # Progreso
+    bytes_processed = models.BigIntegerField(default=0)
+    total_bytes = models.BigIntegerField(null=True, blank=True, help_text="Estimado para backups")
+    result = models.JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True)
+
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Trabajo de Backup'
+        verbose_name_plural = 'Trabajos de Backup'
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='backupjob_status_created_idx'),
+            models.Index(fields=['clinic', '-created_at'], name='backupjob_clinic_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} de {self.clinic} ({self.get_status_display()})"
+
+    def chain(self):
+        """Backups a restaurar en orden: el completo y luego cada incremento hasta este"""
+        chain = [self]
+        while chain[-1].mode != 'full':
+            parent = chain[-1].parent
+            if parent is None:
+                raise ValueError(f'El backup #{chain[-1].pk} no tiene backup base')
+            chain.append(parent)
+        return chain[::-1]
+
+    @property
+    def progress(self):
+        """Porcentaje completado (None si no se conoce el total)"""
+        if self.status == 'completed':
+            return 100.0
+        if not self.total_bytes:
+            return None
+        return round(min(self.bytes_processed / self.total_bytes, 1) * 100, 1)
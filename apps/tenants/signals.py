@@ -0,0 +1,20 @@
+# apps/tenants/signals.py
+
+"""
+Invalida las estadísticas globales cacheadas cuando se crean, modifican o
+eliminan clínicas o dominios.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Clinic, Domain
+from .stats import invalidate_global_stats
+
+
+@receiver(post_save, sender=Clinic)
+@receiver(post_delete, sender=Clinic)
+@receiver(post_save, sender=Domain)
+@receiver(post_delete, sender=Domain)
+def clinics_changed(sender, **kwargs):
+    invalidate_global_stats()
@@ -0,0 +1,151 @@
+# apps/tenants/stats.py
+
+"""
+Estadísticas globales de las clínicas para el admin público.
+
+En lugar de entrar a cada schema y hacer varios COUNT por clínica, los conteos
+de usuarios de todos los tenants se obtienen con una sola consulta UNION ALL
+sobre las tablas `<schema>.users`, con agregados condicionales por tipo de
+usuario. El resultado se guarda en caché TTL_SECONDS segundos; `refresh=True`
+(o `?refresh=1` en las vistas) lo recalcula.
+"""
+
+import logging
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_tenants.utils import get_public_schema_name
+
+from apps.users.models import CustomUser
+
+from .models import Clinic, Domain
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'tenant_stats:global'
+TTL_SECONDS = 300
+
+USER_COUNT_FIELDS = ['total_users', 'patients', 'professionals', 'admins']
+
+
+def _existing_user_tables(schema_names):
+    """Schemas que ya tienen la tabla de usuarios (un tenant a medio migrar no la tiene)"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT table_schema FROM information_schema.tables '
+            'WHERE table_name = %s AND table_schema = ANY(%s)',
+            [CustomUser._meta.db_table, list(schema_names)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def collect_user_counts(schema_names):
+    """
+    Conteos de usuarios por schema en una sola consulta:
+    {schema_name: {'total_users', 'patients', 'professionals', 'admins'}}
+    """
+    schema_names = _existing_user_tables(schema_names) if schema_names else set()
+    if not schema_names:
+        return {}
+
+    table = connection.ops.quote_name(CustomUser._meta.db_table)
+    selects = []
+    params = []
+    for schema_name in sorted(schema_names):
+        selects.append(
+            'SELECT %s, count(*), '
+            "count(*) FILTER (WHERE user_type = 'patient'), "
+            "count(*) FILTER (WHERE user_type = 'professional'), "
+            "count(*) FILTER (WHERE user_type = 'admin') "
+            f'FROM {connection.ops.quote_name(schema_name)}.{table}'
+        )
+        params.append(schema_name)
+
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(selects), params)
+        return {
+            row[0]: dict(zip(USER_COUNT_FIELDS, row[1:]))
+            for row in cursor.fetchall()
+        }
+
+
+def compute_global_stats():
+    """Estadísticas de todas las clínicas reales (sin el schema público)"""
+    public_schema = get_public_schema_name()
+    clinics = list(Clinic.objects.exclude(schema_name=public_schema).order_by('id'))
+
+    domain_totals = Domain.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(tenant__isnull=False))
+    )
+    domains_by_clinic = {}
+    for domain in Domain.objects.filter(tenant__in=clinics).order_by('-is_primary', 'id'):
+        domains_by_clinic.setdefault(domain.tenant_id, []).append(domain)
+
+    user_counts = collect_user_counts([clinic.schema_name for clinic in clinics])
+
+    clinic_stats = []
+    totals = dict.fromkeys(USER_COUNT_FIELDS, 0)
+    for clinic in clinics:
+        domains = domains_by_clinic.get(clinic.id, [])
+        primary_domain = next((domain.domain for domain in domains if domain.is_primary), None)
+        counts = user_counts.get(clinic.schema_name)
+
+        clinic_data = {
+            'id': clinic.id,
+            'name': clinic.name,
+            'schema_name': clinic.schema_name,
+            'created_on': clinic.created_on,
+            **(counts or dict.fromkeys(USER_COUNT_FIELDS, 0)),
+            'domains': [domain.domain for domain in domains],
+            'primary_domain': primary_domain,
+        }
+        if counts is None:
+            clinic_data['error'] = 'El schema no tiene tabla de usuarios'
+        else:
+            for field in USER_COUNT_FIELDS:
+                totals[field] += counts[field]
+
+        clinic_stats.append(clinic_data)
+
+    return {
+        'total_clinics': len(clinics),
+        'total_domains': domain_totals['total'],
+        'active_domains': domain_totals['active'],
+        'total_users_global': totals['total_users'],
+        'total_patients': totals['patients'],
+        'total_professionals': totals['professionals'],
+        'total_admins': totals['admins'],
+        'clinics': clinic_stats,
+        'generated_at': timezone.now(),
+    }
+
+
+def get_global_stats(refresh=False):
+    """Estadísticas globales desde la caché, o recalculadas si expiraron o se pide refresh"""
+    if not refresh:
+        stats = cache.get(CACHE_KEY)
+        if stats is not None:
+            return stats
+
+    stats = compute_global_stats()
+    cache.set(CACHE_KEY, stats, TTL_SECONDS)
+    logger.info(f"Estadísticas globales recalculadas: {stats['total_clinics']} clínicas")
+    return stats
+
+
+def get_clinic_stats(clinic, refresh=False):
+    """Estadísticas cacheadas de una clínica (para listados del admin)"""
+    for clinic_data in get_global_stats(refresh)['clinics']:
+        if clinic_data['id'] == clinic.id:
+            return clinic_data
+    if not refresh:
+        # Clínica creada después del último cálculo
+        return get_clinic_stats(clinic, refresh=True)
+    return None
+
+
+def invalidate_global_stats():
+    cache.delete(CACHE_KEY)
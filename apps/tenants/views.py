@@ -7,6 +7,7 @@ from rest_framework.permissions import IsAuthenticated
 from django_tenants.utils import tenant_context, schema_context
 from .models import Clinic, Domain
 from .serializers import ClinicSerializer, ClinicCreateSerializer
+from .stats import get_global_stats
 import logging
 
 logger = logging.getLogger(__name__)
@@ -98,83 +99,28 @@ def global_admin_stats(request):
         )
     
     try:
-        # Obtener todas las clínicas REALES (excluyendo el schema público)
-        all_clinics = Clinic.objects.exclude(schema_name='public')
-        total_clinics = all_clinics.count()
+        # Conteos de todas las clínicas en una sola consulta, cacheados (ver apps.tenants.stats)
+        refresh = request.query_params.get('refresh') in ('1', 'true')
+        stats = get_global_stats(refresh=refresh)
         
-        # Obtener todos los dominios (incluyendo public para conteo total)
-        total_domains = Domain.objects.count()
-        active_domains = Domain.objects.filter(tenant__isnull=False).count()
-        
-        # Inicializar contadores globales SOLO para clínicas reales
-        total_users_global = 0
         clinic_stats = []
-        
-        # Procesar cada clínica REAL para obtener estadísticas de usuarios
-        for clinic in all_clinics:
-            try:
-                with schema_context(clinic.schema_name):
-                    # Importar CustomUser dentro del contexto del schema
-                    from apps.users.models import CustomUser
-                    
-                    # Contar usuarios en este tenant
-                    total_users = CustomUser.objects.count()
-                    patients = CustomUser.objects.filter(user_type='patient').count()
-                    professionals = CustomUser.objects.filter(user_type='professional').count()
-                    admins = CustomUser.objects.filter(user_type='admin').count()
-                    
-                # Fuera del contexto del schema, obtener dominios
-                clinic_domains = Domain.objects.filter(tenant=clinic)
-                domains_list = [domain.domain for domain in clinic_domains]
-                primary_domain = clinic_domains.filter(is_primary=True).first()
-                
-                clinic_data = {
-                    'id': clinic.id,
-                    'name': clinic.name,
-                    'schema_name': clinic.schema_name,
-                    'created_on': clinic.created_on,
-                    'total_users': total_users,
-                    'patients': patients,
-                    'professionals': professionals,
-                    'admins': admins,
-                    'domains': domains_list,
-                    'primary_domain': primary_domain.domain if primary_domain else None,
-                    'admin_url': f"http://{primary_domain.domain}:8000/admin/" if primary_domain else None,
-                    'frontend_url': f"http://{primary_domain.domain}:3000" if primary_domain else None
-                }
-                
-                clinic_stats.append(clinic_data)
-                total_users_global += total_users
-                
-                logger.info(f"Estadísticas obtenidas para {clinic.name}: {total_users} usuarios")
-                
-            except Exception as e:
-                logger.error(f"Error obteniendo estadísticas para {clinic.name}: {str(e)}")
-                # Agregar clínica con datos de error
-                clinic_stats.append({
-                    'id': clinic.id,
-                    'name': clinic.name,
-                    'schema_name': clinic.schema_name,
-                    'created_on': clinic.created_on,
-                    'total_users': 0,
-                    'patients': 0,
-                    'professionals': 0,
-                    'admins': 0,
-                    'domains': [],
-                    'primary_domain': None,
-                    'admin_url': None,
-                    'frontend_url': None,
-                    'error': f"Error: {str(e)}"
-                })
+        for clinic_data in stats['clinics']:
+            primary_domain = clinic_data['primary_domain']
+            clinic_stats.append({
+                **clinic_data,
+                'admin_url': f"http://{primary_domain}:8000/admin/" if primary_domain else None,
+                'frontend_url': f"http://{primary_domain}:3000" if primary_domain else None
+            })
         
         # Preparar respuesta con estadísticas globales
         response_data = {
             'system_status': 'active',
-            'total_clinics': total_clinics,
-            'total_domains': total_domains,
-            'active_domains': active_domains,
-            'total_users_global': total_users_global,
+            'total_clinics': stats['total_clinics'],
+            'total_domains': stats['total_domains'],
+            'active_domains': stats['active_domains'],
+            'total_users_global': stats['total_users_global'],
             'clinics': clinic_stats,
+            'generated_at': stats['generated_at'],
             'last_updated': request.tenant.created_on if hasattr(request.tenant, 'created_on') else None
         }
         
@@ -3,8 +3,11 @@
 Repoblación completa con datos realistas y citas
 """
 
+import argparse
 import os
 import sys
+import threading
+import zlib
 import django
 from faker import Faker
 import random
@@ -16,14 +19,34 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from django_tenants.utils import schema_context
-from apps.tenants.models import Clinic
+from apps.tenants.fanout import DEFAULT_WORKERS, get_tenants, run_for_tenants
 from apps.users.models import CustomUser, PatientProfile
 from apps.professionals.models import ProfessionalProfile, Specialization, WorkingHours
 from apps.appointments.models import Appointment, PsychologistAvailability
 
+class ThreadFaker(threading.local):
+    """
+    Faker en español con una instancia por hilo: las clínicas se pueblan en
+    paralelo y fake.unique no debe compartirse entre ellas.
+    """
+    def __init__(self):
+        self._faker = Faker('es_ES')
+
+    def seed_for(self, schema_name):
+        """
+        Semilla propia de cada clínica: los datos no dependen de qué hilo la
+        pueble ni de cuántas clínicas pasaron antes por ese hilo
+        """
+        # crc32 y no hash(): hash() de un str cambia en cada ejecución
+        self._faker.seed_instance(zlib.crc32(schema_name.encode('utf-8')))
+        self._faker.unique.clear()
+
+    def __getattr__(self, name):
+        return getattr(self._faker, name)
+
+
 # Configurar Faker en español
-fake = Faker('es_ES')
-Faker.seed(42)
+fake = ThreadFaker()
 
 def normalize_text(text):
     """Normalizar texto para emails y usernames"""
@@ -204,8 +227,7 @@ def create_professionals(clinic_name, specializations, count=5):
                 psychologist=professional,
                 weekday=day,
                 start_time=time(start_hour),
-                end_time=time(end_hour),
-                blocked_dates=[]  # Sin fechas bloqueadas inicialmente
+                end_time=time(end_hour)
             )
         
         professionals.append(professional)
@@ -265,8 +287,8 @@ def populate_clinic(clinic):
     """Poblar una clínica completa con todos los datos"""
     print(f"\n🏥 Poblando {clinic.name} ({clinic.schema_name})")
     
-    # Limpiar datos únicos de Faker para esta clínica
-    fake.unique.clear()
+    # Semilla y datos únicos de Faker propios de esta clínica
+    fake.seed_for(clinic.schema_name)
     
     with schema_context(clinic.schema_name):
         # 1. Crear administrador
@@ -319,11 +341,20 @@ def populate_clinic(clinic):
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(description='Repoblación completa de las clínicas')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'Clínicas pobladas en paralelo (default: {DEFAULT_WORKERS}; 1 = secuencial)'
+    )
+    args = parser.parse_args()
+    
     print("🚀 REPOBLACIÓN COMPLETA CON DATOS REALISTAS")
     print("=" * 50)
     
     # Obtener clínicas reales
-    clinics = Clinic.objects.exclude(schema_name='public')
+    clinics = get_tenants()
     
     total_stats = {
         'users': 0,
@@ -334,18 +365,21 @@ def main():
         'specializations': 0
     }
     
-    # Poblar cada clínica
-    for clinic in clinics:
-        stats = populate_clinic(clinic)
+    # Poblar las clínicas en paralelo, cada una en su schema y con su conexión
+    for result in run_for_tenants(populate_clinic, clinics, workers=args.workers):
+        if not result.ok:
+            print(f"❌ Error poblando {result.tenant.name}: {result.error}")
+            print(result.traceback)
+            continue
         
         # Sumar estadísticas globales
         for key in total_stats:
-            total_stats[key] += stats.get(key, 0)
+            total_stats[key] += result.value.get(key, 0)
     
     # Resumen final
     print(f"\n📊 ESTADÍSTICAS GLOBALES:")
     print("=" * 30)
-    print(f"🏥 Clínicas pobladas: {clinics.count()}")
+    print(f"🏥 Clínicas pobladas: {len(clinics)}")
     print(f"👥 Total usuarios: {total_stats['users']}")
     print(f"   - Pacientes: {total_stats['patients']}")
     print(f"   - Profesionales: {total_stats['professionals']}")
@@ -24,41 +24,20 @@ class PublicAdminSite(admin.AdminSite):
         extra_context = extra_context or {}
         
         try:
-            from django_tenants.utils import schema_context
-            from apps.users.models import CustomUser
+            from apps.tenants.stats import get_global_stats
             
-            # Obtener estadísticas de clínicas reales (excluyendo public)
-            real_clinics = Clinic.objects.exclude(schema_name='public')
-            total_clinics = real_clinics.count()
-            total_domains = Domain.objects.count()
-            active_domains = Domain.objects.filter(tenant__isnull=False).count()
-            
-            # Calcular usuarios totales de todas las clínicas reales
-            total_users_real_clinics = 0
-            total_patients = 0
-            total_professionals = 0
-            
-            for clinic in real_clinics:
-                try:
-                    with schema_context(clinic.schema_name):
-                        clinic_users = CustomUser.objects.count()
-                        clinic_patients = CustomUser.objects.filter(user_type='patient').count()
-                        clinic_professionals = CustomUser.objects.filter(user_type='professional').count()
-                        
-                        total_users_real_clinics += clinic_users
-                        total_patients += clinic_patients
-                        total_professionals += clinic_professionals
-                except Exception:
-                    pass
+            # Estadísticas cacheadas de todas las clínicas; ?refresh=1 las recalcula
+            stats = get_global_stats(refresh=request.GET.get('refresh') == '1')
             
             # Agregar estadísticas al contexto
             extra_context.update({
-                'total_clinics': total_clinics,
-                'total_domains': total_domains,
-                'active_domains': active_domains,
-                'total_users_real_clinics': total_users_real_clinics,
-                'total_patients': total_patients,
-                'total_professionals': total_professionals,
+                'total_clinics': stats['total_clinics'],
+                'total_domains': stats['total_domains'],
+                'active_domains': stats['active_domains'],
+                'total_users_real_clinics': stats['total_users_global'],
+                'total_patients': stats['total_patients'],
+                'total_professionals': stats['total_professionals'],
+                'stats_generated_at': stats['generated_at'],
             })
             
         except Exception as e:
@@ -119,15 +98,13 @@ class ClinicAdmin(admin.ModelAdmin):
     def get_user_count(self, obj):
         """Obtener el conteo real de usuarios para esta clínica"""
         try:
-            from django_tenants.utils import schema_context
-            from apps.users.models import CustomUser
+            from apps.tenants.stats import get_clinic_stats
             
-            with schema_context(obj.schema_name):
-                user_count = CustomUser.objects.count()
-                patients = CustomUser.objects.filter(user_type='patient').count()
-                professionals = CustomUser.objects.filter(user_type='professional').count()
-                
-            return f"{user_count} usuarios ({patients}P, {professionals}Pr)"
+            # Sale de las estadísticas globales cacheadas, no de un COUNT por fila
+            clinic_stats = get_clinic_stats(obj)
+            if not clinic_stats or 'error' in clinic_stats:
+                return "Error"
+            return f"{clinic_stats['total_users']} usuarios ({clinic_stats['patients']}P, {clinic_stats['professionals']}Pr)"
         except Exception:
             return "Error"
     
@@ -8,15 +8,17 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from channels.auth import AuthMiddlewareStack
-from apps.chat.middleware import TokenAuthMiddleware
+from apps.chat.middleware import TenantWebSocketMiddleware, TokenAuthMiddleware
 import apps.chat.routing
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(      # Primero intenta con la web (sesiones)
-        TokenAuthMiddleware(              # Después, con el móvil (tokens)
-            URLRouter(
-                apps.chat.routing.websocket_urlpatterns
+    "websocket": TenantWebSocketMiddleware(   # Clínica según el Host
+        AuthMiddlewareStack(                  # Primero intenta con la web (sesiones)
+            TokenAuthMiddleware(              # Después, con el móvil (tokens)
+                URLRouter(
+                    apps.chat.routing.websocket_urlpatterns
+                )
             )
         )
     ),
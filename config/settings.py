@@ -149,6 +149,34 @@ TENANT_DOMAIN_MODEL = "tenants.Domain"
 # ⚠️ CRÍTICO: Nombre del esquema público (REQUERIDO por django-tenants)
 PUBLIC_SCHEMA_NAME = 'public'
 
+# ---------------------------------------------------------------
+# CACHÉ
+# ---------------------------------------------------------------
+# 'directory' guarda las respuestas del directorio público de profesionales.
+# Las claves llevan el schema del tenant (django_tenants.cache.make_key).
+# Por defecto usa memoria local, que solo sirve con un único proceso: la
+# invalidación no llega a los demás workers. Con varios workers hay que
+# apuntar a un backend compartido, por ejemplo Redis:
+# DIRECTORY_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# DIRECTORY_CACHE_LOCATION=redis://host:6379/1
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'directory': {
+        'BACKEND': config('DIRECTORY_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DIRECTORY_CACHE_LOCATION', default='professional-directory'),
+        'TIMEOUT': config('DIRECTORY_CACHE_TIMEOUT', default=300, cast=int),
+        'KEY_FUNCTION': 'django_tenants.cache.make_key',
+    },
+    # Token → usuario de los WebSockets del chat (apps/chat/cache.py); las claves ya llevan el schema
+    'chat_auth': {
+        'BACKEND': config('CHAT_AUTH_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CHAT_AUTH_CACHE_LOCATION', default='chat-auth'),
+        'TIMEOUT': config('CHAT_AUTH_CACHE_TIMEOUT', default=60, cast=int),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -190,6 +218,15 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Backups en segundo plano (apps.backups.jobs y comando run_backup_worker)
+BACKUP_ROOT = Path(config('BACKUP_ROOT', default=str(BASE_DIR / 'backups_storage')))
+BACKUP_MAX_CONCURRENT_JOBS = config('BACKUP_MAX_CONCURRENT_JOBS', default=2, cast=int)
+BACKUP_MAX_CONCURRENT_RESTORES = config('BACKUP_MAX_CONCURRENT_RESTORES', default=1, cast=int)
+# Tope de jobs paralelos de pg_restore que puede pedir una restauración
+BACKUP_MAX_RESTORE_JOBS = config('BACKUP_MAX_RESTORE_JOBS', default=4, cast=int)
+# Margen (segundos) hacia atrás al leer los cambios de un backup incremental
+BACKUP_SNAPSHOT_OVERLAP_SECONDS = config('BACKUP_SNAPSHOT_OVERLAP_SECONDS', default=300, cast=int)
+
 STORAGES = {
     "default": {
         "BACKEND": "django.core.files.storage.FileSystemStorage",
@@ -290,13 +327,27 @@ CORS_ALLOW_METHODS = [
 # Configuración de ASGI para que Django Channels sea el punto de entrada
 ASGI_APPLICATION = 'config.asgi.application'
 
-# Configuración del "Channel Layer" que usará Redis como intermediario
-CHANNEL_LAYERS = {
-    'default': {
-        'BACKEND': 'channels.layers.InMemoryChannelLayer',
-   
-    },
-}
+# Configuración del "Channel Layer": PostgreSQL LISTEN/NOTIFY (apps/chat/layers.py)
+# para que el chat funcione con varios workers ASGI. CHAT_CHANNEL_LAYER=memory
+# vuelve a la capa en memoria (un solo proceso).
+if config('CHAT_CHANNEL_LAYER', default='postgres') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels.layers.InMemoryChannelLayer',
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'apps.chat.layers.PostgresChannelLayer',
+            'CONFIG': {
+                'prefix': 'chat',
+                'capacity': 100,  # Mensajes sin leer por socket
+                'group_capacity': config('CHAT_GROUP_CAPACITY', default=1000, cast=int),  # Pendientes de publicar por sala
+                'batch_delay': 0.005,  # Segundos que se juntan mensajes en un NOTIFY
+            },
+        },
+    }
 # URL donde corre tu App de React (Vite usa el puerto 5173 por defecto)
 FRONTEND_URL_LOCAL = 'https://psico-admin-sp1-despliegue-front.vercel.app'
 # ---------------------------------------------------------------
@@ -327,6 +378,9 @@ STRIPE_WEBHOOK_SECRET = config("STRIPE_WEBHOOK_SECRET")
 # ---------------------------------------------------------------
 # CONFIGURACIÓN DE LOGGING Y BITÁCORA
 # ---------------------------------------------------------------
+# Meses de bitácora que conserva el comando auditlog_partitions (particiones mensuales)
+AUDITLOG_RETENTION_MONTHS = config('AUDITLOG_RETENTION_MONTHS', default=12, cast=int)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -364,11 +418,15 @@ LOGGING = {
             'backupCount': 2,
             'formatter': 'verbose',
         },
-        # Handler para guardar en la base de datos (nuestra bitácora)
+        # Handler para guardar en la base de datos (nuestra bitácora).
+        # Encola los registros y los guarda con bulk_create desde un hilo aparte
         'database': {
             'level': 'INFO',
-            'class': 'apps.auditlog.handlers.DatabaseLogHandler',
+            'class': 'apps.auditlog.handlers.BufferedDatabaseLogHandler',
             'filters': ['add_request_info'],  # Usamos el filtro para añadir IP y usuario
+            'capacity': config('AUDITLOG_BUFFER_CAPACITY', default=10000, cast=int),  # Máx. registros en memoria
+            'batch_size': 200,
+            'flush_interval': 1.0,  # Segundos
         },
     },
     'loggers': {